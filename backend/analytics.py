@@ -0,0 +1,393 @@
+# analytics.py — pitch analytics over the replay DB (mix, velocity, heatmap, count states)
+# The pitches table is loaded once into NumPy columns and then topped up
+# incrementally by id watermark, so rows written by the live recorder or by
+# backfill.py (another process) show up on the next refresh without a reload.
+# Each batch also updates running aggregates per pitcher, per game, per date and
+# overall; unfiltered pitcher/game/all queries read those directly and a plain
+# date range sums the per-date ones. Other combinations select rows with
+# vectorized masks (using the per-key row index when a pitcher or game is given)
+# and bincount the selection; velocity percentiles always come from the rows.
+
+import threading, time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from reducer import DESC_CODES
+
+MAX_TYPES = 32                # pitch-type codes; 0 = unknown, the last slot collects overflow
+HEAT_GRID = 20                # heatmap cells per side
+HEAT_X = (-2.5, 2.5)          # plate-relative feet (catcher's view)
+HEAT_Z = (0.0, 5.0)
+PERCENTILES = (10, 25, 50, 75, 90)
+STATES = 12                   # pre-pitch counts 0-0 .. 3-2 (balls * 3 + strikes)
+VELO_MIN, VELO_STEP, VELO_BINS = 30.0, 0.1, 900   # velocity histogram: 30.0-119.9 mph at the feed's 0.1 resolution
+
+# Pitch calls grouped for the count-state view (details.code → class).
+CALLS = ["ball", "called_strike", "swinging_strike", "foul", "in_play", "hbp", "other"]
+_CALL_OF = {}
+for _codes, _cls in (("B *B V P I", 0), ("C A", 1), ("S W M Q T", 2), ("F R L O", 3), ("X D E", 4), ("H", 5)):
+    for _c in _codes.split():
+        _CALL_OF[_c] = _cls
+
+def call_class(code: Optional[str], outcome: Optional[str]) -> int:
+    if code is None and isinstance(outcome, str):
+        code = DESC_CODES.get(outcome.lower())
+    return _CALL_OF.get(code, 6)
+
+class Agg:
+    """Running totals for one key (a pitcher, a game, a date, or everything).
+
+    velo (per-type velocity histograms) is kept only where a key's rows are too many
+    to take percentiles from directly: the overall and per-date aggregates.
+    """
+    __slots__ = ("n", "mix", "mph_sum", "mph_n", "states", "calls", "heat", "velo")
+
+    def __init__(self, velo: bool = False):
+        self.n = 0
+        self.mix = np.zeros(MAX_TYPES, np.int64)
+        self.mph_sum = np.zeros(MAX_TYPES, np.float64)
+        self.mph_n = np.zeros(MAX_TYPES, np.int64)
+        self.states = np.zeros((STATES, MAX_TYPES), np.int64)
+        self.calls = np.zeros((STATES, len(CALLS)), np.int64)
+        self.heat = np.zeros(HEAT_GRID * HEAT_GRID, np.int64)
+        self.velo = np.zeros((MAX_TYPES, VELO_BINS), np.int32) if velo else None
+
+    def add(self, cols: "Columns", idx: Any):
+        t = cols.type[idx]
+        mph = cols.mph[idx]
+        st = cols.state[idx]
+        has_mph = ~np.isnan(mph)
+        self.n += len(t)
+        self.mix += np.bincount(t, minlength=MAX_TYPES)
+        self.mph_sum += np.bincount(t[has_mph], weights=mph[has_mph], minlength=MAX_TYPES)
+        self.mph_n += np.bincount(t[has_mph], minlength=MAX_TYPES)
+        self.states += np.bincount(st * MAX_TYPES + t, minlength=STATES * MAX_TYPES).reshape(STATES, MAX_TYPES)
+        self.calls += np.bincount(st * len(CALLS) + cols.call[idx],
+                                  minlength=STATES * len(CALLS)).reshape(STATES, len(CALLS))
+        cell = cols.cell[idx]
+        self.heat += np.bincount(cell[cell >= 0], minlength=HEAT_GRID * HEAT_GRID)
+        if self.velo is not None:
+            b = np.clip(np.rint((mph[has_mph] - VELO_MIN) / VELO_STEP), 0, VELO_BINS - 1).astype(np.int64)
+            self.velo += np.bincount(t[has_mph] * VELO_BINS + b,
+                                     minlength=MAX_TYPES * VELO_BINS).reshape(MAX_TYPES, VELO_BINS).astype(np.int32)
+
+    def merge(self, other: "Agg"):
+        self.n += other.n
+        for name in ("mix", "mph_sum", "mph_n", "states", "calls", "heat"):
+            getattr(self, name).__iadd__(getattr(other, name))
+        if self.velo is not None and other.velo is not None:
+            self.velo += other.velo
+
+def hist_percentiles(h: np.ndarray, ps: Tuple[int, ...]) -> List[float]:
+    """np.percentile's linear interpolation, from a velocity histogram instead of the values."""
+    cum = np.cumsum(h)
+    n = int(cum[-1])
+    out = []
+    for p in ps:
+        rank = p / 100.0 * (n - 1)
+        k = int(rank)
+        lo = np.searchsorted(cum, k, side="right")
+        hi = np.searchsorted(cum, min(k + 1, n - 1), side="right")
+        out.append(VELO_MIN + VELO_STEP * (lo + (hi - lo) * (rank - k)))
+    return out
+
+class Columns:
+    """Growable columnar arrays, one entry per pitch row."""
+    SPEC = {"id": np.int64, "game": np.int64, "date": np.int32, "pitcher": np.int64, "type": np.int64,
+            "mph": np.float32, "x": np.float32, "z": np.float32, "state": np.int64, "call": np.int64,
+            "cell": np.int64}
+
+    def __init__(self, capacity: int = 1024):
+        self.n = 0
+        for name, dtype in self.SPEC.items():
+            setattr(self, "_" + name, np.empty(capacity, dtype))
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name in Columns.SPEC:
+            return self.__dict__["_" + name][:self.n]
+        raise AttributeError(name)
+
+    def extend(self, batch: Dict[str, np.ndarray]):
+        m = len(batch["id"])
+        cap = len(self._id)
+        if self.n + m > cap:
+            cap = max(cap * 2, self.n + m)
+            for name in self.SPEC:
+                grown = np.empty(cap, self.SPEC[name])
+                grown[:self.n] = getattr(self, "_" + name)[:self.n]
+                setattr(self, "_" + name, grown)
+        for name in self.SPEC:
+            getattr(self, "_" + name)[self.n:self.n + m] = batch[name]
+        self.n += m
+
+def _date_int(d: Optional[str]) -> int:
+    """YYYY-MM-DD → YYYYMMDD (orderable int); -1 when unknown or malformed."""
+    try:
+        return int(d.replace("-", "")) if d else -1
+    except ValueError:
+        return -1
+
+def _cells(x: np.ndarray, z: np.ndarray) -> np.ndarray:
+    gx = np.floor((x - HEAT_X[0]) / (HEAT_X[1] - HEAT_X[0]) * HEAT_GRID)
+    gz = np.floor((z - HEAT_Z[0]) / (HEAT_Z[1] - HEAT_Z[0]) * HEAT_GRID)
+    ok = (gx >= 0) & (gx < HEAT_GRID) & (gz >= 0) & (gz < HEAT_GRID)   # NaN compares False
+    return np.where(ok, np.nan_to_num(gz) * HEAT_GRID + np.nan_to_num(gx), -1).astype(np.int64)
+
+class PitchAnalytics:
+    """Columnar pitch store + aggregates over a replay DB; refresh() pulls rows past the watermark."""
+
+    def __init__(self, connect: Callable[[], Any], refresh_seconds: float = 5.0, chunk: int = 50000):
+        self._connect = connect
+        self.refresh_seconds = refresh_seconds
+        self.chunk = chunk
+        self.cols = Columns()
+        self.watermark = 0                      # highest pitches.id loaded
+        self.loaded_at = 0.0
+        self.types: List[Optional[str]] = [None]
+        self._type_code: Dict[str, int] = {}
+        self.pitchers: Dict[int, str] = {}
+        self.aggs: Dict[Hashable, Agg] = {"all": Agg(velo=True)}
+        self._rows: Dict[Hashable, List[np.ndarray]] = {}    # key → row-index chunks
+        self._last_count: Dict[Tuple[int, int], Tuple[int, int, int]] = {}   # (game, ab) → (pitchNumber, balls, strikes)
+        self._lock = threading.Lock()
+
+    # --- loading ---
+    def refresh(self, force: bool = False) -> int:
+        """Load rows with id > watermark (at most every refresh_seconds). Returns rows added."""
+        with self._lock:
+            if not force and time.monotonic() - self.loaded_at < self.refresh_seconds:
+                return 0
+            added = 0
+            with self._connect() as conn:
+                dates = {pk: _date_int(d) for pk, d in conn.execute("SELECT gamePk, gameDate FROM games")}
+                while True:
+                    rows = conn.execute(
+                        "SELECT id, gamePk, pitcherId, pitcherName, pitchType, mph, locX, locZ, "
+                        "atBatIndex, pitchNumber, balls, strikes, pitchCode, outcome "
+                        "FROM pitches WHERE id > ? ORDER BY id LIMIT ?", (self.watermark, self.chunk)).fetchall()
+                    if not rows:
+                        break
+                    self._append([tuple(r) for r in rows], dates)
+                    added += len(rows)
+                    if len(rows) < self.chunk:
+                        break
+            self.loaded_at = time.monotonic()
+            return added
+
+    def _code(self, pitch_type: Optional[str]) -> int:
+        if pitch_type is None:
+            return 0
+        code = self._type_code.get(pitch_type)
+        if code is None:
+            if len(self.types) >= MAX_TYPES - 1:
+                return MAX_TYPES - 1
+            code = self._type_code[pitch_type] = len(self.types)
+            self.types.append(pitch_type)
+        return code
+
+    def _pre_counts(self, game: np.ndarray, ab: np.ndarray, pnum: np.ndarray,
+                    balls: np.ndarray, strikes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Stored counts are after the pitch; a pitch was thrown in the previous pitch's count."""
+        order = np.lexsort((pnum, ab, game))
+        g, a, n, b, s = game[order], ab[order], pnum[order], balls[order], strikes[order]
+        same = np.zeros(len(g), bool)
+        same[1:] = (g[1:] == g[:-1]) & (a[1:] == a[:-1])
+        pre_b = np.where(same, np.roll(b, 1), 0)
+        pre_s = np.where(same, np.roll(s, 1), 0)
+        # A plate appearance that began in an earlier batch continues from its carried count.
+        last = self._last_count
+        for i in np.flatnonzero(~same & (n > 1)).tolist():
+            prev = last.get((int(g[i]), int(a[i])))
+            if prev is not None and prev[0] < n[i]:
+                pre_b[i], pre_s[i] = prev[1], prev[2]
+        ends = np.ones(len(g), bool)
+        ends[:-1] = g[1:] != g[:-1]          # each game's latest pitch in this batch
+        for i in np.flatnonzero(ends).tolist():
+            last[(int(g[i]), int(a[i]))] = (int(n[i]), int(b[i]), int(s[i]))
+        if len(last) > 4096:                 # plate appearances long finished
+            for k in list(last)[:len(last) - 1024]:
+                del last[k]
+        out_b, out_s = np.empty_like(pre_b), np.empty_like(pre_s)
+        out_b[order], out_s[order] = pre_b, pre_s
+        return out_b, out_s
+
+    def _append(self, rows: List[tuple], dates: Dict[int, int]):
+        ids, games, pitchers, names, ptypes, mph, x, z, abs_, pnums, balls, strikes, codes, outcomes = zip(*rows)
+        game = np.array(games, np.int64)
+        pre_b, pre_s = self._pre_counts(game, np.array(abs_, np.int64), np.array(pnums, np.int64),
+                                        np.array(balls, np.int64), np.array(strikes, np.int64))
+        for pid, name in set(zip(pitchers, names)):
+            if pid is not None and name:
+                self.pitchers[pid] = name
+        type_codes = {t: self._code(t) for t in set(ptypes)}
+        call_codes = {k: call_class(*k) for k in set(zip(codes, outcomes))}
+        xs = np.array(x, dtype=np.float32)   # None → NaN
+        zs = np.array(z, dtype=np.float32)
+        batch = {
+            "id": np.array(ids, np.int64),
+            "game": game,
+            "date": np.array([dates.get(g, -1) for g in games], np.int32),
+            "pitcher": np.nan_to_num(np.array(pitchers, np.float64), nan=-1).astype(np.int64),
+            "type": np.array([type_codes[t] for t in ptypes], np.int64),
+            "mph": np.array(mph, np.float32),
+            "x": xs,
+            "z": zs,
+            "state": np.clip(pre_b, 0, 3) * 3 + np.clip(pre_s, 0, 2),
+            "call": np.array([call_codes[k] for k in zip(codes, outcomes)], np.int64),
+            "cell": _cells(xs, zs),
+        }
+        start = self.cols.n
+        self.cols.extend(batch)
+        self.watermark = int(batch["id"][-1])
+
+        idx = np.arange(start, self.cols.n)
+        self.aggs["all"].add(self.cols, idx)
+        for kind, keys in (("pitcher", batch["pitcher"]), ("game", batch["game"]), ("date", batch["date"])):
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+            for part in np.split(order, bounds):
+                k = int(keys[part[0]])
+                if kind == "pitcher" and k < 0:
+                    continue
+                rows_idx = idx[part]
+                agg = self.aggs.get((kind, k))
+                if agg is None:
+                    agg = self.aggs[(kind, k)] = Agg(velo=(kind == "date"))
+                agg.add(self.cols, rows_idx)
+                if kind != "date":
+                    self._rows.setdefault((kind, k), []).append(rows_idx)
+
+    # --- selection ---
+    def _key_rows(self, key: Hashable) -> np.ndarray:
+        chunks = self._rows.get(key)
+        if not chunks:
+            return np.empty(0, np.int64)
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    def select(self, pitcherId: Optional[int] = None, gamePk: Optional[int] = None, start: Optional[str] = None,
+               end: Optional[str] = None, pitchType: Optional[str] = None) -> Any:
+        """Row indices matching every given filter (a full slice when there are none)."""
+        c = self.cols
+        if gamePk is not None:
+            idx = self._key_rows(("game", gamePk))
+            if pitcherId is not None:
+                idx = idx[c.pitcher[idx] == pitcherId]
+        elif pitcherId is not None:
+            idx = self._key_rows(("pitcher", pitcherId))
+        else:
+            idx = None
+        mask = None
+        if start or end:
+            dates = c.date if idx is None else c.date[idx]
+            mask = dates >= _date_int(start) if start else np.ones(len(dates), bool)
+            if end:
+                mask &= dates <= _date_int(end)
+        if pitchType is not None:
+            code = self._type_code.get(pitchType, -1)
+            m = (c.type if idx is None else c.type[idx]) == code
+            mask = m if mask is None else mask & m
+        if idx is None:
+            return np.flatnonzero(mask) if mask is not None else slice(None)
+        return idx if mask is None else idx[mask]
+
+    def summary(self, pitcherId: Optional[int] = None, gamePk: Optional[int] = None, start: Optional[str] = None,
+                end: Optional[str] = None, pitchType: Optional[str] = None) -> Agg:
+        if not pitchType and gamePk is None and pitcherId is None:
+            if not (start or end):
+                return self.aggs["all"]
+            lo, hi = _date_int(start) if start else 0, _date_int(end) if end else 99999999
+            agg = Agg(velo=True)
+            for key, day in self.aggs.items():   # one precomputed aggregate per game date
+                if isinstance(key, tuple) and key[0] == "date" and lo <= key[1] <= hi:
+                    agg.merge(day)
+            return agg
+        if not (start or end or pitchType):
+            if gamePk is None or pitcherId is None:
+                key = ("game", gamePk) if gamePk is not None else ("pitcher", pitcherId)
+                return self.aggs.get(key) or Agg()
+        agg = Agg()
+        agg.add(self.cols, self.select(pitcherId, gamePk, start, end, pitchType))
+        return agg
+
+    # --- views ---
+    def query(self, view: str, **filters: Any) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        with self._lock:
+            out = getattr(self, "_view_" + view)(**filters)
+        out.update(view=view, filters={k: v for k, v in filters.items() if v is not None},
+                   ms=round((time.perf_counter() - t0) * 1000, 2))
+        pid = filters.get("pitcherId")
+        if pid is not None:
+            out["pitcherName"] = self.pitchers.get(pid)
+        return out
+
+    def _type_rows(self, agg: Agg) -> List[Tuple[int, str]]:
+        return [(t, self.types[t] if t < len(self.types) else "Other")
+                for t in np.flatnonzero(agg.mix).tolist()]
+
+    def _view_mix(self, **f: Any) -> Dict[str, Any]:
+        agg = self.summary(**f)
+        rows = [{"pitchType": name, "n": int(agg.mix[t]), "pct": round(100.0 * agg.mix[t] / agg.n, 1),
+                 "avgMph": round(agg.mph_sum[t] / agg.mph_n[t], 1) if agg.mph_n[t] else None}
+                for t, name in self._type_rows(agg)]
+        rows.sort(key=lambda r: -r["n"])
+        return {"n": agg.n, "mix": rows}
+
+    def _view_velocity(self, **f: Any) -> Dict[str, Any]:
+        if f.get("pitcherId") is None and f.get("gamePk") is None and not f.get("pitchType"):
+            agg = self.summary(**f)
+            rows = []
+            for t, name in self._type_rows(agg):
+                h = agg.velo[t]
+                n = int(h.sum())
+                if n:
+                    rows.append({"pitchType": name, "n": n,
+                                 **{f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, hist_percentiles(h, PERCENTILES))},
+                                 "max": round(VELO_MIN + VELO_STEP * int(np.flatnonzero(h)[-1]), 1)})
+            rows.sort(key=lambda r: -r["n"])
+            return {"n": int(agg.mph_n.sum()), "velocity": rows}
+        idx = self.select(**f)
+        t = self.cols.type[idx]
+        mph = self.cols.mph[idx]
+        keep = ~np.isnan(mph)
+        t, mph = t[keep], mph[keep]
+        rows = []
+        for code in np.flatnonzero(np.bincount(t, minlength=MAX_TYPES)).tolist():
+            part = mph[t == code]
+            pct = np.percentile(part, PERCENTILES)   # partition-based, no full sort
+            rows.append({"pitchType": self.types[code] if code < len(self.types) else "Other", "n": len(part),
+                         **{f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, pct)},
+                         "max": round(float(part.max()), 1)})
+        rows.sort(key=lambda r: -r["n"])
+        return {"n": int(len(mph)), "velocity": rows}
+
+    def _view_heatmap(self, **f: Any) -> Dict[str, Any]:
+        agg = self.summary(**f)
+        return {"n": agg.n, "grid": HEAT_GRID, "x": list(HEAT_X), "z": list(HEAT_Z),
+                "located": int(agg.heat.sum()),
+                "cells": agg.heat.reshape(HEAT_GRID, HEAT_GRID).tolist()}   # [z][x], low z first
+
+    def _view_counts(self, **f: Any) -> Dict[str, Any]:
+        agg = self.summary(**f)
+        types = self._type_rows(agg)
+        rows = []
+        for st in range(STATES):
+            n = int(agg.calls[st].sum())
+            if not n:
+                continue
+            rows.append({"count": f"{st // 3}-{st % 3}", "n": n,
+                         "mix": {name: int(agg.states[st, t]) for t, name in types if agg.states[st, t]},
+                         "calls": {CALLS[c]: int(v) for c, v in enumerate(agg.calls[st]) if v}})
+        return {"n": agg.n, "counts": rows}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.cols.n, "watermark": self.watermark, "pitchers": len(self.pitchers),
+                "games": sum(1 for k in self.aggs if isinstance(k, tuple) and k[0] == "game"),
+                "dates": sum(1 for k in self.aggs if isinstance(k, tuple) and k[0] == "date"),
+                "types": len(self.types) - 1}
+
+VIEWS = ("mix", "velocity", "heatmap", "counts")
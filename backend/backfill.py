@@ -0,0 +1,175 @@
+# backfill.py — build the replay DB for a date range straight from StatsAPI
+# Schedules and feeds are fetched through the shared upstream client with bounded
+# concurrency; feeds are parsed and reduced in a process pool (json + reduce is CPU
+# bound); one writer applies rows in batched WAL transactions. A game's pitches and
+# its Final games row commit together, so an interrupted run resumes where it left
+# off: games already Final with pitches in the DB are skipped (unless --force).
+# Point STATSAPI at bench/statsapi_standin.py to run offline.
+#   python backfill.py --start 2025-04-01 --end 2025-04-30 [--db gamecast-replay.db]
+#                      [--concurrency 8] [--workers 4] [--batch 5000] [--save-dir feeds/]
+
+import argparse, asyncio, datetime as dt, json, os, sqlite3, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from mlb_live_stream import LIVE, PlayCursor, game_info, list_games
+from recorder import INSERT_PITCH, UPSERT_GAME, ensure_schema, pitch_row
+from reducer import GameReducer
+from upstream import upstream
+
+FINAL = {"Final", "Game Over", "Completed Early"}
+
+GameRows = Tuple[tuple, List[tuple]]   # (games row, pitches rows)
+
+def parse_feed(gamePk: int, raw: bytes) -> GameRows:
+    """Feed JSON → (games row, pitches rows). Runs in a worker process."""
+    data = json.loads(raw)
+    info = game_info(gamePk, data)
+    reducer = GameReducer({"away": info["away"] or "Away", "home": info["home"] or "Home"}, infer_results=False)
+    rows = []
+    for ev in PlayCursor(gamePk).scan(data):
+        reducer.apply(ev)
+        if ev["event"] == "pitch":
+            row = pitch_row(ev)
+            if row is not None:
+                rows.append(row)
+    game = (gamePk, info["gameDate"], info["away"] or "Away", info["home"] or "Home", info["status"] or "Unknown")
+    return game, rows
+
+def date_range(start: str, end: str) -> List[str]:
+    d0, d1 = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+    return [(d0 + dt.timedelta(days=i)).isoformat() for i in range((d1 - d0).days + 1)]
+
+def completed_games(conn: sqlite3.Connection) -> Set[int]:
+    """Games already backfilled: Final in games and with pitches recorded."""
+    marks = ",".join("?" for _ in FINAL)
+    return {r[0] for r in conn.execute(
+        f"SELECT g.gamePk FROM games g WHERE g.status IN ({marks}) "
+        f"AND EXISTS (SELECT 1 FROM pitches p WHERE p.gamePk = g.gamePk)", tuple(FINAL))}
+
+def write_batch(conn: sqlite3.Connection, batch: List[GameRows]) -> int:
+    """Pitches first, then their games rows, in one transaction."""
+    with conn:
+        before = conn.total_changes
+        conn.executemany(INSERT_PITCH, [row for _, rows in batch for row in rows])
+        written = conn.total_changes - before
+        conn.executemany(UPSERT_GAME, [game for game, _ in batch])
+    return written
+
+def _save(save_dir: Optional[str], kind: str, name: Any, body: bytes):
+    if save_dir:
+        path = os.path.join(save_dir, kind)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f"{name}.json"), "wb") as f:
+            f.write(body)
+
+class Backfill:
+    def __init__(self, db: str, concurrency: int, workers: int, batch: int,
+                 save_dir: Optional[str] = None, force: bool = False):
+        self.db = db
+        self.concurrency = concurrency
+        self.workers = workers
+        self.batch = batch
+        self.save_dir = save_dir
+        self.force = force
+        self.games = self.pitches = self.skipped = self.failed = 0
+
+    async def run(self, dates: List[str]):
+        t0 = time.perf_counter()
+        conn = sqlite3.connect(self.db, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        ensure_schema(conn)
+        done = set() if self.force else completed_games(conn)
+
+        upstream.host_concurrency = self.concurrency
+        sem = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        results: "asyncio.Queue[Optional[GameRows]]" = asyncio.Queue(maxsize=self.workers * 4)
+
+        async def schedule(date: str) -> List[Dict[str, Any]]:
+            async with sem:
+                games = await list_games(date)
+            if self.save_dir:   # the fields list_games keeps, in schedule shape
+                _save(self.save_dir, "schedule", date, json.dumps({"dates": [{"date": date, "games": [
+                    {"gamePk": g["gamePk"], "status": {"detailedState": g["status"]},
+                     "teams": {"away": {"team": {"name": g["away"]}}, "home": {"team": {"name": g["home"]}}}}
+                    for g in games]}]}).encode())
+            return games
+
+        todo: List[int] = []
+        for date, games in zip(dates, await asyncio.gather(*(schedule(d) for d in dates))):
+            for g in games:
+                if g["status"] not in FINAL:
+                    continue
+                if g["gamePk"] in done:
+                    self.skipped += 1
+                else:
+                    todo.append(g["gamePk"])
+        print(f"[BACKFILL] {len(dates)} dates: {len(todo)} games to load, {self.skipped} already complete")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            async def load(gamePk: int):
+                try:
+                    async with sem:
+                        r = await upstream.get(f"{LIVE}/game/{gamePk}/feed/live")
+                        r.raise_for_status()
+                    _save(self.save_dir, "feed", gamePk, r.content)
+                    await results.put(await loop.run_in_executor(pool, parse_feed, gamePk, r.content))
+                except Exception as e:
+                    self.failed += 1
+                    print(f"[BACKFILL] {gamePk} failed: {type(e).__name__}: {e}")
+
+            async def loader():
+                await asyncio.gather(*(load(pk) for pk in todo))
+                await results.put(None)
+
+            task = asyncio.create_task(loader())
+            await self._writer(conn, results, t0)
+            await task
+        conn.close()
+        await upstream.aclose()
+        self.report(t0)
+
+    async def _writer(self, conn: sqlite3.Connection, results: asyncio.Queue, t0: float):
+        pending: List[GameRows] = []
+        rows = 0
+        while True:
+            item = await results.get()
+            if item is not None:
+                pending.append(item)
+                rows += len(item[1])
+            if pending and (item is None or rows >= self.batch or results.empty() and rows >= self.batch // 4):
+                self.pitches += await asyncio.to_thread(write_batch, conn, pending)
+                self.games += len(pending)
+                elapsed = time.perf_counter() - t0
+                print(f"[BACKFILL] {self.games} games, {self.pitches} pitches ({self.games / elapsed:.1f} games/s)")
+                pending, rows = [], 0
+            if item is None:
+                return
+
+    def report(self, t0: float):
+        elapsed = time.perf_counter() - t0
+        hosts = upstream.stats()
+        print(f"[BACKFILL] done in {elapsed:.1f}s: games={self.games} pitches={self.pitches} "
+              f"skipped={self.skipped} failed={self.failed}")
+        print(f"[BACKFILL] throughput {self.games / elapsed:.2f} games/s, {self.pitches / elapsed:.0f} pitches/s; "
+              f"upstream {hosts}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Backfill the replay DB from StatsAPI for a date range")
+    ap.add_argument("--start", required=True, help="YYYY-MM-DD")
+    ap.add_argument("--end", help="YYYY-MM-DD (default: --start)")
+    ap.add_argument("--db", default=os.getenv("REPLAY_DB", "gamecast-replay.db"))
+    ap.add_argument("--concurrency", type=int, default=8, help="max in-flight StatsAPI requests")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="parser processes")
+    ap.add_argument("--batch", type=int, default=5000, help="pitch rows per transaction")
+    ap.add_argument("--save-dir", help="also keep raw schedule/feed JSON here (stand-in layout)")
+    ap.add_argument("--force", action="store_true", help="reload games already complete in the DB")
+    args = ap.parse_args()
+    dates = date_range(args.start, args.end or args.start)
+    job = Backfill(args.db, args.concurrency, args.workers, args.batch, args.save_dir, args.force)
+    asyncio.run(job.run(dates))
+
+if __name__ == "__main__":
+    main()
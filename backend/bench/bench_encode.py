@@ -0,0 +1,77 @@
+# bench_encode.py — encode CPU per pitch as subscriber count grows
+# Compares the old path (json.dumps + SSE framing per subscriber) with StreamEvent's
+# encode-once cache, then payload size/encode cost of JSON vs the binary WS subprotocol.
+# Run from backend/:  python bench/bench_encode.py [--subs 1000]
+
+import argparse, json, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from protocol import DeltaTracker, orjson  # noqa: E402
+import binwire  # noqa: E402
+
+def sample_event(i: int) -> dict:
+    return {
+        "event": "pitch", "gamePk": 745123, "ts": "2025-08-23T03:21:36.446Z",
+        "inning": 7, "half": "bottom", "outs": 1, "count": {"balls": 2, "strikes": 1},
+        "batterId": 660271, "batterName": "Shohei Ohtani", "pitcherId": 543037, "pitcherName": "Gerrit Cole",
+        "pitchNumber": i % 7 + 1, "pitchType": "Four-Seam Fastball", "mph": 97.4, "outcome": "Called Strike",
+        "locX": 0.31, "locZ": 2.74, "szTop": 3.41, "szBot": 1.62,
+        "onFirst": True, "onSecond": False, "onThird": False, "atBatIndex": 54 + i // 7,
+        "idempotencyKey": f"745123-{54 + i // 7}-{i % 7 + 1}",
+        "teams": {"away": "New York Yankees", "home": "Los Angeles Dodgers"},
+        "score": {"away": 3, "home": 4},
+        "game": {"inning": 7, "half": "bottom", "outs": 1, "count": {"balls": 2, "strikes": 1},
+                 "bases": {"onFirst": True, "onSecond": False, "onThird": False}},
+    }
+
+def per_subscriber(events, subs: int) -> float:
+    t0 = time.perf_counter()
+    for ev in events:
+        for _ in range(subs):
+            f"id: {ev['idempotencyKey']}\ndata: {json.dumps(ev)}\n\n".encode()
+    return (time.perf_counter() - t0) / len(events)
+
+def encode_once(events, subs: int):
+    """(encode seconds/pitch, cached-handoff seconds/pitch for all subscribers)."""
+    tracker = DeltaTracker()
+    enc = handoff = 0.0
+    for ev in events:
+        t0 = time.perf_counter()
+        se = tracker.wrap(ev)
+        se.sse("full")
+        t1 = time.perf_counter()
+        for _ in range(subs):
+            se.sse("full")
+        enc += t1 - t0
+        handoff += time.perf_counter() - t1
+    return enc / len(events), handoff / len(events)
+
+def wire_sizes(events):
+    """(mean bytes, µs/pitch) for full JSON, delta JSON and binary frames."""
+    tracker = DeltaTracker()
+    out = {}
+    ses = [tracker.wrap(ev) for ev in events]
+    for name, enc in (("json full", lambda se: se.json_bytes("full")),
+                      ("json delta", lambda se: se.json_bytes("delta")),
+                      ("binary", lambda se: binwire._encode(se)[0])):
+        t0 = time.perf_counter()
+        sizes = [len(enc(se)) for se in ses]
+        out[name] = (sum(sizes) / len(sizes), (time.perf_counter() - t0) / len(ses) * 1e6)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subs", type=int, default=1000)
+    ap.add_argument("--pitches", type=int, default=200)
+    args = ap.parse_args()
+    print(f"encoder: {'orjson' if orjson else 'json'}")
+    for subs in (1, 10, 100, args.subs):
+        a = per_subscriber([sample_event(i) for i in range(args.pitches)], subs)
+        enc, handoff = encode_once([sample_event(i) for i in range(args.pitches)], subs)
+        print(f"subs={subs:>5}  per-subscriber {a * 1e6:10.1f} µs/pitch   "
+              f"encode-once {enc * 1e6:6.1f} µs/pitch (+{handoff * 1e6:.1f} µs cached handoff)")
+    for name, (size, us) in wire_sizes([sample_event(i) for i in range(args.pitches)]).items():
+        print(f"{name:>10}: {size:6.1f} bytes/pitch  {us:5.1f} µs/encode")
+
+if __name__ == "__main__":
+    main()
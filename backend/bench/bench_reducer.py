@@ -0,0 +1,168 @@
+# bench_reducer.py — per-event reduce cost, previous text-matching reducer vs reducer.GameReducer
+# Replays one full game through each reducer. Default is a deterministic synthetic
+# nine-inning game in the live event shape (pitches + 'play' results); pass a replay
+# DB to use a recorded game instead. Run from backend/:
+#   python bench/bench_reducer.py [--db gamecast-replay.db --game 745123] [--rounds 50]
+
+import argparse, copy, os, random, sqlite3, sys, time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reducer import GameReducer  # noqa: E402
+from replay import PITCH_SELECT, row_event  # noqa: E402
+
+class LegacyReducer:
+    """The reducer as it was before reducer.py (substring matching on outcome text), verbatim, for comparison."""
+
+    def __init__(self, teams: Dict[str, str]):
+        self.state = {
+            "inning": 1,
+            "half": "top",
+            "outs": 0,
+            "count": {"balls": 0, "strikes": 0},
+            "bases": {"onFirst": False, "onSecond": False, "onThird": False},
+            "score": {"away": 0, "home": 0},
+            "teams": teams or {"away":"Away","home":"Home"},
+        }
+
+    def inning_change(self):
+        self.state["outs"] = 0
+        self.state["count"] = {"balls": 0, "strikes": 0}
+        self.state["bases"] = {"onFirst": False, "onSecond": False, "onThird": False}
+        if self.state["half"] == "top":
+            self.state["half"] = "bottom"
+        else:
+            self.state["half"] = "top"
+            self.state["inning"] += 1
+
+    def apply(self, ev: Dict[str, Any]) -> Dict[str, Any]:
+        # Sync baseline from event if present (don’t fight the upstream feed)
+        if "inning" in ev: self.state["inning"] = ev["inning"]
+        if "half" in ev: self.state["half"] = ev["half"]
+        if "outs" in ev: self.state["outs"] = ev["outs"]
+        if "count" in ev and isinstance(ev["count"], dict):
+            self.state["count"]["balls"] = ev["count"].get("balls", self.state["count"]["balls"])
+            self.state["count"]["strikes"] = ev["count"].get("strikes", self.state["count"]["strikes"])
+        if "bases" in ev and isinstance(ev["bases"], dict):
+            self.state["bases"].update(ev["bases"])
+
+        # Naive outcome-based updates (works best with Live feed)
+        outcome = (ev.get("pitch", {}) or {}).get("outcome", "") or (ev.get("result") or "")
+        ol = str(outcome).lower()
+
+        # Strikeout detection
+        if "strikeout" in ol or ("called strike" in ol and self.state["count"]["strikes"] >= 2):
+            self.state["outs"] = min(3, self.state["outs"] + 1)
+            self.state["count"] = {"balls": 0, "strikes": 0}
+        # Walk detection
+        if "walk" in ol:
+            self.state["count"] = {"balls": 0, "strikes": 0}
+            # very simple force advance: 1->2->3->run
+            if self.state["bases"]["onFirst"] and self.state["bases"]["onSecond"] and self.state["bases"]["onThird"]:
+                batting = "away" if self.state["half"] == "top" else "home"
+                self.state["score"][batting] += 1
+            # shift occupancy
+            self.state["bases"]["onThird"] = self.state["bases"]["onThird"] or (self.state["bases"]["onSecond"] and self.state["bases"]["onFirst"])
+            self.state["bases"]["onSecond"] = self.state["bases"]["onSecond"] or self.state["bases"]["onFirst"]
+            self.state["bases"]["onFirst"] = True
+
+        # In-play outs (very naive)
+        if "in play, out" in ol:
+            self.state["outs"] = min(3, self.state["outs"] + 1)
+            self.state["count"] = {"balls": 0, "strikes": 0}
+
+        # In-play run(s) naive detection
+        if "in play, run" in ol or "home run" in ol:
+            batting = "away" if self.state["half"] == "top" else "home"
+            self.state["score"][batting] += 1
+
+        # Handle inning end
+        if self.state["outs"] >= 3:
+            self.inning_change()
+
+        # Attach state snapshot to outgoing event
+        ev["teams"] = self.state["teams"]
+        ev["score"] = self.state["score"]
+        ev["game"] = {
+            "inning": self.state["inning"],
+            "half": self.state["half"],
+            "outs": self.state["outs"],
+            "count": self.state["count"],
+            "bases": self.state["bases"],
+        }
+        return ev
+
+CALLS = [("B", "Ball"), ("C", "Called Strike"), ("S", "Swinging Strike"), ("F", "Foul")]
+RESULTS = [("field_out", 1, "X", "In play, out(s)"), ("strikeout", 1, None, None), ("single", 0, "D", "In play, no out"),
+           ("double", 0, "D", "In play, no out"), ("walk", 0, None, None), ("home_run", 0, "E", "In play, run(s)"),
+           ("grounded_into_double_play", 2, "X", "In play, out(s)")]
+
+def synthetic_game(seed: int = 7):
+    """~300 live-shaped pitch events plus one 'play' event per plate appearance."""
+    rnd = random.Random(seed)
+    out, ab = [], 0
+    for inning in range(1, 10):
+        for half in ("top", "bottom"):
+            outs = 0
+            while outs < 3:
+                name, nouts, code, desc = rnd.choice(RESULTS)
+                balls = strikes = 0
+                for n in range(1, rnd.randint(2, 6)):
+                    c, d = rnd.choice(CALLS)
+                    if c == "B" and balls < 3: balls += 1
+                    elif c != "B" and strikes < 2: strikes += 1
+                    out.append({"event": "pitch", "gamePk": 1, "inning": inning, "half": half, "outs": outs,
+                                "count": {"balls": balls, "strikes": strikes}, "pitchCode": c, "outcome": d,
+                                "pitchNumber": n, "atBatIndex": ab, "onFirst": False, "onSecond": False,
+                                "onThird": False, "idempotencyKey": f"1-{ab}-{n}"})
+                if code:
+                    out.append({"event": "pitch", "gamePk": 1, "inning": inning, "half": half, "outs": outs,
+                                "count": {"balls": balls, "strikes": strikes}, "pitchCode": code, "outcome": desc,
+                                "pitchNumber": 9, "atBatIndex": ab, "idempotencyKey": f"1-{ab}-9"})
+                outs = min(3, outs + nouts)
+                out.append({"event": "play", "gamePk": 1, "inning": inning, "half": half, "atBatIndex": ab,
+                            "eventType": name, "outs": outs, "idempotencyKey": f"1-{ab}-play"})
+                ab += 1
+    return out
+
+def recorded_game(db: str, gamePk: int):
+    conn = sqlite3.connect(db)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(PITCH_SELECT + "WHERE gamePk = ? ORDER BY atBatIndex, pitchNumber", (gamePk,)).fetchall()
+    return [row_event(r) for r in rows]
+
+def run(make, events, rounds: int) -> float:
+    batches = [copy.deepcopy(events) for _ in range(rounds)]  # apply() mutates events
+    t0 = time.perf_counter()
+    for batch in batches:
+        reducer = make()
+        for ev in batch:
+            reducer.apply(ev)
+    return (time.perf_counter() - t0) / (rounds * len(events))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db")
+    ap.add_argument("--game", type=int)
+    ap.add_argument("--rounds", type=int, default=50)
+    args = ap.parse_args()
+    teams = {"away": "Away", "home": "Home"}
+    if args.db and args.game:
+        events, label = recorded_game(args.db, args.game), f"recorded game {args.game}"
+        infer = True
+    else:
+        events, label = synthetic_game(), "synthetic live game"
+        infer = False
+    print(f"{label}: {len(events)} events x {args.rounds} rounds")
+    before = run(lambda: LegacyReducer(teams), events, args.rounds)
+    after = run(lambda: GameReducer(teams, infer_results=infer), events, args.rounds)
+    print(f"  text-matching reducer {before * 1e6:6.2f} µs/event")
+    print(f"  table-driven reducer  {after * 1e6:6.2f} µs/event  ({before / after:.1f}x)")
+    final = copy.deepcopy(events)
+    r = GameReducer(teams, infer_results=infer)
+    for ev in final:
+        r.apply(ev)
+    print(f"  final state: {r.state}")
+
+if __name__ == "__main__":
+    main()
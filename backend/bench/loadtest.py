@@ -0,0 +1,299 @@
+# loadtest.py — end-to-end throughput and delivery lag of the live pipeline
+# Starts statsapi_standin in live mode (N synthetic games whose feeds grow by --rate
+# playEvents/s) in-process, runs the real app under uvicorn in a subprocess pointed at
+# it, and connects M SSE / WebSocket clients spread over the games. Delivery lag is
+# measured per pitch from the moment the stand-in revealed it (its startTime) to its
+# arrival at a client, so it covers polling, stream_pitches, GameReducer, the hub and
+# the transport. Also reports upstream req/s, server CPU and RSS (from /proc) and stage
+# means from /metrics. Results are saved as JSON tagged with the git revision; pass
+# --baseline to compare against an earlier run. --workers N runs N uvicorn workers on a
+# bus_broker.py Unix socket (BUS mode); CPU and RSS are then summed over the workers and
+# /metrics comes from whichever worker answers. Run from backend/:
+#   python bench/loadtest.py --games 10 --clients 200 --rate 1 --duration 60 [--ws-share 0.5]
+#                            [--protocol delta] [--workers 4] [--baseline bench/results/<earlier>.json]
+
+import argparse, asyncio, datetime, json, os, re, subprocess, sys, tempfile, threading, time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from statsapi_standin import serve, synthetic_pk  # noqa: E402
+
+try:
+    import websockets
+except ImportError:   # SSE-only runs still work
+    websockets = None
+
+STAGES = ("gamecast_upstream_request_seconds", "gamecast_feed_parse_seconds", "gamecast_normalize_seconds",
+          "gamecast_reducer_apply_seconds", "gamecast_serialize_seconds", "gamecast_delivery_seconds")
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+def _epoch(ts: str) -> float:
+    return datetime.datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+
+class Lags:
+    """Client-side receipt lag per transport (pitches only), ignoring the warmup period."""
+
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.by: Dict[str, List[float]] = {"sse": [], "ws": []}
+        self.received = 0
+        self.errors = 0
+
+    def record(self, transport: str, raw: Any):
+        now = time.time()
+        self.received += 1
+        if now < self.warmup_until:
+            return
+        msg = json.loads(raw)
+        if msg.get("event") == "pitch" and msg.get("ts"):
+            self.by[transport].append(now - _epoch(msg["ts"]))
+
+async def sse_client(app: str, gamePk: int, protocol: str, lags: Lags, stop: asyncio.Event):
+    try:
+        async with httpx.AsyncClient(timeout=None) as client:
+            async with client.stream("GET", f"{app}/sse/stream", params={"gamePk": gamePk, "protocol": protocol}) as r:
+                async for line in r.aiter_lines():
+                    if stop.is_set():
+                        return
+                    if line.startswith("data: "):
+                        lags.record("sse", line[6:])
+    except Exception:
+        if not stop.is_set():
+            lags.errors += 1
+
+async def ws_client(app: str, gamePk: int, protocol: str, lags: Lags, stop: asyncio.Event):
+    url = app.replace("http", "ws", 1) + f"/ws/game/{gamePk}?protocol={protocol}"
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            while not stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), 1.0)
+                except asyncio.TimeoutError:
+                    continue
+                lags.record("ws", raw)
+    except Exception:
+        if not stop.is_set():
+            lags.errors += 1
+
+class ProcSampler:
+    """CPU seconds and RSS of a process and its children (uvicorn workers) from /proc (Linux);
+    None elsewhere."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.rss_max = 0.0
+
+    def pids(self) -> List[int]:
+        out, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            out.append(pid)
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children") as f:
+                    todo.extend(int(c) for c in f.read().split())
+            except (OSError, ValueError):
+                pass
+        return out
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            total = 0.0
+            for pid in self.pids():
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                total += (int(fields[11]) + int(fields[12])) / self.tick   # utime + stime
+            return total
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def rss_mb(self) -> Optional[float]:
+        try:
+            rss = 0.0
+            for pid in self.pids():
+                with open(f"/proc/{pid}/status") as f:
+                    m = re.search(r"VmRSS:\s+(\d+) kB", f.read())
+                rss += int(m.group(1)) / 1024 if m else 0.0
+        except OSError:
+            return None
+        if rss:
+            self.rss_max = max(self.rss_max, rss)
+        return rss
+
+def stage_means(text: str) -> Dict[str, Optional[float]]:
+    """Mean milliseconds per observation for each STAGES histogram (summed over labels)."""
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for line in text.splitlines():
+        m = re.match(r"(\w+)_(sum|count)(?:\{[^}]*\})? (\S+)$", line)
+        if m and m.group(1) in STAGES:
+            acc = sums if m.group(2) == "sum" else counts
+            acc[m.group(1)] = acc.get(m.group(1), 0.0) + float(m.group(3))
+    return {name: round(sums[name] / counts[name] * 1000, 4) if counts.get(name) else None for name in STAGES}
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def wait_ready(app: str, proc: subprocess.Popen, timeout: float = 30.0):
+    t0 = time.monotonic()
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"app exited with {proc.returncode}")
+            try:
+                if (await client.get(f"{app}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("app did not become ready")
+
+async def drive(args, app: str, standin, proc: subprocess.Popen) -> Dict[str, Any]:
+    await wait_ready(app, proc)
+    date = datetime.date.today().isoformat()
+    games = [synthetic_pk(date, slot) for slot in range(args.games)]
+    sampler = ProcSampler(proc.pid)
+    lags = Lags(time.time() + args.warmup)
+    stop = asyncio.Event()
+    n_ws = int(round(args.clients * args.ws_share)) if websockets else 0
+    if args.ws_share and websockets is None:
+        print("[LOAD] websockets not installed; all clients use SSE")
+    tasks = []
+    for i in range(args.clients):
+        client = ws_client if i < n_ws else sse_client
+        tasks.append(asyncio.create_task(client(app, games[i % len(games)], args.protocol, lags, stop)))
+
+    await asyncio.sleep(args.warmup)
+    req0, cpu0, t0 = standin.requests, sampler.cpu_seconds(), time.monotonic()
+    recv0 = lags.received
+    while time.monotonic() - t0 < args.duration:
+        await asyncio.sleep(1.0)
+        sampler.rss_mb()
+    elapsed = time.monotonic() - t0
+    req1, cpu1, recv1 = standin.requests, sampler.cpu_seconds(), lags.received
+    async with httpx.AsyncClient() as client:
+        text = (await client.get(f"{app}/metrics")).text
+    stop.set()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    every = lags.by["sse"] + lags.by["ws"]
+    lag = {name: {"n": len(v), "p50_ms": _ms(percentile(v, 0.5)), "p99_ms": _ms(percentile(v, 0.99)),
+                  "max_ms": _ms(max(v) if v else None)}
+           for name, v in (("all", every), ("sse", lags.by["sse"]), ("ws", lags.by["ws"]))}
+    return {
+        "upstream_requests": req1 - req0,
+        "upstream_rps": round((req1 - req0) / elapsed, 2),
+        "messages_received": recv1 - recv0,
+        "messages_per_s": round((recv1 - recv0) / elapsed, 1),
+        "client_errors": lags.errors,
+        "lag": lag,
+        "server_cpu_pct": round((cpu1 - cpu0) / elapsed * 100, 1) if cpu0 is not None and cpu1 is not None else None,
+        "server_rss_mb": {"max": round(sampler.rss_max, 1) if sampler.rss_max else None, "end": _round(sampler.rss_mb())},
+        "stage_mean_ms": stage_means(text),
+    }
+
+def _ms(v: Optional[float]) -> Optional[float]:
+    return round(v * 1000, 1) if v is not None else None
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return round(v, 1) if v is not None else None
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print the headline numbers next to a saved run."""
+    def pick(r):
+        res = r["results"]
+        return {"upstream_rps": res["upstream_rps"], "messages_per_s": res["messages_per_s"],
+                "lag_p50_ms": res["lag"]["all"]["p50_ms"], "lag_p99_ms": res["lag"]["all"]["p99_ms"],
+                "server_cpu_pct": res["server_cpu_pct"], "server_rss_max_mb": res["server_rss_mb"]["max"],
+                **{f"{k}_ms": v for k, v in res["stage_mean_ms"].items()}}
+    cur, base = pick(results), pick(baseline)
+    print(f"[LOAD] vs {baseline.get('git')} ({baseline.get('started')})")
+    for k, v in cur.items():
+        b = base.get(k)
+        change = f"{(v - b) / b * 100:+.1f}%" if isinstance(v, (int, float)) and isinstance(b, (int, float)) and b else ""
+        print(f"  {k:<48} {b!s:>10} -> {v!s:>10} {change}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Load-test the live pipeline against the StatsAPI stand-in")
+    ap.add_argument("--games", type=int, default=5)
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--ws-share", type=float, default=0.5, help="fraction of clients on WebSocket (rest SSE)")
+    ap.add_argument("--protocol", choices=("full", "delta"), default="full")
+    ap.add_argument("--rate", type=float, default=1.0, help="playEvents revealed per second per game")
+    ap.add_argument("--live-start", type=int, default=0, help="playEvents already out when the test starts")
+    ap.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    ap.add_argument("--warmup", type=float, default=5.0, help="seconds before measuring (joins, first polls)")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers (>1 runs them on a local bus)")
+    ap.add_argument("--ws-deflate", choices=("on", "off"), default="on", help="server WebSocket permessage-deflate")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="stand-in response delay")
+    ap.add_argument("--standin-port", type=int, default=8790)
+    ap.add_argument("--app-port", type=int, default=8791)
+    ap.add_argument("--out", help="results JSON path (default bench/results/loadtest-<time>-<rev>.json)")
+    ap.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = ap.parse_args()
+
+    standin = serve(args.standin_port, synthetic=args.games, latency_ms=args.latency_ms,
+                    live_rate=args.rate, live_start=args.live_start)
+    threading.Thread(target=standin.serve_forever, daemon=True).start()
+    tmp = tempfile.mkdtemp(prefix="gamecast-load-")
+    env = {**os.environ, "STATSAPI": f"http://127.0.0.1:{args.standin_port}", "REPLAY_DB": os.path.join(tmp, "replay.db"),
+           "LOG_SAMPLE": "0", "RECORD_LIVE": "0"}
+    log = open(os.path.join(tmp, "app.log"), "w")
+    broker = None
+    if args.workers > 1:
+        sock = os.path.join(tmp, "bus.sock")
+        broker = subprocess.Popen([sys.executable, "bus_broker.py", "--unix", sock], cwd=BACKEND,
+                                  stdout=log, stderr=subprocess.STDOUT)
+        env["BUS"] = f"unix://{sock}"
+        time.sleep(0.5)
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "fastapi_app:app", "--host", "127.0.0.1",
+                             "--port", str(args.app_port), "--log-level", "warning", "--workers", str(args.workers),
+                             "--ws-per-message-deflate", "true" if args.ws_deflate == "on" else "false"],
+                            cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+    started = datetime.datetime.now().isoformat(timespec="seconds")
+    print(f"[LOAD] {args.games} games @ {args.rate} events/s, {args.clients} clients "
+          f"(ws share {args.ws_share}, {args.protocol}), {args.duration:.0f}s after {args.warmup:.0f}s warmup")
+    try:
+        results = asyncio.run(drive(args, f"http://127.0.0.1:{args.app_port}", standin.standin, proc))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if broker is not None:
+            broker.terminate()
+        standin.shutdown()
+        log.close()
+        print(f"[LOAD] app log: {log.name}")
+
+    run = {"started": started, "git": git_rev(), "python": sys.version.split()[0],
+           "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}, "results": results}
+    print(json.dumps(results, indent=2))
+    out = args.out or os.path.join(BACKEND, "bench", "results",
+                                   f"loadtest-{started.replace(':', '').replace('-', '')}-{run['git'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"[LOAD] saved {out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(run, json.load(f))
+
+if __name__ == "__main__":
+    main()
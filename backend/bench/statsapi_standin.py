@@ -0,0 +1,316 @@
+# statsapi_standin.py — local stand-in for the StatsAPI endpoints this backend uses
+# Serves schedule, feed/live and linescore from saved JSON (the layout backfill.py
+# --save-dir writes: DIR/schedule/<date>.json, DIR/feed/<gamePk>.json) and, with
+# --synthetic N, generates N complete games per date for dates with no saved data.
+# No diffPatch: LiveFeed gets a 404 and falls back to full fetches.
+# With --live-rate R every game is "In Progress" and its feed grows by R playEvents per
+# second from startup (after --live-start already shown); each revealed event's
+# startTime is the wall-clock time it appeared, so clients can measure delivery lag.
+#   python bench/statsapi_standin.py --port 8700 --synthetic 15 [--dir saved/] [--latency-ms 40]
+#                                    [--live-rate 0.5 --live-start 20]
+#   STATSAPI=http://127.0.0.1:8700 python backfill.py --start 2025-04-01 --end 2025-04-07
+
+import argparse, datetime, json, os, random, re, sys, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reducer import EVENT_SPEC, RESULTS  # noqa: E402
+
+SYNTHETIC_BASE = 900000000   # synthetic gamePk = base + days since 2000-01-01 * 100 + slot
+EPOCH = datetime.date(2000, 1, 1)
+TEAMS = ["Comets", "Moon Bats", "Tide", "Harbor Hawks", "Pines", "Foxes", "Rail Kings", "Owls",
+         "Barons", "Lanterns", "Miners", "Gulls", "Rockets", "Stags", "Herons", "Quarrymen"]
+PITCH_TYPES = [("FF", "Four-Seam Fastball", 95), ("SL", "Slider", 86), ("CH", "Changeup", 85),
+               ("CU", "Curveball", 79), ("SI", "Sinker", 93)]
+BREAK = {"FF": (-8, -15), "SL": (4, -28), "CH": (-14, -24), "CU": (8, -42), "SI": (-16, -22)}   # (aX, aZ) ft/s²
+CALLS = [("B", "Ball"), ("C", "Called Strike"), ("S", "Swinging Strike"), ("F", "Foul")]
+OUTCOMES = [("field_out", "Groundout", 30), ("strikeout", "Strikeout", 22), ("single", "Single", 15),
+            ("walk", "Walk", 8), ("double", "Double", 5), ("home_run", "Home Run", 3),
+            ("grounded_into_double_play", "Grounded Into DP", 2), ("sac_fly", "Sac Fly", 1),
+            ("hit_by_pitch", "Hit By Pitch", 1), ("triple", "Triple", 1)]
+
+def synthetic_pk(date: str, slot: int) -> int:
+    return SYNTHETIC_BASE + (datetime.date.fromisoformat(date) - EPOCH).days * 100 + slot
+
+def synthetic_date(gamePk: int) -> Optional[str]:
+    if gamePk < SYNTHETIC_BASE:
+        return None
+    return (EPOCH + datetime.timedelta(days=(gamePk - SYNTHETIC_BASE) // 100)).isoformat()
+
+def pitch_physics(code: str, mph: float, px: float, pz: float, rnd: random.Random) -> Dict[str, float]:
+    """Constant-acceleration fit (as in pitchData.coordinates) that crosses the plate at (px, pz)."""
+    ax, az = BREAK[code]
+    ay = 28.0 + rnd.uniform(-3, 3)
+    vy = -mph * 1.46667 * 0.99
+    c = 50.0 - 17.0 / 12.0
+    t = (-vy - (vy * vy - 2 * ay * c) ** 0.5) / ay      # time from y0 = 50 ft to the plate
+    x0, z0 = -1.6 + rnd.uniform(-0.3, 0.3), 5.9 + rnd.uniform(-0.3, 0.3)
+    return {"x0": round(x0, 3), "y0": 50.0, "z0": round(z0, 3),
+            "vX0": round((px - x0 - 0.5 * ax * t * t) / t, 3), "vY0": round(vy, 3),
+            "vZ0": round((pz - z0 - 0.5 * az * t * t) / t, 3),
+            "aX": ax, "aY": round(ay, 3), "aZ": az}
+
+def synthetic_schedule(date: str, n: int) -> Dict[str, Any]:
+    games = []
+    for slot in range(n):
+        away, home = TEAMS[(2 * slot) % len(TEAMS)], TEAMS[(2 * slot + 1) % len(TEAMS)]
+        games.append({"gamePk": synthetic_pk(date, slot), "status": {"detailedState": "Final"},
+                      "teams": {"away": {"team": {"name": away}}, "home": {"team": {"name": home}}}})
+    return {"dates": [{"date": date, "games": games}]}
+
+def synthetic_feed(gamePk: int) -> Dict[str, Any]:
+    """A complete nine-inning game in the /feed/live shape (plays, pitches, linescore)."""
+    rnd = random.Random(gamePk)
+    date = synthetic_date(gamePk) or EPOCH.isoformat()
+    slot = gamePk % 100
+    t = datetime.datetime.fromisoformat(date + "T23:05:00")
+    names, weights = [o[0] for o in OUTCOMES], [o[2] for o in OUTCOMES]
+    labels = {o[0]: o[1] for o in OUTCOMES}
+    plays, score, ab = [], [0, 0], 0
+    teams = ((2 * slot) % len(TEAMS), (2 * slot + 1) % len(TEAMS))
+    day = (gamePk - SYNTHETIC_BASE) // 100
+    players: Dict[str, Any] = {}
+    for inning in range(1, 10):
+        for side, half in enumerate(("top", "bottom")):
+            outs, bases = 0, 0
+            while outs < 3:
+                et = rnd.choices(names, weights)[0]
+                if RESULTS[et][bases][2] + outs > 3 or (et == "sac_fly" and outs == 2):
+                    et = "field_out"
+                balls = strikes = 0
+                pitches = []
+                while True:
+                    last = (et == "walk" and balls == 3) or (et == "strikeout" and strikes == 2) \
+                        or (et not in ("walk", "strikeout") and rnd.random() < 0.3)
+                    if last:
+                        code, desc = {"walk": ("B", "Ball"), "strikeout": ("S", "Swinging Strike"),
+                                      "hit_by_pitch": ("H", "Hit By Pitch")}.get(et, ("X", "In play, out(s)"))
+                        if EVENT_SPEC[et][0] and code == "X":
+                            code, desc = ("E", "In play, run(s)") if et == "home_run" else ("D", "In play, no out")
+                    else:
+                        code, desc = rnd.choice(CALLS)
+                        if (code == "B" and balls == 3) or (code in ("C", "S") and strikes == 2):
+                            code, desc = "F", "Foul"   # keep the PA going until its scripted result
+                    if code == "B" and not last: balls += 1
+                    elif code in ("C", "S", "F") and not last: strikes = min(2, strikes + 1)
+                    pt = rnd.choice(PITCH_TYPES)
+                    mph = round(pt[2] + rnd.uniform(-2.5, 2.5), 1)
+                    px, pz = round(rnd.uniform(-1.2, 1.2), 3), round(rnd.uniform(1.0, 4.0), 3)
+                    t += datetime.timedelta(seconds=rnd.randint(14, 28))
+                    pitches.append({
+                        "isPitch": True, "pitchNumber": len(pitches) + 1,
+                        "startTime": t.isoformat(timespec="milliseconds") + "Z",
+                        "details": {"isPitch": True, "code": code, "call": {"code": code, "description": desc},
+                                    "description": desc, "type": {"code": pt[0], "description": pt[1]}},
+                        "count": {"balls": balls + (code == "B" and last), "strikes": strikes + (last and code in ("C", "S")),
+                                  "outs": outs},
+                        "pitchData": {"startSpeed": mph, "strikeZoneTop": 3.4, "strikeZoneBottom": 1.6,
+                                      "extension": round(6.3 + rnd.uniform(-0.4, 0.4), 2),
+                                      "coordinates": {"pX": px, "pZ": pz, **pitch_physics(pt[0], mph, px, pz, rnd)}},
+                    })
+                    if last:
+                        break
+                bases, runs, add = RESULTS[et][bases]
+                outs += add
+                score[side] += runs
+                # five-man rotation per team, bullpen from the seventh
+                fielding = teams[1 - side]
+                pitcher = 500000 + fielding * 10 + (day % 5 if inning < 7 else 5 + inning % 3)
+                batter = 600000 + teams[side] * 10 + ab % 9
+                for pid in (pitcher, batter):
+                    players.setdefault(f"ID{pid}", {"id": pid, "fullName": f"{TEAMS[pid // 10 % 100 % len(TEAMS)]} #{pid % 10}"})
+                matchup = {"batter": {"id": batter}, "pitcher": {"id": pitcher}}
+                for bit, key in ((1, "postOnFirst"), (2, "postOnSecond"), (4, "postOnThird")):
+                    if bases & bit and outs < 3:
+                        matchup[key] = {"id": 1}
+                plays.append({
+                    "atBatIndex": ab, "matchup": matchup, "playEvents": pitches,
+                    "about": {"atBatIndex": ab, "inning": inning, "halfInning": half, "isComplete": True,
+                              "startTime": pitches[0]["startTime"], "endTime": pitches[-1]["startTime"]},
+                    "result": {"type": "atBat", "eventType": et, "event": labels[et],
+                               "awayScore": score[0], "homeScore": score[1]},
+                    "count": {"balls": 0, "strikes": 0, "outs": outs},
+                })
+                ab += 1
+    away, home = TEAMS[teams[0]], TEAMS[teams[1]]
+    return {
+        "gamePk": gamePk,
+        "metaData": {"timeStamp": t.strftime("%Y%m%d_%H%M%S")},
+        "gameData": {"datetime": {"officialDate": date}, "status": {"detailedState": "Final"},
+                     "teams": {"away": {"name": away}, "home": {"name": home}}, "players": players},
+        "liveData": {
+            "plays": {"allPlays": plays},
+            "linescore": {"currentInning": 9, "inningHalf": "Bottom", "outs": 3, "balls": 0, "strikes": 0,
+                          "teams": {"away": {"runs": score[0]}, "home": {"runs": score[1]}}, "offense": {}},
+        },
+    }
+
+def _iso(epoch: float) -> str:
+    return datetime.datetime.utcfromtimestamp(epoch).isoformat(timespec="milliseconds") + "Z"
+
+def event_count(doc: Dict[str, Any]) -> int:
+    return sum(len(p.get("playEvents") or []) for p in doc["liveData"]["plays"]["allPlays"])
+
+def partial_feed(doc: Dict[str, Any], shown: int, t0: float, rate: float) -> Dict[str, Any]:
+    """doc as it looked with its first `shown` playEvents out; event n appeared at t0 + (n + 1) / rate."""
+    plays, n = [], 0
+    for play in doc["liveData"]["plays"]["allPlays"]:
+        if n >= shown:
+            break
+        events = play.get("playEvents") or []
+        take = min(len(events), shown - n)
+        out = [{**pe, "startTime": _iso(t0 + (n + i + 1) / rate)} for i, pe in enumerate(events[:take])]
+        n += take
+        about = {**play.get("about", {}), "startTime": out[0]["startTime"] if out else None}
+        if take == len(events):
+            plays.append({**play, "playEvents": out, "about": {**about, "endTime": out[-1]["startTime"] if out else None}})
+        else:
+            plays.append({**play, "playEvents": out, "result": {"type": "atBat"},
+                          "about": {**about, "isComplete": False}})
+    final = shown >= event_count(doc)
+    gd = doc["gameData"]
+    return {**doc,
+            "metaData": {"timeStamp": datetime.datetime.utcfromtimestamp(t0 + shown / rate).strftime("%Y%m%d_%H%M%S")},
+            "gameData": {**gd, "status": {"detailedState": "Final" if final else "In Progress"}},
+            "liveData": {**doc["liveData"], "plays": {**doc["liveData"]["plays"], "allPlays": plays}}}
+
+class StandIn:
+    def __init__(self, directory: Optional[str], synthetic: int, latency: float,
+                 live_rate: float = 0.0, live_start: int = 0):
+        self.dir = directory
+        self.synthetic = synthetic
+        self.latency = latency
+        self.live_rate = live_rate
+        self.started = time.time() - live_start / live_rate if live_rate else time.time()
+        self._feeds: Dict[int, bytes] = {}
+        self._docs: Dict[int, Tuple[Dict[str, Any], int]] = {}    # live mode: parsed feed, event count
+        self._grown: Dict[int, Tuple[int, bytes]] = {}            # live mode: last (shown, body)
+        self.requests = 0
+
+    def shown(self) -> int:
+        """playEvents revealed per game so far (live mode)."""
+        return int((time.time() - self.started) * self.live_rate)
+
+    def _saved(self, kind: str, name: str) -> Optional[bytes]:
+        if not self.dir:
+            return None
+        path = os.path.join(self.dir, kind, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+
+    def schedule(self, date: str) -> Optional[bytes]:
+        saved = self._saved("schedule", date)
+        if saved is None and self.synthetic:
+            saved = json.dumps(synthetic_schedule(date, self.synthetic)).encode()
+        if saved is not None and self.live_rate:
+            data = json.loads(saved)
+            for d in data.get("dates", []):
+                for g in d.get("games", []):
+                    doc = self._doc(g["gamePk"])
+                    if doc is not None:
+                        g["status"] = {"detailedState": "Final" if self.shown() >= doc[1] else "In Progress"}
+            saved = json.dumps(data).encode()
+        return saved
+
+    def _doc(self, gamePk: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        doc = self._docs.get(gamePk)
+        if doc is None:
+            body = self._full(gamePk)
+            if body is None:
+                return None
+            data = json.loads(body)
+            doc = self._docs[gamePk] = (data, event_count(data))
+        return doc
+
+    def feed(self, gamePk: int) -> Optional[bytes]:
+        if not self.live_rate:
+            return self._full(gamePk)
+        doc = self._doc(gamePk)
+        if doc is None:
+            return None
+        shown = min(self.shown(), doc[1])
+        grown = self._grown.get(gamePk)
+        if grown is None or grown[0] != shown:
+            grown = self._grown[gamePk] = (shown, json.dumps(partial_feed(doc[0], shown, self.started, self.live_rate)).encode())
+        return grown[1]
+
+    def _full(self, gamePk: int) -> Optional[bytes]:
+        body = self._feeds.get(gamePk) or self._saved("feed", str(gamePk))
+        if body is None and self.synthetic and synthetic_date(gamePk):
+            body = json.dumps(synthetic_feed(gamePk)).encode()
+            if len(self._feeds) > 256:
+                self._feeds.clear()
+            self._feeds[gamePk] = body
+        return body
+
+    def linescore(self, gamePk: int) -> Optional[bytes]:
+        feed = self.feed(gamePk)
+        return json.dumps(json.loads(feed)["liveData"]["linescore"]).encode() if feed else None
+
+    def handle(self, path: str, query: Dict[str, Any]) -> Optional[bytes]:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if path == "/api/v1/schedule":
+            return self.schedule((query.get("date") or [datetime.date.today().isoformat()])[0])
+        m = re.fullmatch(r"/api/v1\.1/game/(\d+)/feed/live", path)
+        if m:
+            return self.feed(int(m.group(1)))
+        m = re.fullmatch(r"/api/v1/game/(\d+)/linescore", path)
+        if m:
+            return self.linescore(int(m.group(1)))
+        return None
+
+def make_handler(standin: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            body = standin.handle(url.path, parse_qs(url.query))
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+def serve(port: int, directory: Optional[str] = None, synthetic: int = 0, latency_ms: float = 0.0,
+          live_rate: float = 0.0, live_start: int = 0) -> ThreadingHTTPServer:
+    standin = StandIn(directory, synthetic, latency_ms / 1000.0, live_rate, live_start)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(standin))
+    server.daemon_threads = True
+    server.standin = standin
+    return server
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8700)
+    ap.add_argument("--dir", help="saved JSON (schedule/<date>.json, feed/<gamePk>.json)")
+    ap.add_argument("--synthetic", type=int, default=0, help="generate N final games per date without saved data")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--live-rate", type=float, default=0.0, help="grow every feed by R playEvents/s (0 = serve complete games)")
+    ap.add_argument("--live-start", type=int, default=0, help="playEvents already shown at startup (live mode)")
+    args = ap.parse_args()
+    server = serve(args.port, args.dir, args.synthetic, args.latency_ms, args.live_rate, args.live_start)
+    print(f"StatsAPI stand-in on http://127.0.0.1:{args.port} dir={args.dir} synthetic={args.synthetic} "
+          f"live_rate={args.live_rate}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
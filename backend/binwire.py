@@ -0,0 +1,130 @@
+# binwire.py — compact binary WebSocket subprotocol for pitch events
+# Negotiated with Sec-WebSocket-Protocol: gamecast.bin.v1 on /ws/game/{gamePk}.
+# Pitch events go out as fixed-layout little-endian binary frames (39 bytes);
+# everything else (snapshots, acks, keepalives) stays JSON text. Pitch-type and
+# outcome strings are interned to one-byte codes; a connection is sent a small
+# dictionary frame the first time it meets a code.
+#
+# Pitch frame  (type 0x01), struct "<BIIHBBBBBBHhhBBIIIH":
+#   type, seq, gamePk, atBatIndex, pitchNumber, inning,
+#   flags (bit0 bottom half, bits1-2 outs, bit3/4/5 runner on 1st/2nd/3rd, bit6 replay key),
+#   count (balls << 4 | strikes), pitchType code, outcome code,
+#   mph*10 (0xFFFF = none), locX*1000, locZ*1000 (-32768 = none),
+#   away score, home score, batterId, pitcherId, ts seconds, ts milliseconds
+# Dictionary frame (type 0x02): type, table (0 pitchType, 1 outcome), code, UTF-8 text
+
+import datetime, struct
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from protocol import StreamEvent
+
+SUBPROTOCOL = "gamecast.bin.v1"
+
+PITCH = struct.Struct("<BIIHBBBBBBHhhBBIIIH")
+DICT_HEADER = struct.Struct("<BBB")
+T_PITCH, T_DICT = 0x01, 0x02
+TABLE_PITCH_TYPE, TABLE_OUTCOME = 0, 1
+NO_MPH, NO_LOC = 0xFFFF, -32768
+OVERFLOW = 255   # code for strings once a table is full
+
+class Interner:
+    """Process-wide string → one-byte code tables (0 = none, 1..254 assigned on first sight)."""
+
+    def __init__(self):
+        self.codes: List[Dict[str, int]] = [{}, {}]
+        self.strings: List[Dict[int, str]] = [{}, {}]
+
+    def code(self, table: int, s: Optional[str]) -> int:
+        if not s:
+            return 0
+        c = self.codes[table].get(s)
+        if c is None:
+            if len(self.codes[table]) >= OVERFLOW - 1:
+                return OVERFLOW
+            c = len(self.codes[table]) + 1
+            self.codes[table][s] = c
+            self.strings[table][c] = s
+        return c
+
+    def dict_frame(self, table: int, code: int) -> bytes:
+        return DICT_HEADER.pack(T_DICT, table, code) + self.strings[table][code].encode("utf-8")
+
+interner = Interner()
+
+def _u(v: Any, hi: int) -> int:
+    try:
+        return max(0, min(hi, int(v)))
+    except (TypeError, ValueError):
+        return 0
+
+def _fixed(v: Any, scale: int, none: int, lo: int, hi: int) -> int:
+    if v is None:
+        return none
+    try:
+        return max(lo, min(hi, int(round(float(v) * scale))))
+    except (TypeError, ValueError):
+        return none
+
+def _ts(ts: Optional[str]) -> Tuple[int, int]:
+    try:
+        t = datetime.datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0, 0
+    return int(t), int(round((t - int(t)) * 1000)) % 1000
+
+def _encode(se: StreamEvent) -> Tuple[bytes, Tuple[int, int]]:
+    ev = se.event
+    pitch = ev.get("pitch") or {}
+    loc = pitch.get("loc") or {}
+    game = ev.get("game") or {}
+    count = game.get("count") or ev.get("count") or {}
+    bases = game.get("bases") or ev.get("bases") or {}
+    score = ev.get("score") or {}
+    half = game.get("half") or ev.get("half")
+    batter = ev.get("batterId") or (ev.get("batter") or {}).get("id")
+    pitcher = ev.get("pitcherId") or (ev.get("pitcher") or {}).get("id")
+    key = str(se.key or "")
+
+    flags = (1 if str(half or "").lower().startswith("bot") else 0)
+    flags |= _u(game.get("outs", ev.get("outs")), 3) << 1
+    flags |= (bool(bases.get("onFirst", ev.get("onFirst"))) << 3)
+    flags |= (bool(bases.get("onSecond", ev.get("onSecond"))) << 4)
+    flags |= (bool(bases.get("onThird", ev.get("onThird"))) << 5)
+    flags |= (key.startswith("db-") << 6)
+
+    ptype = interner.code(TABLE_PITCH_TYPE, ev.get("pitchType") or pitch.get("type"))
+    outcome = interner.code(TABLE_OUTCOME, ev.get("outcome") or pitch.get("outcome"))
+    secs, ms = _ts(ev.get("ts"))
+    frame = PITCH.pack(
+        T_PITCH, _u(se.seq, 0xFFFFFFFF), _u(ev.get("gamePk"), 0xFFFFFFFF),
+        _u(ev.get("atBatIndex"), 0xFFFF), _u(ev.get("pitchNumber") or pitch.get("number"), 0xFF),
+        _u(game.get("inning", ev.get("inning")), 0xFF), flags,
+        (_u(count.get("balls"), 15) << 4) | _u(count.get("strikes"), 15),
+        ptype, outcome,
+        _fixed(ev.get("mph") or pitch.get("mph"), 10, NO_MPH, 0, 0xFFFE),
+        _fixed(ev.get("locX", loc.get("px")), 1000, NO_LOC, -32767, 32767),
+        _fixed(ev.get("locZ", loc.get("pz")), 1000, NO_LOC, -32767, 32767),
+        _u(score.get("away"), 0xFF), _u(score.get("home"), 0xFF),
+        _u(batter, 0xFFFFFFFF), _u(pitcher, 0xFFFFFFFF), secs, ms,
+    )
+    return frame, (ptype, outcome)
+
+def pitch_frame(se: StreamEvent) -> Tuple[bytes, Tuple[int, int]]:
+    """(binary frame, (pitchType code, outcome code)); encoded once per event."""
+    return se.cached(("bin", "ws"), lambda: _encode(se))
+
+class BinarySender:
+    """Per-connection state: which dictionary codes this client has already been sent."""
+
+    def __init__(self):
+        self.known: Set[Tuple[int, int]] = set()
+
+    def frames(self, se: StreamEvent) -> List[bytes]:
+        frame, codes = pitch_frame(se)
+        out = []
+        for table, code in zip((TABLE_PITCH_TYPE, TABLE_OUTCOME), codes):
+            if 0 < code < OVERFLOW and (table, code) not in self.known:
+                self.known.add((table, code))
+                out.append(interner.dict_frame(table, code))
+        out.append(frame)
+        return out
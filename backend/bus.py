@@ -0,0 +1,370 @@
+# bus.py — cross-process event bus and game leases for multi-worker deployments
+# With BUS unset every process is self-contained (each polls the games its clients
+# watch). With BUS=redis://host:port[/db] or BUS=unix:///path/to.sock, all uvicorn
+# workers and nodes share one broker: Redis, or bus_broker.py on a single box. Per
+# game, one process holds a lease (SET NX PX, renewed every LEASE_TTL/3) and runs the
+# ingestion producer; it publishes each reduced event on the game's channel and
+# appends it to a bounded history list. Every other process serves its clients from
+# the channel: its hub's producer replays the history, then follows live. Followers
+# retry the lease every LEASE_TTL/2, so a dead or partitioned owner is taken over
+# within about LEASE_TTL; idempotencyKeys make the handover free of duplicates. Each
+# stream remembers only its last `history` keys plus the furthest play position it has
+# forgotten, so a new owner re-reading the game from the start publishes nothing old.
+
+import asyncio, logging, os, socket, uuid
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from hub import HUB_FINAL_TTL, RESUME_BUFFER, Producer
+from metrics import BUS_EVENTS, BUS_TAKEOVERS
+from protocol import dumps, loads
+
+logger = logging.getLogger("gamecast")
+
+BUS_URL = os.getenv("BUS", "")                                   # "" = single process, no bus
+LEASE_TTL = float(os.getenv("BUS_LEASE_TTL", "10"))              # seconds an owner may go silent
+HISTORY_TTL = 6 * 3600                                           # history of a game nobody finishes
+END = {"event": "end"}
+
+# compare-and-renew / compare-and-delete: only the holder may extend or drop its lease
+RENEW_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end")
+RELEASE_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                  "return redis.call('del', KEYS[1]) else return 0 end")
+
+class BusError(Exception):
+    """Error reply from the broker."""
+
+# --- RESP (Redis serialization protocol), the subset both ends need ---
+def encode_command(*args: Any) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for a in args:
+        b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+    return b"".join(out)
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """One RESP value: str (simple), int, bytes/None (bulk), list, or BusError (not raised)."""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("bus connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode("utf-8")
+    if kind == b"-":
+        return BusError(rest.decode("utf-8"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        n = int(rest)
+        return None if n < 0 else (await reader.readexactly(n + 2))[:-2]
+    if kind == b"*":
+        n = int(rest)
+        return None if n < 0 else [await read_reply(reader) for _ in range(n)]
+    raise BusError(f"bad reply {line[:40]!r}")
+
+async def _connect(url: str):
+    u = urlparse(url)
+    if u.scheme == "unix":
+        reader, writer = await asyncio.open_unix_connection(u.path)
+    elif u.scheme in ("redis", "tcp"):
+        reader, writer = await asyncio.open_connection(u.hostname or "127.0.0.1", u.port or 6379)
+    else:
+        raise ValueError(f"unsupported BUS url {url!r} (redis://host:port or unix:///path)")
+    conn = _Connection(reader, writer)
+    if u.password:
+        await conn.call("AUTH", u.password)
+    if u.scheme == "redis" and u.path.strip("/"):
+        await conn.call("SELECT", u.path.strip("/"))
+    return conn
+
+class _Connection:
+    """Request/response connection; one command in flight at a time."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._lock = asyncio.Lock()
+
+    async def call(self, *args: Any) -> Any:
+        return (await self.pipeline([args]))[0]
+
+    async def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """Send several commands in one write, then read their replies in order."""
+        async with self._lock:
+            self.writer.write(b"".join(encode_command(*c) for c in commands))
+            await self.writer.drain()
+            replies = [await read_reply(self.reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, BusError):
+                raise reply
+        return replies
+
+    def close(self):
+        self.writer.close()
+
+class _Subscription:
+    """A pub/sub connection to one channel; messages are buffered until get()."""
+
+    def __init__(self, conn: _Connection):
+        self.conn = conn
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._read())
+
+    async def _read(self):
+        try:
+            while True:
+                msg = await read_reply(self.conn.reader)
+                if isinstance(msg, list) and len(msg) == 3 and msg[0] == b"message":
+                    self.queue.put_nowait(msg[2])
+        except Exception as e:
+            self.queue.put_nowait(e if isinstance(e, (ConnectionError, BusError)) else ConnectionError(str(e)))
+
+    async def get(self) -> bytes:
+        item = await self.queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        self._task.cancel()
+        self.conn.close()
+
+class Bus:
+    """Leases, publish and follow over one broker URL; owner identifies this process."""
+
+    def __init__(self, url: str, lease_ttl: float = LEASE_TTL, history: int = RESUME_BUFFER):
+        self.url = url
+        self.lease_ttl = lease_ttl
+        self.history = history
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.owned: Set[Any] = set()        # games this process is ingesting
+        self.following: Set[Any] = set()    # games served from the channel
+        self._conn: Optional[_Connection] = None
+        self._connecting = asyncio.Lock()
+
+    async def _call(self, *args: Any) -> Any:
+        return (await self._pipeline([args]))[0]
+
+    async def _pipeline(self, commands: List[tuple]) -> List[Any]:
+        if self._conn is None:
+            async with self._connecting:
+                if self._conn is None:
+                    self._conn = await _connect(self.url)
+        try:
+            return await self._conn.pipeline(commands)
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            raise
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- leases ---
+    async def acquire(self, game: Any) -> bool:
+        return await self._call("SET", f"gamecast:lease:{game}", self.owner, "NX", "PX", int(self.lease_ttl * 1000)) == "OK"
+
+    async def renew(self, game: Any) -> bool:
+        return await self._call("EVAL", RENEW_SCRIPT, 1, f"gamecast:lease:{game}", self.owner,
+                                int(self.lease_ttl * 1000)) == 1
+
+    async def release(self, game: Any):
+        await self._call("EVAL", RELEASE_SCRIPT, 1, f"gamecast:lease:{game}", self.owner)
+
+    async def holder(self, game: Any) -> Optional[str]:
+        v = await self._call("GET", f"gamecast:lease:{game}")
+        return v.decode("utf-8") if v is not None else None
+
+    # --- events ---
+    async def publish(self, game: Any, ev: Dict[str, Any]):
+        body = dumps(ev)
+        hist = f"gamecast:history:{game}"
+        await self._pipeline([("RPUSH", hist, body), ("LTRIM", hist, -self.history, -1),
+                              ("EXPIRE", hist, int(HUB_FINAL_TTL if ev is END else HISTORY_TTL)),
+                              ("PUBLISH", f"gamecast:events:{game}", body)])
+        BUS_EVENTS.labels("published").inc()
+
+    async def replay(self, game: Any) -> List[bytes]:
+        return await self._call("LRANGE", f"gamecast:history:{game}", 0, -1) or []
+
+    async def subscribe(self, game: Any) -> _Subscription:
+        conn = await _connect(self.url)
+        try:
+            conn.writer.write(encode_command("SUBSCRIBE", f"gamecast:events:{game}"))
+            await conn.writer.drain()
+            ack = await read_reply(conn.reader)    # subscribed from here on
+            if isinstance(ack, BusError):
+                raise ack
+        except BaseException:
+            conn.close()
+            raise
+        return _Subscription(conn)
+
+    # --- hub producer ---
+    async def stream(self, game: Any, produce: Producer) -> AsyncIterator[Dict[str, Any]]:
+        """Hub producer for game across processes: own it (run produce, publish) while holding
+        the lease, otherwise follow the channel; ends with the game."""
+        seen = _Seen(self.history)
+        while True:
+            sub: Optional[_Subscription] = None
+            try:
+                sub = await self.subscribe(game)    # before the history: nothing falls in between
+                for body in await self.replay(game):
+                    ev = loads(body)
+                    if ev.get("event") == "end":
+                        return
+                    if seen.fresh(ev):
+                        yield ev
+                while True:
+                    if await self.acquire(game):
+                        part = self._own(game, produce, seen)
+                    else:
+                        part = self._follow(game, sub, seen)
+                    ended = False
+                    try:
+                        async for ev in part:
+                            if ev is END:
+                                ended = True
+                            else:
+                                yield ev
+                    finally:
+                        await part.aclose()   # owner: stop ingesting and release the lease now
+                    if ended:
+                        return
+            except (ConnectionError, OSError, asyncio.IncompleteReadError, BusError) as e:
+                logger.warning(f"[BUS] {game}: {e!r}; reconnecting")
+                await asyncio.sleep(1.0)
+            finally:
+                if sub is not None:
+                    sub.close()
+
+    async def _follow(self, game: Any, sub: _Subscription, seen: "_Seen") -> AsyncIterator[Dict[str, Any]]:
+        """Channel events until the next lease check is due; END once the game is over."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lease_ttl / 2
+        self.following.add(game)
+        try:
+            while (left := deadline - loop.time()) > 0:
+                try:
+                    body = await asyncio.wait_for(sub.get(), left)
+                except asyncio.TimeoutError:
+                    return
+                ev = loads(body)
+                BUS_EVENTS.labels("received").inc()
+                if ev.get("event") == "end":
+                    yield END
+                    return
+                if seen.fresh(ev):
+                    yield ev
+        finally:
+            self.following.discard(game)
+
+    async def _own(self, game: Any, produce: Producer, seen: "_Seen") -> AsyncIterator[Dict[str, Any]]:
+        """Run the producer under the lease: events not seen yet are published and yielded;
+        END once it completes. Returns early if the lease is lost or the producer fails."""
+        loop = asyncio.get_running_loop()
+        out: asyncio.Queue = asyncio.Queue()
+        failed = object()
+
+        async def ingest():
+            try:
+                async for ev in produce():
+                    out.put_nowait(ev)
+                out.put_nowait(END)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[BUS] producer error for {game}: {e}")
+                out.put_nowait(failed)
+
+        if seen:
+            BUS_TAKEOVERS.inc()
+        logger.info(f"[BUS] {self.owner} owns {game}" + (" (takeover)" if seen else ""))
+        self.owned.add(game)
+        task = loop.create_task(ingest(), name=f"ingest-{game}")
+        renewed = loop.time()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(out.get(), self.lease_ttl / 3)
+                except asyncio.TimeoutError:
+                    item = None
+                if loop.time() - renewed >= self.lease_ttl / 3:
+                    if not await self.renew(game):
+                        logger.warning(f"[BUS] lost lease on {game}; following")
+                        return
+                    renewed = loop.time()
+                if item is None:
+                    continue
+                if item is failed:
+                    return
+                if item is END:
+                    await self.publish(game, END)
+                    yield END
+                    return
+                if seen.fresh(item):
+                    await self.publish(game, item)
+                    yield item
+        finally:
+            task.cancel()
+            self.owned.discard(game)
+            try:
+                await self.release(game)
+            except Exception as e:   # the lease expires on its own
+                logger.warning(f"[BUS] release {game}: {e!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"url": self.url, "owner": self.owner, "lease_ttl": self.lease_ttl,
+                "owned": sorted(map(str, self.owned)), "following": sorted(map(str, self.following))}
+
+Position = Tuple[int, int]
+PLAY_LAST = 1 << 30   # a plate appearance's 'play' result sorts after its pitches
+
+def _position(ev: Dict[str, Any]) -> Optional[Position]:
+    """(atBatIndex, pitchNumber) order of a live event; None if it has none."""
+    ab = ev.get("atBatIndex")
+    if not isinstance(ab, int):
+        return None
+    if ev.get("event") == "play":
+        return (ab, PLAY_LAST)
+    pn = ev.get("pitchNumber")
+    return (ab, pn) if isinstance(pn, int) else None
+
+class _Seen:
+    """One game's recent idempotencyKeys (the last `size`) plus the furthest position among
+    keys already forgotten: an unknown key at or before that point is an old event too."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.keys: Set[Any] = set()
+        self.order: Deque[Tuple[Any, Optional[Position]]] = deque()
+        self.floor: Optional[Position] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.keys) or self.floor is not None
+
+    def fresh(self, ev: Dict[str, Any]) -> bool:
+        key = ev.get("idempotencyKey")
+        if key is None:
+            return True
+        if key in self.keys:
+            return False
+        pos = _position(ev)
+        if pos is not None and self.floor is not None and pos <= self.floor:
+            return False
+        self.keys.add(key)
+        self.order.append((key, pos))
+        if len(self.order) > self.size:
+            old, old_pos = self.order.popleft()
+            self.keys.discard(old)
+            if old_pos is not None and (self.floor is None or old_pos > self.floor):
+                self.floor = old_pos
+        return True
+
+def from_env() -> Optional[Bus]:
+    return Bus(BUS_URL) if BUS_URL else None
@@ -0,0 +1,217 @@
+# bus_broker.py — single-box broker for bus.py (the Redis subset it uses, in memory)
+# Run one next to the uvicorn workers and point them at its Unix socket:
+#   python bus_broker.py --unix /tmp/gamecast-bus.sock
+#   BUS=unix:///tmp/gamecast-bus.sock uvicorn fastapi_app:app --workers 4
+# or on TCP as a Redis stand-in for tests (BUS=redis://127.0.0.1:6390):
+#   python bus_broker.py --port 6390
+# Speaks RESP: PING, GET, SET [NX|XX] [PX|EX], DEL, EXPIRE, PEXPIRE, RPUSH, LTRIM,
+# LRANGE, PUBLISH, SUBSCRIBE, UNSUBSCRIBE, and EVAL of bus.py's two lease scripts.
+# Subscribers whose output backs up past SUB_OUTPUT_LIMIT are disconnected (like
+# Redis' client-output-buffer-limit for pub/sub), so one stuck worker can't grow it.
+
+import argparse, asyncio, logging, os, time
+from typing import Any, Dict, List, Optional, Set
+
+from bus import RELEASE_SCRIPT, RENEW_SCRIPT, BusError, read_reply
+
+logger = logging.getLogger("gamecast")
+
+SUB_OUTPUT_LIMIT = 8 * 1024 * 1024   # bytes pending to one subscriber before it is cut off
+
+class _Simple(str):
+    """Status reply (+OK) rather than a bulk string."""
+
+OK = _Simple("OK")
+
+def encode_reply(v: Any) -> bytes:
+    if v is None:
+        return b"$-1\r\n"
+    if isinstance(v, _Simple):
+        return b"+" + v.encode("utf-8") + b"\r\n"
+    if isinstance(v, BusError):
+        return b"-ERR " + str(v).encode("utf-8") + b"\r\n"
+    if isinstance(v, bool):
+        v = int(v)
+    if isinstance(v, int):
+        return b":%d\r\n" % v
+    if isinstance(v, str):
+        v = v.encode("utf-8")
+    if isinstance(v, bytes):
+        return b"$%d\r\n%s\r\n" % (len(v), v)
+    return b"*%d\r\n" % len(v) + b"".join(encode_reply(x) for x in v)
+
+def _span(n: int, start: int, stop: int) -> slice:
+    """Redis inclusive [start, stop] with negative indexes → Python slice."""
+    if start < 0:
+        start += n
+    if stop < 0:
+        stop += n
+    return slice(max(start, 0), max(stop + 1, 0))
+
+class Broker:
+    def __init__(self):
+        self.data: Dict[bytes, Any] = {}           # bytes (strings) or list (lists)
+        self.expires: Dict[bytes, float] = {}      # key -> monotonic deadline
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    # --- keyspace ---
+    def _live(self, key: bytes) -> Optional[Any]:
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _delete(self, key: bytes) -> int:
+        self.expires.pop(key, None)
+        return 1 if self.data.pop(key, None) is not None else 0
+
+    def _expire(self, key: bytes, seconds: float) -> int:
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.monotonic() + seconds
+        return 1
+
+    def _set(self, args: List[bytes]) -> Any:
+        key, value, opts = args[0], args[1], [a.upper() for a in args[2:]]
+        exists = self._live(key) is not None
+        if (b"NX" in opts and exists) or (b"XX" in opts and not exists):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        for unit, scale in ((b"PX", 0.001), (b"EX", 1.0)):
+            if unit in opts:
+                self.expires[key] = time.monotonic() + int(args[2 + opts.index(unit) + 1]) * scale
+        return OK
+
+    def _eval(self, args: List[bytes]) -> Any:
+        script, nkeys = args[0].decode("utf-8"), int(args[1])
+        keys, argv = args[2:2 + nkeys], args[2 + nkeys:]
+        if script not in (RENEW_SCRIPT, RELEASE_SCRIPT):
+            return BusError("only bus.py lease scripts are supported")
+        if self._live(keys[0]) != argv[0]:
+            return 0
+        if script == RENEW_SCRIPT:
+            return self._expire(keys[0], int(argv[1]) / 1000)
+        return self._delete(keys[0])
+
+    def _rpush(self, key: bytes, values: List[bytes]) -> Any:
+        lst = self._live(key)
+        if lst is None:
+            lst = self.data[key] = []
+        elif not isinstance(lst, list):
+            return BusError("WRONGTYPE")
+        lst.extend(values)
+        return len(lst)
+
+    def _ltrim(self, key: bytes, start: int, stop: int) -> Any:
+        lst = self._live(key)
+        if isinstance(lst, list):
+            lst[:] = lst[_span(len(lst), start, stop)]
+            if not lst:
+                self._delete(key)
+        return OK
+
+    def _publish(self, channel: bytes, message: bytes) -> int:
+        frame = encode_reply([b"message", channel, message])
+        subs = self.channels.get(channel, ())
+        for w in list(subs):
+            if w.transport.get_write_buffer_size() > SUB_OUTPUT_LIMIT:
+                logger.warning(f"[BROKER] dropping slow subscriber on {channel!r}")
+                self._unsubscribe_all(w)
+                w.close()
+                continue
+            w.write(frame)
+        return len(subs)
+
+    def _unsubscribe_all(self, w: asyncio.StreamWriter):
+        for ch in [ch for ch, subs in self.channels.items() if w in subs]:
+            self.channels[ch].discard(w)
+            if not self.channels[ch]:
+                del self.channels[ch]
+
+    def execute(self, cmd: List[bytes], writer: asyncio.StreamWriter) -> Any:
+        name, args = cmd[0].upper(), cmd[1:]
+        if name == b"PING":
+            return _Simple("PONG")
+        if name in (b"AUTH", b"SELECT"):
+            return OK
+        if name == b"GET":
+            v = self._live(args[0])
+            return v if not isinstance(v, list) else BusError("WRONGTYPE")
+        if name == b"SET":
+            return self._set(args)
+        if name == b"DEL":
+            return sum(self._delete(k) for k in args)
+        if name == b"EXPIRE":
+            return self._expire(args[0], int(args[1]))
+        if name == b"PEXPIRE":
+            return self._expire(args[0], int(args[1]) / 1000)
+        if name == b"RPUSH":
+            return self._rpush(args[0], args[1:])
+        if name == b"LTRIM":
+            return self._ltrim(args[0], int(args[1]), int(args[2]))
+        if name == b"LRANGE":
+            lst = self._live(args[0]) or []
+            return lst[_span(len(lst), int(args[1]), int(args[2]))]
+        if name == b"PUBLISH":
+            return self._publish(args[0], args[1])
+        if name == b"EVAL":
+            return self._eval(args)
+        if name == b"SUBSCRIBE":
+            out = []
+            for ch in args:
+                self.channels.setdefault(ch, set()).add(writer)
+                out.append([b"subscribe", ch, sum(writer in s for s in self.channels.values())])
+            return out
+        if name == b"UNSUBSCRIBE":
+            self._unsubscribe_all(writer)
+            return [b"unsubscribe", None, 0]
+        return BusError(f"unknown command {name.decode('utf-8', 'replace')!r}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                cmd = await read_reply(reader)
+                if not isinstance(cmd, list) or not cmd:
+                    writer.write(encode_reply(BusError("expected a command array")))
+                    continue
+                try:
+                    reply = self.execute(cmd, writer)
+                except (IndexError, ValueError) as e:
+                    reply = BusError(f"bad arguments: {e}")
+                if cmd[0].upper() == b"SUBSCRIBE":
+                    writer.write(b"".join(encode_reply(r) for r in reply))   # one ack per channel
+                else:
+                    writer.write(encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._unsubscribe_all(writer)
+            writer.close()
+
+async def _main(args):
+    broker = Broker()
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        server = await asyncio.start_unix_server(broker.handle, path=args.unix)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(broker.handle, args.host, args.port)
+        where = f"{args.host}:{args.port}"
+    logger.info(f"[BROKER] listening on {where}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="In-memory pub/sub + lease broker for gamecast workers")
+    ap.add_argument("--unix", help="Unix socket path (single box)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6390)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(_main(ap.parse_args()))
+    except KeyboardInterrupt:
+        pass
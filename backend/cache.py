@@ -0,0 +1,61 @@
+# cache.py — small async TTL + LRU cache with single-flight fetches
+# Concurrent get_or_fetch() calls for the same key share one in-flight upstream request;
+# failures are handed to every waiter and not cached.
+
+import asyncio, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = self.misses = self.coalesced = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Cached value for key, else the result of one shared fetch() call."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._inflight[key] = asyncio.ensure_future(self._fill(key, fetch, ttl))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # retrieved even if every caller left
+        # shield: a cancelled caller must not cancel the fetch the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        try:
+            value = await fetch()
+            self.put(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "inflight": len(self._inflight),
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
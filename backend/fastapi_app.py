@@ -1,19 +1,30 @@
-
 # fastapi_app.py — integrated reducer + team names + PNA
-import os, time, json, logging, datetime
-import sqlite3
-from threading import Thread
-from queue import Queue, Empty
-from typing import Dict, Any, Optional
+import os, asyncio, logging, datetime, math, time
+from typing import Dict, Any, List, Optional
 
-import requests
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
-from mlb_live_stream import list_games, stream_pitches
+from mlb_live_stream import DONE_STATES, SCHEDULE_TTL, get_linescore, list_games, stream_pitches, teams_for
+from upstream import upstream
+import httpcache
+from poll_scheduler import BACKGROUND, polls
+from hub import HubRegistry
+import bus as event_bus
+import metrics
+from subscriber import Subscriber
+from recorder import PitchRecorder, prepare_db
+from replay import ReplayScheduler
+from replay_store import ReplayStore, parse_cursor
+from reducer import GameReducer
+from protocol import PROTOCOLS, StreamEvent, dumps, sse_frame
+from binwire import SUBPROTOCOL as BINARY_SUBPROTOCOL, BinarySender
+from scoreboard import ScoreboardRegistry
+from analytics import VIEWS as ANALYTICS_VIEWS, PitchAnalytics
+from trajectory import MAX_FPS, TRAJ_FPS, encode as encode_trajectory, parse_key, trajectories
 
 logger = logging.getLogger("gamecast")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -57,256 +68,438 @@ async def allow_private_network(request: Request, call_next):
 
 # --- Local Replay DB integration ---
 DB_PATH = os.getenv("REPLAY_DB", "gamecast-replay.db")
-
-def _db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+RECORD_LIVE = os.getenv("RECORD_LIVE", "0").lower() in ("1", "true", "yes")
+# Reads share a small pool of WAL-mode connections (replay_store); writes stay on the recorder thread.
+store = ReplayStore(DB_PATH)
+
+# Live-to-replay recorder (RECORD_LIVE=1): batches reduced live pitches into DB_PATH.
+recorder: Optional[PitchRecorder] = None
+
+@app.on_event("startup")
+def _start_recorder():
+    global recorder
+    prepare_db(DB_PATH)   # schema/WAL once, on a writer connection; the read pool never writes
+    if RECORD_LIVE:
+        recorder = PitchRecorder(DB_PATH)
+        logger.info(f"[REC] recording live games into {DB_PATH}")
+
+@app.on_event("shutdown")
+def _stop_recorder():
+    if recorder:
+        recorder.close()
+        logger.info(f"[REC] closed; wrote {recorder.written} pitches, dropped {recorder.dropped}")
+
+@app.on_event("shutdown")
+def _close_store():
+    store.close()
+
+@app.on_event("shutdown")
+async def _close_upstream():
+    await upstream.aclose()
+    if bus is not None:
+        await bus.close()
 
 def db_list_games(date: Optional[str]):
     if not date:
         date = datetime.datetime.utcnow().date().isoformat()
-    with _db() as c:
-        rows = c.execute(
-            "SELECT gamePk, away, home, status FROM games WHERE gameDate = ? ORDER BY home, away",
-            (date,),
-        ).fetchall()
-    return [dict(r) for r in rows]
+    return store.list_games(date)
 
 def db_get_teams(gamePk: int) -> Dict[str, str]:
-    with _db() as c:
-        r = c.execute("SELECT away, home FROM games WHERE gamePk = ?", (gamePk,)).fetchone()
-        if r:
-            return {"away": r["away"], "home": r["home"]}
-    return {"away": "Away", "home": "Home"}
-
-def db_stream_pitches(gamePk: int, speed: float = 1.0):
-    with _db() as c:
-        cur = c.execute(
-            "SELECT gamePk, atBatIndex, pitchNumber, inning, half, outs, balls, strikes, pitchType, mph, locX, locZ, outcome, ts FROM pitches WHERE gamePk = ? ORDER BY atBatIndex, pitchNumber",
-            (gamePk,),
-        )
-        for r in cur:
-            yield {
-                "event": "pitch",
-                "gamePk": r["gamePk"],
-                "ts": r["ts"] or datetime.datetime.utcnow().isoformat() + "Z",
-                "inning": r["inning"],
-                "half": r["half"],
-                "outs": r["outs"],
-                "count": {"balls": r["balls"], "strikes": r["strikes"]},
-                "batter": {"id": None, "name": None},
-                "pitcher": {"id": None, "name": None},
-                "pitch": {
-                    "number": r["pitchNumber"],
-                    "type": r["pitchType"],
-                    "mph": r["mph"],
-                    "outcome": r["outcome"],
-                    "loc": {"px": r["locX"], "pz": r["locZ"]},
-                    "zone": None,
-                },
-                "bases": {"onFirst": False, "onSecond": False, "onThird": False},
-                "atBatIndex": r["atBatIndex"],
-                "idempotencyKey": f"db-{r['gamePk']}-{r['atBatIndex']}-{r['pitchNumber']}",
-            }
-            time.sleep(max(0.05, 0.6 / max(0.1, speed)))  # sim pacing
-
-# --- Live helpers ---
-def live_get_teams(gamePk: int) -> Dict[str, str]:
-    """Fetch team names from StatsAPI for a given gamePk."""
-    try:
-        url = f"https://statsapi.mlb.com/api/v1.1/game/{gamePk}/feed/live"
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        home = data.get("gameData", {}).get("teams", {}).get("home", {}).get("name") or "Home"
-        away = data.get("gameData", {}).get("teams", {}).get("away", {}).get("name") or "Away"
-        return {"away": away, "home": home}
-    except Exception as e:
-        logger.warning(f"[LIVE] get teams failed for {gamePk}: {e}")
-        return {"away": "Away", "home": "Home"}
-
-# --- Server-side reducer ---
-class GameReducer:
-    def __init__(self, teams: Dict[str, str]):
-        self.state = {
-            "inning": 1,
-            "half": "top",
-            "outs": 0,
-            "count": {"balls": 0, "strikes": 0},
-            "bases": {"onFirst": False, "onSecond": False, "onThird": False},
-            "score": {"away": 0, "home": 0},
-            "teams": teams or {"away":"Away","home":"Home"},
-        }
-
-    def inning_change(self):
-        self.state["outs"] = 0
-        self.state["count"] = {"balls": 0, "strikes": 0}
-        self.state["bases"] = {"onFirst": False, "onSecond": False, "onThird": False}
-        if self.state["half"] == "top":
-            self.state["half"] = "bottom"
-        else:
-            self.state["half"] = "top"
-            self.state["inning"] += 1
-
-    def apply(self, ev: Dict[str, Any]) -> Dict[str, Any]:
-        # Sync baseline from event if present (don’t fight the upstream feed)
-        if "inning" in ev: self.state["inning"] = ev["inning"]
-        if "half" in ev: self.state["half"] = ev["half"]
-        if "outs" in ev: self.state["outs"] = ev["outs"]
-        if "count" in ev and isinstance(ev["count"], dict):
-            self.state["count"]["balls"] = ev["count"].get("balls", self.state["count"]["balls"])
-            self.state["count"]["strikes"] = ev["count"].get("strikes", self.state["count"]["strikes"])
-        if "bases" in ev and isinstance(ev["bases"], dict):
-            self.state["bases"].update(ev["bases"])
-
-        # Naive outcome-based updates (works best with Live feed)
-        outcome = (ev.get("pitch", {}) or {}).get("outcome", "") or (ev.get("result") or "")
-        ol = str(outcome).lower()
-
-        # Strikeout detection
-        if "strikeout" in ol or ("called strike" in ol and self.state["count"]["strikes"] >= 2):
-            self.state["outs"] = min(3, self.state["outs"] + 1)
-            self.state["count"] = {"balls": 0, "strikes": 0}
-        # Walk detection
-        if "walk" in ol:
-            self.state["count"] = {"balls": 0, "strikes": 0}
-            # very simple force advance: 1->2->3->run
-            if self.state["bases"]["onFirst"] and self.state["bases"]["onSecond"] and self.state["bases"]["onThird"]:
-                batting = "away" if self.state["half"] == "top" else "home"
-                self.state["score"][batting] += 1
-            # shift occupancy
-            self.state["bases"]["onThird"] = self.state["bases"]["onThird"] or (self.state["bases"]["onSecond"] and self.state["bases"]["onFirst"])
-            self.state["bases"]["onSecond"] = self.state["bases"]["onSecond"] or self.state["bases"]["onFirst"]
-            self.state["bases"]["onFirst"] = True
-
-        # In-play outs (very naive)
-        if "in play, out" in ol:
-            self.state["outs"] = min(3, self.state["outs"] + 1)
-            self.state["count"] = {"balls": 0, "strikes": 0}
-
-        # In-play run(s) naive detection
-        if "in play, run" in ol or "home run" in ol:
-            batting = "away" if self.state["half"] == "top" else "home"
-            self.state["score"][batting] += 1
-
-        # Handle inning end
-        if self.state["outs"] >= 3:
-            self.inning_change()
-
-        # Attach state snapshot to outgoing event
-        ev["teams"] = self.state["teams"]
-        ev["score"] = self.state["score"]
-        ev["game"] = {
-            "inning": self.state["inning"],
-            "half": self.state["half"],
-            "outs": self.state["outs"],
-            "count": self.state["count"],
-            "bases": self.state["bases"],
-        }
-        return ev
+    return store.teams(gamePk) or {"away": "Away", "home": "Home"}
+
+# --- HTTP caching: ETag/Last-Modified revalidation and compressed variants for REST JSON ---
+responses = httpcache.ResponseCache()
+SETTLED = tuple(s for s in DONE_STATES if s != "Suspended")   # game states that never change again
+
+def _settled(status: Optional[str]) -> bool:
+    return bool(status) and status.startswith(SETTLED)
+
+def _schedule_cache_control(date: Optional[str], games: List[Dict[str, Any]], source: str) -> str:
+    # The replay DB keeps filling past dates (backfill, recorder): db listings only revalidate.
+    if source == "db":
+        return httpcache.REVALIDATE
+    # West-coast games still run after midnight UTC: only dates before yesterday are history.
+    today = datetime.datetime.utcnow().date()
+    if date and date < (today - datetime.timedelta(days=1)).isoformat():
+        settled = games and all(_settled(g.get("status")) for g in games)
+        return httpcache.IMMUTABLE if settled else httpcache.short(3600)
+    return httpcache.short(SCHEDULE_TTL)
 
 # --- Routes ---
 @app.get("/health")
 def health():
     return {"status":"healthy","time":datetime.datetime.utcnow().isoformat()+"Z"}
 
+@app.get("/api/upstream")
+def api_upstream(recent: int = Query(20, ge=0, le=200)):
+    """StatsAPI client timings: per-host totals, the poll budget, and the most recent requests."""
+    last = list(upstream.recent)[-recent:] if recent else []
+    return {"hosts": upstream.stats(), "polls": polls.stats(),
+            "recent": [{"path": p, "status": st, "ms": round(ms, 1), "bytes": b} for p, st, ms, b in last]}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of the pipeline counters, histograms and gauges."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/bus")
+def api_bus():
+    """Cross-process bus: this process's owner id and the games it ingests or follows."""
+    return bus.stats() if bus is not None else {"url": None}
+
+@app.get("/api/subscribers")
+def api_subscribers():
+    """Live stream subscribers: buffer depth, conflated/resync counts, and lagging clients dropped."""
+    return hubs.lag_stats()
+
 @app.get("/api/games")
-def api_games(date: Optional[str] = None, source: str = Query("live", regex="^(live|db)$")):
+async def api_games(request: Request, date: Optional[str] = None, source: str = Query("live", pattern="^(live|db)$")):
     try:
         if source == "db":
-            games = db_list_games(date)
+            games = await asyncio.to_thread(db_list_games, date)
             logger.info(f"[DB] Retrieved {len(games)} games for date {date}")
-            return JSONResponse(games)
-        games = list_games(date=date)
-        logger.info(f"[LIVE] Retrieved {len(games)} games for date {date}")
-        return JSONResponse(games)
+        else:
+            games = await list_games(date=date)
+            logger.info(f"[LIVE] Retrieved {len(games)} games for date {date}")
+        return responses.respond(request, dumps(games), _schedule_cache_control(date, games, source))
     except Exception as e:
         logger.error(f"Error retrieving games: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
-def _bg_stream(gamePk: int, q: Queue, source: str = "live", speed: float = 1.0):
-    """Background producer: emits normalized events into a queue with reducer applied."""
+@app.get("/api/games/{gamePk}/pitches")
+async def api_game_pitches(request: Request, gamePk: int, after: Optional[str] = Query(None, pattern=r"^\d+-\d+$"),
+                           limit: int = Query(200, ge=1, le=1000)):
+    """Recorded pitches of a game in key order, one page at a time: pass the returned
+    next ('atBatIndex-pitchNumber') as after; next is null on the last page."""
+    page = await asyncio.to_thread(store.pitches, gamePk, parse_cursor(after), limit)
+    # The recorder writes a game's Final row before its last pitch batch, so a finished game's
+    # pages may still grow: revalidate (cheap 304s) rather than risk caching a partial page.
+    return responses.respond(request, dumps(page), httpcache.REVALIDATE)
+
+# Pitch analytics over the replay DB: columnar, topped up from rows the recorder/backfill add.
+analytics = PitchAnalytics(store.connection, refresh_seconds=float(os.getenv("ANALYTICS_REFRESH", "5")))
+
+@app.on_event("startup")
+async def _warm_analytics():
+    # First load of a season-sized DB takes seconds; do it before the first query needs it.
+    asyncio.get_running_loop().run_in_executor(None, analytics.refresh, True)
+
+def _analytics_query(view: str, **filters):
+    analytics.refresh()
+    return analytics.query(view, **filters)
+
+@app.get("/api/analytics")
+async def api_analytics_stats():
+    await asyncio.to_thread(analytics.refresh)
+    return {"views": list(ANALYTICS_VIEWS), **analytics.stats()}
+
+@app.get("/api/analytics/{view}")
+async def api_analytics(view: str, pitcherId: Optional[int] = None, gamePk: Optional[int] = None,
+                        start: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+                        end: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"), pitchType: Optional[str] = None):
+    """mix | velocity | heatmap | counts, per pitcher and/or game, optional date range (YYYY-MM-DD) and pitch type."""
+    if view not in ANALYTICS_VIEWS:
+        return JSONResponse({"error": f"unknown view {view!r}", "views": list(ANALYTICS_VIEWS)}, status_code=404)
+    out = await asyncio.to_thread(_analytics_query, view, pitcherId=pitcherId, gamePk=gamePk,
+                                  start=start, end=end, pitchType=pitchType)
+    return JSONResponse(out)
+
+# --- Pitch trajectories ---
+# Live pitches are sampled as they are ingested; anything else (replays, restarts,
+# other fps) is sampled from the physics columns the recorder/backfill stored.
+def _db_physics(gamePk: int, atBatIndex: Optional[int] = None, pitchNumber: Optional[int] = None):
+    return store.physics(gamePk, atBatIndex, pitchNumber)
+
+def _trajectory(key: str, fps: int):
+    s = trajectories.get(key, fps)
+    if s is None:
+        parsed = parse_key(key)
+        rows = _db_physics(*parsed) if parsed else []
+        if rows:
+            s = trajectories.put_many([(key, rows[0][2])], fps)[key]
+    return s
+
+@app.get("/api/trajectory/{key}")
+async def api_trajectory(request: Request, key: str, fps: int = Query(TRAJ_FPS, ge=1, le=MAX_FPS),
+                         format: str = Query("json", pattern="^(json|bin)$")):
+    """Sampled flight path for one pitch (idempotencyKey): feet, release → front of plate, every 1/fps s.
+    format=bin is the raw little-endian float32 [x, y, z, ...] with the sample count in a header."""
+    s = await asyncio.to_thread(_trajectory, key, fps)
+    if s is None:
+        return JSONResponse({"error": f"no pitch physics for {key!r}"}, status_code=404)
+    # a pitch's physics never change once recorded
+    if format == "bin":
+        return responses.respond(request, s.astype("<f4").tobytes(), httpcache.IMMUTABLE,
+                                 media_type="application/octet-stream", compress=False,
+                                 headers={"X-Trajectory-Fps": str(fps), "X-Trajectory-Samples": str(len(s))})
+    return responses.respond(request, dumps({"key": key, **encode_trajectory(s, fps)}), httpcache.IMMUTABLE)
+
+def _game_trajectories(gamePk: int, fps: int):
+    rows = _db_physics(gamePk)
+    keyed = trajectories.put_many([(f"{gamePk}-{ab}-{n}", ph) for ab, n, ph in rows], fps)
+    return [{"atBatIndex": ab, "pitchNumber": n, **encode_trajectory(keyed[f"{gamePk}-{ab}-{n}"], fps)}
+            for ab, n, _ in rows]
+
+@app.get("/api/games/{gamePk}/trajectories")
+async def api_game_trajectories(request: Request, gamePk: int, fps: int = Query(TRAJ_FPS, ge=1, le=MAX_FPS)):
+    """Every recorded pitch's path for a game in one batch (for replays / prefetch)."""
+    pitches = await asyncio.to_thread(_game_trajectories, gamePk, fps)
+    return responses.respond(request, dumps({"gamePk": gamePk, "fps": fps, "pitches": pitches}), httpcache.REVALIDATE)
+
+async def _bg_stream(gamePk: int):
+    """Hub producer: yields normalized live events with the reducer applied, once per game."""
+    # Team names come from the schedule cache if we have it, else from the first feed payload
+    # (the 'game' event precedes its pitches) -- no separate full-feed download.
+    teams = teams_for(gamePk)
+    reducer = GameReducer(teams, infer_results=False)  # 'play' events settle each plate appearance
+    logger.info(f"Starting background stream for game {gamePk} teams={teams}")
+
+    async for ev in stream_pitches(gamePk=gamePk):
+        if ev.get("event") == "game":
+            # metadata from the live feed: keep the games row current, don't broadcast
+            if ev["away"] and ev["home"]:
+                reducer.teams = {"away": ev["away"], "home": ev["home"]}
+            if recorder:
+                recorder.record_game(ev["gamePk"], ev["gameDate"], ev["away"], ev["home"], ev["status"])
+            continue
+        # Ensure schema minimums
+        ev.setdefault("event", "pitch")
+        ev.setdefault("ts", datetime.datetime.utcnow().isoformat() + "Z")
+        t0 = time.perf_counter()
+        ev = reducer.apply(ev)
+        metrics.REDUCER_SECONDS.observe(time.perf_counter() - t0)
+        if recorder:
+            recorder.record(ev)  # enqueue only; written in batches off the delivery path
+        yield ev
+
+hubs = HubRegistry()
+# BUS set: one process per game ingests (under a lease) and the rest follow its events.
+bus = event_bus.from_env()
+
+def _producer(gamePk: int):
+    if bus is None:
+        return lambda: _bg_stream(gamePk)
+    return lambda: bus.stream(gamePk, lambda: _bg_stream(gamePk))
+polls.audience = lambda key: len(h.subscribers) if (h := hubs.get(key)) else 0
+metrics.Gauge("gamecast_subscribers", "Live subscribers per game", ("game",),
+              collect=lambda: {(k,): n for k, n in hubs.stats().items()})
+metrics.Gauge("gamecast_subscriber_queue_depth", "Events buffered per live subscriber", ("game", "subscriber"),
+              collect=lambda: {(k, str(s["id"])): s["queued"] for k, subs in hubs.lag_stats()["games"].items()
+                               for s in subs})
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))   # a socket stalled longer is closed
+replays = ReplayScheduler()
+
+async def _open_replay(gamePk: int, speed: float, gap_cap: Optional[float]):
+    # Replays are per client (each can seek/pause), but share one scheduler task.
+    teams = await asyncio.to_thread(db_get_teams, gamePk)
+    return replays.open(gamePk, store.connection, lambda score=None: GameReducer(teams, score), speed=speed, gap_cap=gap_cap)
+
+async def _subscribe(gamePk: int, source: str, speed: float, gap_cap: Optional[float] = None,
+                     resume: Optional[str] = None, protocol: str = "full"):
+    """Returns (control, release, queue): live viewers share the game's hub, DB viewers get a
+    replay session. resume is the last idempotencyKey the client saw (SSE Last-Event-ID / WS resumeFrom);
+    control handles client messages (replay controls, snapshot requests)."""
+    if source == "db":
+        session = await _open_replay(gamePk, speed, gap_cap)
+        if resume:
+            await session.resume_after(resume)
+        return session.control, session.close, session.out
+    hub, q = hubs.subscribe(gamePk, _producer(gamePk), last_event_id=resume, delta=(protocol == "delta"))
+
+    async def control(msg: Dict[str, Any]) -> Dict[str, Any]:
+        if msg.get("type") == "snapshot":
+            return hub.snapshot()
+        raise ValueError(f"unknown control {msg.get('type')!r}")
+    return control, lambda: hubs.unsubscribe(hub, q), q
+
+# Stream events are encoded once and shared; ad hoc messages (snapshots, acks) are encoded here.
+def _sse_bytes(item, protocol: str = "full") -> bytes:
+    return item.sse(protocol) if isinstance(item, StreamEvent) else sse_frame(dumps(item))
+
+def _ws_text(item, protocol: str = "full") -> str:
+    return item.ws_text(protocol) if isinstance(item, StreamEvent) else dumps(item).decode("utf-8")
+
+def _delivered(item, transport: str, q):
+    """Lag metrics for a live event just written to a socket. Replay events carry no publish
+    time; backlog a client got on joining is not delivery lag either."""
+    if isinstance(item, StreamEvent) and item.published is not None and item.published >= getattr(q, "joined", 0):
+        metrics.DELIVERY_SECONDS.labels(transport).observe(time.monotonic() - item.published)
+        if item.origin is not None:
+            metrics.EVENT_LAG_SECONDS.labels(transport).observe(time.time() - item.origin)
+
+async def _client_control(websocket: WebSocket, control, q):
+    """Read client messages (seek/pause/resume/speed for replays, snapshot requests) and answer each."""
     try:
-        teams = db_get_teams(gamePk) if source == "db" else live_get_teams(gamePk)
-        reducer = GameReducer(teams)
-        logger.info(f"Starting background stream for game {gamePk} source={source} teams={teams}")
-
-        events_iter = db_stream_pitches(gamePk, speed) if source == "db" else stream_pitches(gamePk=gamePk, poll_seconds=2.5)
-
-        for ev in events_iter:
-            # Ensure schema minimums
-            ev.setdefault("event", "pitch")
-            ev.setdefault("ts", datetime.datetime.utcnow().isoformat() + "Z")
-            ev = reducer.apply(ev)
-            q.put(ev)
+        while True:
+            msg = await websocket.receive_json()
+            try:
+                status = await control(msg)
+            except (ValueError, TypeError) as e:
+                status = {"type": "error", "error": str(e)}
+            await websocket.send_text(_ws_text(status))
+    except WebSocketDisconnect:
+        try:
+            q.put_nowait(None)  # wake the sender so the subscription is released now
+        except asyncio.QueueFull:
+            pass
     except Exception as e:
-        logger.error(f"Background stream error for game {gamePk}: {e}")
-    finally:
-        q.put(None)
-        logger.info(f"Background stream ended for game {gamePk}")
+        logger.warning(f"WebSocket control error: {e}")
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Allow-Private-Network": "true",
+}
 
 @app.get("/sse/stream")
-async def sse_stream(gamePk: int, source: str = Query("live", regex="^(live|db)$"), speed: float = 1.0):
-    """Server-Sent Events stream of normalized plays."""
-    logger.info(f"SSE stream requested for game {gamePk} source={source} speed={speed}")
-    q: Queue = Queue(maxsize=1000)
-    Thread(target=_bg_stream, args=(gamePk, q, source, speed), daemon=True).start()
+async def sse_stream(request: Request, gamePk: int, source: str = Query("live", pattern="^(live|db)$"), speed: float = 1.0,
+                     gapCap: Optional[float] = None, lastEventId: Optional[str] = None,
+                     protocol: str = Query("full", pattern="^(full|delta)$")):
+    """Server-Sent Events stream of normalized plays; honours Last-Event-ID on reconnect."""
+    resume = request.headers.get("last-event-id") or lastEventId
+    logger.info(f"SSE stream requested for game {gamePk} source={source} speed={speed} resume={resume} protocol={protocol}")
+    _, release, q = await _subscribe(gamePk, source, speed, gapCap, resume, protocol)
 
     async def gen():
-        while True:
-            try:
-                item = q.get(timeout=60)
-            except Empty:
-                yield ":
-
-"  # comment to keep-alive
-                continue
-            if item is None:
-                break
-            yield f"data: {json.dumps(item)}\n\n"
-            import asyncio as aio
-            await aio.sleep(0)
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-        "Access-Control-Allow-Headers": "*",
-        "Access-Control-Allow-Private-Network": "true",
-    }
-    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(q.get(), timeout=60)
+                except asyncio.TimeoutError:
+                    yield b":\n\n"  # comment to keep-alive
+                    continue
+                if item is None:
+                    break
+                yield _sse_bytes(item, protocol)
+                _delivered(item, "sse", q)
+        finally:
+            release()
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.websocket("/ws/game/{gamePk}")
 async def ws_stream(websocket: WebSocket, gamePk: int):
-    await websocket.accept()
+    # Opt-in binary pitch frames (see binwire.py); JSON text stays the default.
+    binary = BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
     qs = websocket.query_params
     source = qs.get("source", "live")
     speed = float(qs.get("speed", "1"))
-    logger.info(f"WebSocket connected for game {gamePk} source={source} speed={speed}")
-
-    q: Queue = Queue(maxsize=1000)
-    Thread(target=_bg_stream, args=(gamePk, q, source, speed), daemon=True).start()
+    gap_cap = float(qs["gapCap"]) if qs.get("gapCap") else None
+    resume = qs.get("resumeFrom")
+    protocol = qs.get("protocol", "full")
+    if protocol not in PROTOCOLS:
+        protocol = "full"
+    if binary:
+        protocol = "delta"  # pitch frames carry the game state; teams come with the snapshot
+    logger.info(f"WebSocket connected for game {gamePk} source={source} speed={speed} resume={resume} "
+                f"protocol={'binary' if binary else protocol}")
+    sender = BinarySender() if binary else None
+
+    control_fn, release, q = await _subscribe(gamePk, source, speed, gap_cap, resume, protocol)
+    control = asyncio.create_task(_client_control(websocket, control_fn, q))
     try:
         while True:
             try:
-                item = q.get(timeout=60)
-            except Empty:
-                await websocket.send_text(json.dumps({"type":"keepalive","ts":datetime.datetime.utcnow().isoformat()+"Z"}))
+                item = await asyncio.wait_for(q.get(), timeout=60)
+            except asyncio.TimeoutError:
+                await websocket.send_text(_ws_text({"type":"keepalive","ts":datetime.datetime.utcnow().isoformat()+"Z"}))
                 continue
             if item is None:
                 break
-            await websocket.send_text(json.dumps(item))
+            if sender and isinstance(item, StreamEvent) and item.event.get("event") == "pitch":
+                for frame in sender.frames(item):
+                    await asyncio.wait_for(websocket.send_bytes(frame), WS_SEND_TIMEOUT)
+                _delivered(item, "ws", q)
+                continue
+            await asyncio.wait_for(websocket.send_text(_ws_text(item, protocol)), WS_SEND_TIMEOUT)
+            _delivered(item, "ws", q)
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for game {gamePk}")
+    except asyncio.TimeoutError:
+        # the peer stopped reading; its buffer would only resync until dropped, so cut it now
+        if isinstance(q, Subscriber):
+            q.dropped = True
+        logger.warning(f"WebSocket send stalled {WS_SEND_TIMEOUT}s for game {gamePk}; closing")
     except Exception as e:
         logger.error(f"WebSocket error {gamePk}: {e}")
     finally:
+        control.cancel()
+        release()
         logger.info(f"WebSocket closed for game {gamePk}")
 
+# --- Scoreboard: every game on a date over one connection ---
+def _detail_state(gamePk: int) -> Optional[Dict[str, Any]]:
+    """Reducer state of a game someone is already streaming live (no extra upstream calls)."""
+    hub = hubs.get(gamePk)
+    return hub.ring[-1].state if hub and hub.ring else None
+
+async def _board_linescore(gamePk: int) -> Dict[str, Any]:
+    # Scoreboard polls draw on the same budget as live feeds, below any live game's priority
+    # (background leverage, and never counted as a recently changed feed).
+    await polls.slot(("linescore", gamePk), 0.0, leverage=BACKGROUND, idle=math.inf)
+    return await get_linescore(gamePk)
+
+boards = ScoreboardRegistry(schedule=list_games, linescore=_board_linescore, detail=_detail_state)
+
+def _board_date(date: Optional[str]) -> str:
+    return date or datetime.datetime.utcnow().date().isoformat()
+
+@app.get("/sse/scoreboard")
+async def sse_scoreboard(date: Optional[str] = None):
+    """SSE stream of batched scoreboard frames for every game on date (a full "board" first)."""
+    board, q = boards.subscribe(_board_date(date))
+
+    async def gen():
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(q.get(), timeout=60)
+                except asyncio.TimeoutError:
+                    yield b":\n\n"
+                    continue
+                if item is None:  # board stopped: end the stream so the client reconnects
+                    break
+                yield _sse_bytes(item)
+        finally:
+            boards.unsubscribe(board, q)
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.websocket("/ws/scoreboard")
+async def ws_scoreboard(websocket: WebSocket):
+    await websocket.accept()
+    board, q = boards.subscribe(_board_date(websocket.query_params.get("date")))
+    logger.info(f"Scoreboard WebSocket connected for {board.date}")
+
+    async def control(msg: Dict[str, Any]) -> Any:
+        if msg.get("type") in ("board", "snapshot"):  # resync after a seq gap
+            return board.board()
+        raise ValueError(f"unknown control {msg.get('type')!r}")
+    control_task = asyncio.create_task(_client_control(websocket, control, q))
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(q.get(), timeout=60)
+            except asyncio.TimeoutError:
+                await websocket.send_text(_ws_text({"type":"keepalive","ts":datetime.datetime.utcnow().isoformat()+"Z"}))
+                continue
+            if item is None:
+                break
+            await websocket.send_text(_ws_text(item))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Scoreboard WebSocket error {board.date}: {e}")
+    finally:
+        control_task.cancel()
+        boards.unsubscribe(board, q)
+        logger.info(f"Scoreboard WebSocket closed for {board.date}")
+
 # Simple test event
 @app.get("/test/pitch")
-def test_pitch():
+async def test_pitch(request: Request):
     test_event = {
         "event": "pitch",
         "gamePk": 123456,
@@ -320,8 +513,16 @@ def test_pitch():
         "atBatIndex": 1,
         "idempotencyKey": "test-pitch-1"
     }
-    return JSONResponse(test_event)
+    # ts is fresh per call, so this only ever revalidates; it is here for the headers/compression path
+    return responses.respond(request, dumps(test_event), httpcache.REVALIDATE)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("fastapi_app:app", host="0.0.0.0", port=8000, reload=True, log_level="info")
+    # permessage-deflate costs CPU per message per client; binary/delta frames gain little from it
+    ws_deflate = os.getenv("WS_DEFLATE", "1").lower() in ("1", "true", "yes")
+    # WORKERS>1 needs BUS (see bus.py), otherwise every worker polls every game it serves
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1 and not event_bus.BUS_URL:
+        logger.warning("WORKERS>1 without BUS: each worker runs its own pollers")
+    uvicorn.run("fastapi_app:app", host="0.0.0.0", port=8000, reload=workers == 1, workers=workers,
+                log_level="info", ws_per_message_deflate=ws_deflate)
@@ -0,0 +1,131 @@
+# httpcache.py — validators, Cache-Control and compression for REST responses
+# ResponseCache.respond() turns an encoded body into a Response with a strong ETag
+# (hash of the body) and a Last-Modified (when this URL's body last changed), answers
+# matching If-None-Match / If-Modified-Since with an empty 304, and compresses large
+# bodies with brotli (if installed) or gzip. Compressed variants are kept per URL
+# until the body changes, so a repeat 200 costs a hash, not a recompress, and a
+# revalidation costs a hash and a few header bytes.
+
+import gzip, hashlib, os, time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:  # optional: smaller than gzip for JSON (falls back to gzip)
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN = int(os.getenv("COMPRESS_MIN", "1024"))   # bytes; smaller bodies go out as is
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5                                       # fast enough for per-change compression
+CACHED_URLS = 512
+
+# Cache-Control policies
+IMMUTABLE = "public, max-age=86400, immutable"   # finished games, past dates
+REVALIDATE = "no-cache"                          # may change any time: revalidate (cheap 304s)
+
+def short(seconds: float) -> str:
+    return f"public, max-age={int(seconds)}"
+
+class _Entry:
+    __slots__ = ("digest", "modified", "encoded")
+
+    def __init__(self, digest: str):
+        self.digest = digest
+        self.modified = int(time.time())
+        self.encoded: Dict[str, bytes] = {}
+
+def _etag(digest: str, encoding: Optional[str]) -> str:
+    # strong validators must differ per content-coding
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+def _matches(if_none_match: str, digest: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-", 1)[0] == digest:
+            return True
+    return False
+
+def _not_modified(request: Request, e: _Entry) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _matches(inm, e.digest)
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return e.modified <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _encoding(accept: str, size: int) -> Optional[str]:
+    if size < COMPRESS_MIN or not accept:
+        return None
+    offered = set()
+    for part in accept.lower().split(","):
+        name, _, params = part.partition(";")
+        q = params.replace(" ", "").partition("q=")[2]
+        try:
+            if q and float(q) <= 0:
+                continue
+        except ValueError:
+            continue
+        offered.add(name.strip())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+class ResponseCache:
+    """Per-URL validators and compressed variants for the last body seen (LRU of CACHED_URLS)."""
+
+    def __init__(self, size: int = CACHED_URLS):
+        self.size = size
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.not_modified = 0
+        self.compressed = 0
+
+    def respond(self, request: Request, body: bytes, cache_control: str, media_type: str = "application/json",
+                headers: Optional[Dict[str, str]] = None, compress: bool = True) -> Response:
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        key = str(request.url.path) + "?" + str(request.url.query)
+        e = self._entries.get(key)
+        if e is None or e.digest != digest:
+            e = self._entries[key] = _Entry(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+
+        encoding = _encoding(request.headers.get("accept-encoding", ""), len(body)) if compress else None
+        out = {**(headers or {}), "ETag": _etag(digest, encoding), "Last-Modified": formatdate(e.modified, usegmt=True),
+               "Cache-Control": cache_control}
+        if compress:
+            out["Vary"] = "Accept-Encoding"
+        if _not_modified(request, e):
+            self.not_modified += 1
+            return Response(status_code=304, headers=out)
+        if encoding:
+            data = e.encoded.get(encoding)
+            if data is None:
+                data = e.encoded[encoding] = _compress(body, encoding)
+                self.compressed += 1
+            out["Content-Encoding"] = encoding
+            body = data
+        return Response(body, media_type=media_type, headers=out)
+
+    def stats(self) -> Dict[str, int]:
+        return {"urls": len(self._entries), "not_modified": self.not_modified, "compressed": self.compressed}
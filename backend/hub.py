@@ -0,0 +1,198 @@
+# hub.py — one ingestion loop per game, fanned out to every connected client
+# SSE and WebSocket subscribers of the same game share a single producer task
+# (one StatsAPI poller, one reducer); the producer is cancelled once the last one
+# has been gone for a short linger period. Recent events are kept in a bounded ring
+# so reconnecting clients resume from their last idempotencyKey without upstream calls.
+# Each subscriber gets a small bounded buffer (subscriber.py); the producer never waits
+# on one, and clients that stay too far behind are dropped and counted. Once a producer
+# runs to completion (the game is over) its hub keeps serving the ring to late and
+# reconnecting viewers for HUB_FINAL_TTL without polling again.
+
+import asyncio, datetime, logging, os, time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from metrics import EVENTS_PUBLISHED, SUB_DROPPED
+from protocol import DeltaTracker, StreamEvent, snapshot_message
+from subscriber import SUB_BUFFER, Subscriber
+
+logger = logging.getLogger("gamecast")
+
+Producer = Callable[[], AsyncIterator[Dict[str, Any]]]
+
+RESUME_BUFFER = int(os.getenv("RESUME_BUFFER", "1000"))   # events kept per game for resume/late join
+HUB_LINGER = float(os.getenv("HUB_LINGER", "30"))         # seconds a hub outlives its last subscriber
+HUB_FINAL_TTL = float(os.getenv("HUB_FINAL_TTL", "900"))  # seconds a finished game is served from its ring
+
+def _epoch(ts: Any) -> Optional[float]:
+    try:
+        return datetime.datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+class GameHub:
+    """Runs one producer task for a stream key and copies each event to every subscriber buffer."""
+
+    def __init__(self, key: Hashable, produce: Producer, queue_size: int = SUB_BUFFER,
+                 ring_size: int = RESUME_BUFFER, linger: float = HUB_LINGER,
+                 on_stop: Optional[Callable[["GameHub"], None]] = None):
+        self.key = key
+        self.queue_size = queue_size
+        self.linger = linger
+        self.subscribers: List[Subscriber] = []
+        self.dropped = 0      # subscribers cut off for lagging
+        self.ring: Deque[StreamEvent] = deque(maxlen=ring_size)  # recent events, oldest first
+        self.tracker = DeltaTracker()
+        self.done = False
+        self.final_at: Optional[float] = None   # when the producer ran to completion
+        self._produce = produce
+        self._on_stop = on_stop
+        self._task: Optional[asyncio.Task] = None
+        self._linger_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def stopped(self) -> bool:
+        return self.done or (self._task is not None and self._task.cancelled())
+
+    @property
+    def finished(self) -> bool:
+        """Game over and still within HUB_FINAL_TTL: subscribers get the ring, then the end."""
+        return self.final_at is not None and time.monotonic() - self.final_at < HUB_FINAL_TTL
+
+    def backlog(self, last_event_id: Optional[str] = None) -> Tuple[bool, List[StreamEvent]]:
+        """(found, events): ring events after last_event_id, or the whole ring if the id
+        is missing, unknown or evicted."""
+        events = list(self.ring)
+        if last_event_id:
+            for i in range(len(events) - 1, -1, -1):
+                if events[i].key == last_event_id:
+                    return True, events[i + 1:]
+        return False, events
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current reducer state at the latest sequence number (delta protocol)."""
+        last = self.ring[-1] if self.ring else None
+        return snapshot_message(last.seq, last.state) if last else snapshot_message(0, None)
+
+    def subscribe(self, last_event_id: Optional[str] = None, delta: bool = False) -> Subscriber:
+        """Buffer of StreamEvents (plus a leading snapshot dict for fresh delta clients), None at end.
+        The backlog (at most the ring) is not held to the buffer limit."""
+        q = Subscriber(self.queue_size, resync=self.snapshot if delta else None)
+        found, events = self.backlog(last_event_id)
+        if delta and not found:
+            events = [self.snapshot()]
+        q.preload(events)
+        if self.done:
+            q.put_nowait(None)
+        self.subscribers.append(q)
+        if self._linger_handle is not None:
+            self._linger_handle.cancel()
+            self._linger_handle = None
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"hub-{self.key}")
+        return q
+
+    def unsubscribe(self, q: Subscriber) -> int:
+        """Detach a subscriber; returns how many remain. At zero the producer is
+        cancelled after the linger period unless someone (re)subscribes first."""
+        if q in self.subscribers:
+            self.subscribers.remove(q)
+            if q.dropped:
+                self.dropped += 1
+                SUB_DROPPED.inc()
+        remaining = len(self.subscribers)
+        if remaining == 0 and self._linger_handle is None:
+            if self.linger > 0 and not self.done:
+                self._linger_handle = asyncio.get_running_loop().call_later(self.linger, self._stop_if_idle)
+            else:
+                self._stop_if_idle()
+        return remaining
+
+    def _stop_if_idle(self):
+        self._linger_handle = None
+        if self.subscribers:
+            return
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self._on_stop:
+            self._on_stop(self)
+
+    def _publish(self, ev: Optional[Dict[str, Any]]):
+        item: Optional[StreamEvent] = None
+        if ev is None:
+            self.done = True
+        else:
+            item = self.tracker.wrap(ev)
+            item.published = time.monotonic()
+            item.origin = _epoch(ev.get("ts"))
+            self.ring.append(item)
+            EVENTS_PUBLISHED.inc()
+        lagging = []
+        for q in self.subscribers:
+            q.put_nowait(item)   # never blocks: a full buffer conflates, resyncs or drops
+            if q.dropped:
+                lagging.append(q)
+        for q in lagging:
+            logger.warning(f"[HUB] {self.key} dropped lagging subscriber ({q.resyncs} resyncs)")
+            self.unsubscribe(q)
+
+    async def _run(self):
+        logger.info(f"[HUB] producer started for {self.key}")
+        try:
+            async for ev in self._produce():
+                self._publish(ev)
+                await asyncio.sleep(0)   # let subscribers drain between events of a burst
+            self.final_at = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[HUB] producer error for {self.key}: {e}")
+        finally:
+            self._publish(None)
+            logger.info(f"[HUB] producer ended for {self.key}")
+
+class HubRegistry:
+    """Keeps at most one running GameHub per key; drops hubs once idle, or HUB_FINAL_TTL after
+    their game is over."""
+
+    def __init__(self):
+        self._hubs: Dict[Hashable, GameHub] = {}
+        self.dropped = 0      # lagging subscribers dropped by hubs since startup
+
+    def subscribe(self, key: Hashable, produce: Producer, last_event_id: Optional[str] = None,
+                  delta: bool = False) -> Tuple[GameHub, Subscriber]:
+        for k in [k for k, h in self._hubs.items() if h.final_at is not None and not h.finished]:
+            del self._hubs[k]
+        hub = self._hubs.get(key)
+        if hub is None or (hub.stopped and not hub.finished):
+            hub = GameHub(key, produce, on_stop=self._drop)
+            self._hubs[key] = hub
+        q = hub.subscribe(last_event_id, delta)
+        logger.info(f"[HUB] {key} subscribers={len(hub.subscribers)} resume={last_event_id}")
+        return hub, q
+
+    def get(self, key: Hashable) -> Optional[GameHub]:
+        """The running hub for key, if any (no producer is started)."""
+        hub = self._hubs.get(key)
+        return None if hub is None or hub.stopped else hub
+
+    def unsubscribe(self, hub: GameHub, q: Subscriber):
+        remaining = hub.unsubscribe(q)
+        logger.info(f"[HUB] {hub.key} subscribers={remaining}")
+
+    def _drop(self, hub: GameHub):
+        self.dropped += hub.dropped
+        hub.dropped = 0
+        if self._hubs.get(hub.key) is hub and not hub.finished:
+            del self._hubs[hub.key]
+
+    def stats(self) -> Dict[str, int]:
+        return {str(k): len(h.subscribers) for k, h in self._hubs.items()}
+
+    def lag_stats(self) -> Dict[str, Any]:
+        """Buffer depth, conflation and resync counts per live subscriber, plus drops so far."""
+        return {
+            "dropped": self.dropped + sum(h.dropped for h in self._hubs.values()),
+            "games": {str(k): [{"id": q.id, "queued": q.qsize(), "conflated": q.conflated, "resyncs": q.resyncs}
+                               for q in h.subscribers] for k, h in self._hubs.items()},
+        }
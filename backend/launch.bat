@@ -14,7 +14,7 @@ if not exist "fastapi_app.py" (
 )
 
 echo 📦 Installing/checking dependencies...
-python -m pip install fastapi uvicorn requests --quiet
+python -m pip install -r requirements.txt --quiet
 
 echo 🚀 Starting GameCast backend...
 echo Backend will be available at: http://localhost:8000
@@ -0,0 +1,197 @@
+# live_feed.py — locally held /feed/live document kept current incrementally
+# After one full download, polls StatsAPI's diffPatch endpoint with the last seen
+# metaData.timeStamp and applies the returned JSON Patch ops in place. Full fetches
+# are conditional (ETag / If-Modified-Since) and are the fallback when a patch fails;
+# a failed patch discards the partly patched document first.
+
+from __future__ import annotations
+import asyncio, copy, logging, os, time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from metrics import FEED_PARSE_SECONDS
+
+if TYPE_CHECKING:
+    from upstream import Upstream
+
+logger = logging.getLogger("gamecast")
+
+LIVE = os.getenv("STATSAPI", "https://statsapi.mlb.com").rstrip("/") + "/api/v1.1"
+
+class PatchError(Exception):
+    pass
+
+def _pointer(path: str) -> List[str]:
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise PatchError(f"bad pointer {path!r}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+
+def _resolve(doc: Any, parts: List[str]):
+    """Return (container, last_key) for a pointer; the container must exist."""
+    cur = doc
+    for p in parts[:-1]:
+        if isinstance(cur, list):
+            try:
+                cur = cur[int(p)]
+            except (ValueError, IndexError):
+                raise PatchError(f"missing index {p}")
+        elif isinstance(cur, dict):
+            if p not in cur:
+                raise PatchError(f"missing key {p}")
+            cur = cur[p]
+        else:
+            raise PatchError(f"cannot descend into {type(cur).__name__}")
+    return cur, parts[-1]
+
+def _get(doc: Any, parts: List[str]) -> Any:
+    if not parts:
+        return doc
+    parent, key = _resolve(doc, parts)
+    try:
+        return parent[int(key)] if isinstance(parent, list) else parent[key]
+    except (ValueError, IndexError, KeyError):
+        raise PatchError(f"missing {key}")
+
+def _add(doc: Any, parts: List[str], value: Any):
+    parent, key = _resolve(doc, parts)
+    if isinstance(parent, list):
+        if key == "-":
+            parent.append(value)
+            return
+        try:
+            i = int(key)
+        except ValueError:
+            raise PatchError(f"bad index {key}")
+        if not 0 <= i <= len(parent):
+            raise PatchError(f"index {i} out of range")
+        parent.insert(i, value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise PatchError("add into scalar")
+
+def _remove(doc: Any, parts: List[str]) -> Any:
+    parent, key = _resolve(doc, parts)
+    try:
+        return parent.pop(int(key)) if isinstance(parent, list) else parent.pop(key)
+    except (ValueError, IndexError, KeyError, AttributeError):
+        raise PatchError(f"cannot remove {key}")
+
+def apply_patch(doc: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply RFC 6902 operations to doc in place. Raises PatchError on any inconsistency."""
+    for op in ops:
+        kind = op.get("op")
+        parts = _pointer(op.get("path", ""))
+        if not parts and kind in ("add", "replace"):
+            if not isinstance(op.get("value"), dict):
+                raise PatchError("root must stay an object")
+            doc.clear(); doc.update(op["value"])
+            continue
+        if kind == "add":
+            _add(doc, parts, op.get("value"))
+        elif kind == "replace":
+            _get(doc, parts)  # target must exist
+            parent, key = _resolve(doc, parts)
+            if isinstance(parent, list):
+                parent[int(key)] = op.get("value")
+            else:
+                parent[key] = op.get("value")
+        elif kind == "remove":
+            _remove(doc, parts)
+        elif kind == "move":
+            _add(doc, parts, _remove(doc, _pointer(op.get("from", ""))))
+        elif kind == "copy":
+            _add(doc, parts, copy.deepcopy(_get(doc, _pointer(op.get("from", "")))))
+        elif kind == "test":
+            if _get(doc, parts) != op.get("value"):
+                raise PatchError(f"test failed at {op.get('path')}")
+        else:
+            raise PatchError(f"unknown op {kind!r}")
+    return doc
+
+def _decode(r, mode: str) -> Any:
+    """r.json(), timed; called in a worker thread."""
+    t0 = time.perf_counter()
+    body = r.json()
+    FEED_PARSE_SECONDS.labels(mode).observe(time.perf_counter() - t0)
+    return body
+
+class LiveFeed:
+    """One game's live document plus the bookkeeping to refresh it cheaply."""
+
+    def __init__(self, client: Upstream, gamePk: int, incremental: bool = True, base: str = LIVE):
+        self.client = client
+        self.gamePk = gamePk
+        self.base = base
+        self.incremental = incremental
+        self.doc: Optional[Dict[str, Any]] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.last_bytes = 0       # payload size of the most recent poll
+        self.last_ms = 0.0        # wall time of the most recent poll's request(s)
+        self.last_mode = "full"   # "full" | "patch" | "unchanged"
+
+    @property
+    def timecode(self) -> Optional[str]:
+        return ((self.doc or {}).get("metaData") or {}).get("timeStamp")
+
+    async def refresh(self) -> bool:
+        """Bring self.doc up to date; returns True if it changed since the last call."""
+        t0 = time.perf_counter()
+        try:
+            return await self._refresh()
+        finally:
+            self.last_ms = (time.perf_counter() - t0) * 1000
+
+    async def _refresh(self) -> bool:
+        if self.incremental and self.doc is not None and self.timecode:
+            try:
+                return await self._patch()
+            except (PatchError, ValueError, TypeError) as e:
+                logger.warning(f"[FEED] {self.gamePk} patch rejected ({e}); full refetch")
+                # ops before the failing one are already applied: the doc is no longer any
+                # upstream version, so drop it rather than poll (or patch) from it again
+                self.doc = None
+                self.etag = self.last_modified = None
+        return await self._full()
+
+    async def _full(self) -> bool:
+        headers = {}
+        if self.doc is not None:
+            if self.etag: headers["If-None-Match"] = self.etag
+            if self.last_modified: headers["If-Modified-Since"] = self.last_modified
+        r = await self.client.get(f"{self.base}/game/{self.gamePk}/feed/live", headers=headers)
+        if r.status_code == 304:
+            self.last_bytes, self.last_mode = 0, "unchanged"
+            return False
+        r.raise_for_status()
+        # multi-MB document: parse off the event loop
+        self.doc = await asyncio.to_thread(_decode, r, "full")
+        self.etag = r.headers.get("etag")
+        self.last_modified = r.headers.get("last-modified")
+        self.last_bytes, self.last_mode = len(r.content), "full"
+        return True
+
+    async def _patch(self) -> bool:
+        r = await self.client.get(
+            f"{self.base}/game/{self.gamePk}/feed/live/diffPatch",
+            params={"startTimecode": self.timecode},
+        )
+        if 400 <= r.status_code < 500:
+            raise PatchError(f"diffPatch HTTP {r.status_code}")
+        r.raise_for_status()
+        body = await asyncio.to_thread(_decode, r, "patch")
+        self.last_bytes = len(r.content)
+        if isinstance(body, dict):
+            # StatsAPI answers with the whole document when the diff would be larger
+            self.doc, self.last_mode = body, "full"
+            return True
+        if not body:
+            self.last_mode = "unchanged"
+            return False
+        for patch in body:
+            ops = patch.get("diff") if isinstance(patch, dict) else patch
+            apply_patch(self.doc, ops or [])
+        self.last_mode = "patch"
+        return True
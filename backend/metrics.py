@@ -0,0 +1,217 @@
+# metrics.py — in-process counters/gauges/histograms rendered as Prometheus text
+# Deliberately tiny (no client library): observe() is a bisect and two adds, cheap
+# enough for the per-event hot path. Gauges that describe current state (pollers,
+# subscribers, queue depth) are read at scrape time through collect callbacks.
+# Hot-path log lines go through SampledLog so logging does not cost per event.
+
+import bisect, logging, math, os
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LOG_SAMPLE = int(os.getenv("LOG_SAMPLE", "50"))   # log 1 in N hot-path events (1 = all, 0 = none)
+
+TIME_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .1)
+LAG_BUCKETS = (.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+Labels = Tuple[str, ...]
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Registry:
+    def __init__(self):
+        self.metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric"):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        out: List[str] = []
+        for m in self.metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.lines())
+        return "\n".join(out) + "\n"
+
+REGISTRY = Registry()
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[Labels, object] = {}
+        registry.register(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def remove(self, *values: str):
+        """Stop exporting one label set (e.g. a game that is no longer polled)."""
+        self._children.pop(values, None)
+
+    def _child(self):
+        raise NotImplementedError
+
+    def lines(self) -> Iterable[str]:
+        raise NotImplementedError
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _Value
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def lines(self):
+        for values, c in self._children.items():
+            yield f"{self.name}{_labels(self.label_names, values)} {_fmt(c.value)}"
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by collect() → {label values: value}."""
+    kind = "gauge"
+    _child = _Value
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 collect: Callable[[], Dict[Labels, float]] = None, registry: Registry = REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.collect = collect
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def lines(self):
+        items = self.collect().items() if self.collect else ((k, c.value) for k, c in self._children.items())
+        for values, v in items:
+            yield f"{self.name}{_labels(self.label_names, values)} {_fmt(v)}"
+
+class _Hist:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # per bucket, not cumulative; last is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = TIME_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _Hist(self.buckets)
+
+    def observe(self, v: float):
+        self.labels().observe(v)
+
+    def lines(self):
+        for values, h in self._children.items():
+            acc = 0
+            for le, n in zip(self.buckets + (math.inf,), h.counts):
+                acc += n
+                le_label = 'le="' + _fmt(le) + '"'
+                yield f"{self.name}_bucket{_labels(self.label_names, values, le_label)} {acc}"
+            yield f"{self.name}_sum{_labels(self.label_names, values)} {_fmt(h.sum)}"
+            yield f"{self.name}_count{_labels(self.label_names, values)} {h.count}"
+
+def render() -> str:
+    return REGISTRY.render()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Pipeline stages ---
+UPSTREAM_SECONDS = Histogram("gamecast_upstream_request_seconds", "StatsAPI request latency (per attempt)",
+                             ("host", "status"))
+UPSTREAM_BYTES = Histogram("gamecast_upstream_response_bytes", "StatsAPI response body size on the wire (compressed)", ("host",),
+                           buckets=BYTE_BUCKETS)
+FEED_PARSE_SECONDS = Histogram("gamecast_feed_parse_seconds", "JSON decode of feed/diffPatch bodies", ("mode",),
+                               buckets=TIME_BUCKETS)
+POLLS = Counter("gamecast_polls_total", "Live feed polls by outcome", ("mode",))
+POLL_EVENTS = Histogram("gamecast_poll_events", "Events normalized per changed poll", buckets=COUNT_BUCKETS)
+NORMALIZE_SECONDS = Histogram("gamecast_normalize_seconds", "PlayCursor scan (normalize) time per poll",
+                              buckets=FAST_BUCKETS)
+REDUCER_SECONDS = Histogram("gamecast_reducer_apply_seconds", "GameReducer.apply time per event",
+                            buckets=FAST_BUCKETS)
+SERIALIZE_SECONDS = Histogram("gamecast_serialize_seconds", "Encoding a StreamEvent (once per wire format)",
+                              ("format",), buckets=FAST_BUCKETS)
+EVENTS_PUBLISHED = Counter("gamecast_events_published_total", "Events fanned out by live hubs")
+DELIVERY_SECONDS = Histogram("gamecast_delivery_seconds", "Hub publish to socket write", ("transport",),
+                             buckets=LAG_BUCKETS)
+EVENT_LAG_SECONDS = Histogram("gamecast_event_lag_seconds", "Upstream event timestamp to socket write",
+                              ("transport",), buckets=LAG_BUCKETS)
+SUB_CONFLATED = Counter("gamecast_subscriber_conflated_total", "State updates merged in subscriber buffers")
+SUB_RESYNCS = Counter("gamecast_subscriber_resyncs_total", "Subscriber buffer overflows answered with a resync")
+SUB_DROPPED = Counter("gamecast_subscribers_dropped_total", "Lagging subscribers disconnected")
+POLL_INTERVAL = Histogram("gamecast_poll_interval_seconds", "Delay chosen before each live feed poll",
+                          buckets=(1, 2.5, 5, 10, 15, 30, 60, 120))
+POLL_HOLD_SECONDS = Histogram("gamecast_poll_hold_seconds", "Time a due poll waited for the global budget",
+                              buckets=LAG_BUCKETS)
+BUS_EVENTS = Counter("gamecast_bus_events_total", "Events through the cross-process bus", ("direction",))
+BUS_TAKEOVERS = Counter("gamecast_bus_takeovers_total", "Games this process took over from another owner")
+ACTIVE_POLLERS = Gauge("gamecast_active_pollers", "Running live-feed poll loops per game", ("game",))
+
+class SampledLog:
+    """key=value log lines for 1 in `every` events (fields also attached as record.fields).
+    Check due() first so unsampled events don't even build their fields."""
+
+    def __init__(self, logger: logging.Logger, tag: str, every: int = LOG_SAMPLE):
+        self.logger = logger
+        self.tag = tag
+        self.every = every
+        self.n = 0
+
+    def due(self) -> bool:
+        self.n += 1
+        return self.every > 0 and (self.n - 1) % self.every == 0 and self.logger.isEnabledFor(logging.INFO)
+
+    def __call__(self, **fields):
+        self.logger.info(f"[{self.tag}] " + " ".join(f"{k}={v}" for k, v in fields.items()),
+                         extra={"fields": fields})
@@ -1,37 +1,80 @@
 # mlb_live_stream.py
 # Ingest MLB StatsAPI → normalize per-pitch events to a stable schema
-# Debug logs throughout; resilient to missing fields.
+# Debug logs throughout; resilient to missing fields. Per-poll and per-event lines are
+# sampled (metrics.LOG_SAMPLE); the full picture is in /metrics.
 
 from __future__ import annotations
-import requests, time, datetime as dt
-from typing import Dict, Generator, Any, List, Optional
+import asyncio, httpx, logging, os, time, datetime as dt
+from typing import Dict, AsyncGenerator, Any, List, Optional
 
-BASE = "https://statsapi.mlb.com/api/v1"
-LIVE = "https://statsapi.mlb.com/api/v1.1"
+from cache import TTLCache
+from live_feed import LiveFeed
+from metrics import ACTIVE_POLLERS, NORMALIZE_SECONDS, POLL_EVENTS, POLL_INTERVAL, POLLS, SampledLog
+from poll_scheduler import polls
+from trajectory import physics_of, trajectories
+from upstream import upstream
+
+STATSAPI = os.getenv("STATSAPI", "https://statsapi.mlb.com").rstrip("/")  # point at a stand-in to run offline
+BASE = f"{STATSAPI}/api/v1"
+LIVE = f"{STATSAPI}/api/v1.1"
+
+# Schedule lookups are shared by every /api/games caller; game metadata (team names,
+# date, status) is filled from schedule results and from each feed payload we ingest.
+SCHEDULE_TTL = float(os.getenv("SCHEDULE_TTL", "30"))
+schedule_cache = TTLCache(maxsize=64, ttl=SCHEDULE_TTL)
+game_meta = TTLCache(maxsize=2048, ttl=6 * 3600)
+
+# Poll pacing (seconds): full rate while pitches are coming, slower in breaks, delays and
+# pregame, backing off further the longer nothing new arrives; polling stops once a game is over.
+POLL_LIVE = float(os.getenv("POLL_LIVE", "2.5"))
+POLL_IDLE_MAX = float(os.getenv("POLL_IDLE_MAX", "15"))
+POLL_BREAK = float(os.getenv("POLL_BREAK", "15"))        # inningState Middle / End
+POLL_DELAYED = float(os.getenv("POLL_DELAYED", "60"))    # rain delays and other stoppages
+POLL_PREGAME = float(os.getenv("POLL_PREGAME", "60"))
+DONE_STATES = ("Final", "Game Over", "Completed Early", "Postponed", "Cancelled", "Suspended")
+
+logger = logging.getLogger("gamecast")
+log_poll = SampledLog(logger, "STREAM")
+log_event = SampledLog(logger, "EVENT")
 
 def _iso_now() -> str:
     return dt.datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
 
-def list_games(date: Optional[str] = None) -> List[Dict[str, Any]]:
-    """Return [{gamePk, away, home, status}] for a given date (YYYY-MM-DD)."""
+async def list_games(date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Return [{gamePk, away, home, status}] for a given date (YYYY-MM-DD).
+
+    Cached for SCHEDULE_TTL seconds (past dates for an hour); concurrent callers share one request.
+    Treat the returned list as read-only.
+    """
     if not date:
         date = dt.datetime.utcnow().date().isoformat()
+    ttl = SCHEDULE_TTL if date >= dt.datetime.utcnow().date().isoformat() else 3600.0
+    return await schedule_cache.get_or_fetch(date, lambda: _fetch_schedule(date), ttl=ttl)
+
+async def _fetch_schedule(date: str) -> List[Dict[str, Any]]:
     url = f"{BASE}/schedule?sportId=1&date={date}"
-    print(f"[API] GET {url}")
-    r = requests.get(url, timeout=15); r.raise_for_status()
+    logger.info(f"[API] GET {url}")
+    r = await upstream.get(url); r.raise_for_status()
     data = r.json()
     out = []
     for d in data.get("dates", []):
         for g in d.get("games", []):
-            out.append({
+            row = {
                 "gamePk": g.get("gamePk"),
                 "away":   g.get("teams", {}).get("away", {}).get("team", {}).get("name"),
                 "home":   g.get("teams", {}).get("home", {}).get("team", {}).get("name"),
                 "status": g.get("status", {}).get("detailedState")
-            })
-    print(f"[API] games={len(out)} for {date}")
+            }
+            out.append(row)
+            game_meta.put(row["gamePk"], {**(game_meta.get(row["gamePk"]) or {}), **row, "gameDate": date})
+    logger.info(f"[API] games={len(out)} for {date}")
     return out
 
+async def get_linescore(gamePk: int) -> Dict[str, Any]:
+    """The small /linescore document (inning, count, runners, runs) for one game."""
+    r = await upstream.get(f"{BASE}/game/{gamePk}/linescore"); r.raise_for_status()
+    return r.json()
+
 def _safe(d: dict, *path, default=None):
     cur = d
     for p in path:
@@ -45,97 +88,250 @@ def _player_name(players: dict, pid: Optional[int]) -> Optional[str]:
     key = f"ID{pid}"
     return _safe(players, key, "fullName")
 
-def stream_pitches(gamePk: int, poll_seconds: float = 2.5) -> Generator[Dict[str, Any], None, None]:
-    """Yield normalized 'pitch' events for gamePk with idempotency and retries."""
-    backoff = poll_seconds
-    seen: set[str] = set()
-    print(f"[STREAM] start gamePk={gamePk} poll={poll_seconds}s")
-
-    while True:
-        try:
-            url = f"{LIVE}/game/{gamePk}/feed/live"
-            r = requests.get(url, timeout=20)
-            if r.status_code >= 500:
-                print(f"[API] {r.status_code} on live feed; backing off {backoff:.1f}s")
-                time.sleep(backoff); continue
-            r.raise_for_status()
-            data = r.json()
-
-            players = _safe(data, "gameData", "players", default={})
-            linescore = _safe(data, "liveData", "linescore", default={})
-            offense = _safe(linescore, "offense", default={})
-
-            all_plays = _safe(data, "liveData", "plays", "allPlays", default=[]) or []
-            for play in all_plays:
-                about = play.get("about", {})
-                matchup = play.get("matchup", {})
-                batter_id = _safe(matchup, "batter", "id")
-                pitcher_id = _safe(matchup, "pitcher", "id")
-
-                # iterate playEvents and pick pitches
-                events = play.get("playEvents", []) or []
-                atBatIndex = play.get("atBatIndex")
-                inning = about.get("inning")
-                half = about.get("halfInning")
-                outs = about.get("outs")
-
-                for idx, pe in enumerate(events, start=1):
-                    is_pitch = bool(_safe(pe, "details", "isPitch", default=False)) or ("pitchData" in pe)
-                    if not is_pitch: continue
-
-                    pnum = pe.get("pitchNumber") or idx
-                    key = f"{gamePk}-{atBatIndex}-{pnum}"
-                    if key in seen: continue
-                    seen.add(key)
-
-                    call_desc = _safe(pe, "details", "call", "description")
-                    outcome = call_desc or _safe(pe, "details", "description")
-                    ptype = _safe(pe, "details", "type", "description")
-
-                    mph = _safe(pe, "pitchData", "startSpeed")
-                    px = _safe(pe, "pitchData", "coordinates", "pX")
-                    pz = _safe(pe, "pitchData", "coordinates", "pZ")
-                    sz_top = _safe(pe, "pitchData", "strikeZoneTop")
-                    sz_bot = _safe(pe, "pitchData", "strikeZoneBottom")
-
-                    balls = _safe(pe, "count", "balls")
-                    strikes = _safe(pe, "count", "strikes")
-
-                    ev = {
-                        "event": "pitch",
-                        "ts": _iso_now(),
-                        "gamePk": gamePk,
-                        "inning": inning,
-                        "half": half,
-                        "outs": outs,
-                        "count": {"balls": balls, "strikes": strikes},
-                        "batterId": batter_id,
-                        "batterName": _player_name(players, batter_id),
-                        "pitcherId": pitcher_id,
-                        "pitcherName": _player_name(players, pitcher_id),
-                        "pitchNumber": pnum,
-                        "pitchType": ptype,
-                        "mph": mph,
-                        "outcome": outcome,
-                        "locX": px, "locZ": pz,
-                        "szTop": sz_top, "szBot": sz_bot,
-                        # live base state from linescore offense block
-                        "onFirst": bool(offense.get("first")),
-                        "onSecond": bool(offense.get("second")),
-                        "onThird": bool(offense.get("third")),
-                        "atBatIndex": atBatIndex,
-                        "idempotencyKey": key
-                    }
-                    print(f"[PITCH] {key} {ptype or '—'} {outcome or '—'} mph={mph} loc=({px},{pz}) count={balls}-{strikes}")
-                    yield ev
-
-            backoff = poll_seconds
-            time.sleep(poll_seconds)
-
-        except requests.RequestException as e:
-            print(f"[ERR] network {e}; retry in {backoff:.1f}s")
-            time.sleep(backoff)
-            backoff = min(backoff * 1.7, 15.0)
-        except Exception as e:
-            print(f"[ERR] unexpected {e}; keeping stream alive")
-            time.sleep(poll_seconds)
+def normalize_pitch(gamePk: int, play: dict, pe: dict, idx: int, players: dict, offense: dict) -> Dict[str, Any]:
+    """Build the stable per-pitch event from one playEvents entry (idx is 1-based)."""
+    about = play.get("about", {})
+    matchup = play.get("matchup", {})
+    batter_id = _safe(matchup, "batter", "id")
+    pitcher_id = _safe(matchup, "pitcher", "id")
+    atBatIndex = play.get("atBatIndex")
+
+    pnum = pe.get("pitchNumber") or idx
+    call_desc = _safe(pe, "details", "call", "description")
+    outcome = call_desc or _safe(pe, "details", "description")
+
+    return {
+        "event": "pitch",
+        "ts": pe.get("startTime") or _iso_now(),
+        "gamePk": gamePk,
+        "inning": about.get("inning"),
+        "half": about.get("halfInning"),
+        "outs": _safe(pe, "count", "outs", default=about.get("outs")),
+        "count": {"balls": _safe(pe, "count", "balls"), "strikes": _safe(pe, "count", "strikes")},
+        "batterId": batter_id,
+        "batterName": _player_name(players, batter_id),
+        "pitcherId": pitcher_id,
+        "pitcherName": _player_name(players, pitcher_id),
+        "pitchNumber": pnum,
+        "pitchType": _safe(pe, "details", "type", "description"),
+        "pitchCode": _safe(pe, "details", "code"),
+        "mph": _safe(pe, "pitchData", "startSpeed"),
+        "outcome": outcome,
+        "locX": _safe(pe, "pitchData", "coordinates", "pX"),
+        "locZ": _safe(pe, "pitchData", "coordinates", "pZ"),
+        "szTop": _safe(pe, "pitchData", "strikeZoneTop"),
+        "szBot": _safe(pe, "pitchData", "strikeZoneBottom"),
+        "physics": physics_of(pe.get("pitchData") or {}),   # release/velocity/acceleration fit; None if absent
+        # live base state from linescore offense block
+        "onFirst": bool(offense.get("first")),
+        "onSecond": bool(offense.get("second")),
+        "onThird": bool(offense.get("third")),
+        "atBatIndex": atBatIndex,
+        "idempotencyKey": f"{gamePk}-{atBatIndex}-{pnum}",
+    }
+
+def normalize_play(gamePk: int, play: dict) -> Dict[str, Any]:
+    """'play' result event for a completed plate appearance: eventType plus post-play outs/bases/score."""
+    about = play.get("about", {})
+    matchup = play.get("matchup", {})
+    result = play.get("result", {})
+    ab = play.get("atBatIndex")
+    return {
+        "event": "play",
+        "ts": about.get("endTime") or _iso_now(),
+        "gamePk": gamePk,
+        "inning": about.get("inning"),
+        "half": about.get("halfInning"),
+        "atBatIndex": ab,
+        "eventType": result.get("eventType"),
+        "description": result.get("event"),
+        "outs": _safe(play, "count", "outs"),
+        "bases": {"onFirst": "postOnFirst" in matchup, "onSecond": "postOnSecond" in matchup,
+                  "onThird": "postOnThird" in matchup},
+        "awayScore": result.get("awayScore"),
+        "homeScore": result.get("homeScore"),
+        "idempotencyKey": f"{gamePk}-{ab}-play",
+    }
+
+def teams_for(gamePk: int) -> Optional[Dict[str, str]]:
+    """Cached {away, home} names for gamePk, if a schedule or feed payload has been seen."""
+    meta = game_meta.get(gamePk)
+    if meta and meta.get("away") and meta.get("home"):
+        return {"away": meta["away"], "home": meta["home"]}
+    return None
+
+def game_info(gamePk: int, data: dict) -> Dict[str, Any]:
+    """'game' metadata event (date, team names, status) taken from a feed document."""
+    gd = data.get("gameData", {}) or {}
+    return {
+        "event": "game",
+        "gamePk": gamePk,
+        "gameDate": _safe(gd, "datetime", "officialDate") or dt.datetime.utcnow().date().isoformat(),
+        "away": _safe(gd, "teams", "away", "name"),
+        "home": _safe(gd, "teams", "home", "name"),
+        "status": _safe(gd, "status", "detailedState"),
+    }
+
+def _is_pitch(pe: dict) -> bool:
+    return bool(_safe(pe, "details", "isPitch", default=False)) or ("pitchData" in pe)
+
+class PlayCursor:
+    """Resume point into liveData.plays.allPlays so a poll only re-reads new or open plays.
+
+    next_play is the first allPlays index not yet known complete (everything before it
+    is done and forgotten); offsets holds how many playEvents were consumed for each
+    play from there on, and keys the pitch keys emitted for those same open plays.
+    A 'play' result event follows a play's pitches once it is complete.
+    Memory is bounded by the handful of open plays, not by game length.
+    """
+
+    def __init__(self, gamePk: int):
+        self.gamePk = gamePk
+        self.next_play = 0
+        self.offsets: Dict[int, int] = {}
+        self.keys: Dict[int, set] = {}
+        self.last_scanned = 0   # playEvents examined on the last scan
+        self.last_parse_ms = 0.0
+
+    @property
+    def last_complete_at_bat(self) -> int:
+        return self.next_play - 1
+
+    def scan(self, data: dict) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        players = _safe(data, "gameData", "players", default={})
+        offense = _safe(data, "liveData", "linescore", "offense", default={})
+        all_plays = _safe(data, "liveData", "plays", "allPlays", default=[]) or []
+
+        out: List[Dict[str, Any]] = []
+        scanned = 0
+        for i in range(self.next_play, len(all_plays)):
+            play = all_plays[i]
+            events = play.get("playEvents", []) or []
+            start = min(self.offsets.get(i, 0), len(events))
+            seen = self.keys.setdefault(i, set())
+            for idx in range(start, len(events)):
+                pe = events[idx]
+                scanned += 1
+                if not _is_pitch(pe): continue
+                ev = normalize_pitch(self.gamePk, play, pe, idx + 1, players, offense)
+                if ev["idempotencyKey"] in seen: continue
+                seen.add(ev["idempotencyKey"])
+                out.append(ev)
+            self.offsets[i] = len(events)
+            if _safe(play, "about", "isComplete", default=False) and "play" not in seen:
+                seen.add("play")
+                out.append(normalize_play(self.gamePk, play))
+
+        # Advance past the leading run of finished at-bats and drop their state.
+        while self.next_play < len(all_plays) and _safe(all_plays[self.next_play], "about", "isComplete", default=False):
+            self.offsets.pop(self.next_play, None)
+            self.keys.pop(self.next_play, None)
+            self.next_play += 1
+
+        self.last_scanned = scanned
+        self.last_parse_ms = (time.perf_counter() - t0) * 1000.0
+        return out
+
+def _log_fields(ev: Dict[str, Any]) -> Dict[str, Any]:
+    if ev["event"] == "play":
+        return {"key": ev["idempotencyKey"], "event": "play", "type": ev["eventType"], "outs": ev["outs"],
+                "score": f"{ev['awayScore']}-{ev['homeScore']}"}
+    return {"key": ev["idempotencyKey"], "event": "pitch", "type": ev["pitchType"], "outcome": ev["outcome"],
+            "mph": ev["mph"], "count": f"{ev['count']['balls']}-{ev['count']['strikes']}"}
+
+def poll_delay(doc: Optional[dict], idle: float, base: float = POLL_LIVE) -> Optional[float]:
+    """Seconds until the next poll of a feed in this state, None once the game is over.
+    idle is how long since the last new event."""
+    status = _safe(doc, "gameData", "status", default={}) or {}
+    detailed = status.get("detailedState") or ""
+    abstract = status.get("abstractGameState") or ""
+    if abstract == "Final" or detailed.startswith(DONE_STATES):
+        return None
+    if "Delay" in detailed:                # "Delayed", "Delayed Start: Rain", ...
+        return max(base, POLL_DELAYED)
+    if abstract == "Preview" or detailed in ("Scheduled", "Pre-Game", "Warmup"):
+        return max(base, POLL_BREAK if detailed == "Warmup" else POLL_PREGAME)
+    if _safe(doc, "liveData", "linescore", "inningState") in ("Middle", "End"):
+        return max(base, POLL_BREAK)
+    # in play: wait at most a quarter of the current lull, so a late pitch is at most ~25% late
+    return min(max(base, idle / 4), max(base, POLL_IDLE_MAX))
+
+def leverage(doc: Optional[dict]) -> float:
+    """Poll priority weight for the game situation: extra innings, then late and close."""
+    ls = _safe(doc, "liveData", "linescore", default={}) or {}
+    inning = ls.get("currentInning") or 0
+    teams = ls.get("teams") or {}
+    diff = abs(((teams.get("away") or {}).get("runs") or 0) - ((teams.get("home") or {}).get("runs") or 0))
+    if inning >= 10:
+        return 2.0
+    if inning >= 7 and diff <= 2:
+        return 1.5
+    return 1.2 if diff <= 1 else 1.0
+
+async def stream_pitches(gamePk: int, poll_seconds: float = POLL_LIVE, incremental: bool = True) -> AsyncGenerator[Dict[str, Any], None]:
+    """Yield normalized 'pitch' events for gamePk with idempotency and retries.
+
+    A 'game' metadata event (see game_info) precedes the pitches of the first payload
+    and is repeated whenever it changes, e.g. on status transitions. With incremental=True
+    the feed is kept current through diffPatch (live_feed.LiveFeed), and polls where
+    nothing changed skip parsing. A PlayCursor keeps per-poll parse work proportional
+    to what changed, not to game length.
+    Polls are paced by poll_delay (poll_seconds while in play) within the global budget
+    of poll_scheduler.polls, and the generator ends once the feed says the game is over.
+    """
+    cursor = PlayCursor(gamePk)
+    info: Optional[Dict[str, Any]] = None
+    logger.info(f"[STREAM] start gamePk={gamePk} poll={poll_seconds}s incremental={incremental}")
+
+    # Requests go through the shared pooled client, which retries 429/5xx/transport
+    # errors with backoff; what reaches us here has already exhausted its retries.
+    feed = LiveFeed(upstream, gamePk, incremental=incremental, base=LIVE)
+    last_new = time.monotonic()
+    pollers = ACTIVE_POLLERS.labels(str(gamePk))
+    pollers.inc()
+    try:
+        while True:
+            try:
+                changed = await feed.refresh()
+                POLLS.labels(feed.last_mode).inc()
+                if changed:
+                    latest = game_info(gamePk, feed.doc)
+                    if latest != info:
+                        info = latest
+                        game_meta.put(gamePk, {k: v for k, v in info.items() if k != "event"})
+                        yield dict(info)
+
+                    events = cursor.scan(feed.doc)
+                    trajectories.precompute(events)   # one batch per poll
+                    POLL_EVENTS.observe(len(events))
+                    NORMALIZE_SECONDS.observe(cursor.last_parse_ms / 1000.0)
+                    if log_poll.due():
+                        log_poll(game=gamePk, mode=feed.last_mode, bytes=feed.last_bytes, fetch_ms=round(feed.last_ms),
+                                 scanned=cursor.last_scanned, new=len(events), parse_ms=round(cursor.last_parse_ms, 2),
+                                 cursor=cursor.last_complete_at_bat)
+                    for ev in events:
+                        if log_event.due():
+                            log_event(**_log_fields(ev))
+                        yield ev
+                    if events:
+                        last_new = time.monotonic()
+
+                delay = poll_delay(feed.doc, time.monotonic() - last_new, poll_seconds)
+                if delay is None:
+                    logger.info(f"[STREAM] {gamePk} {(info or {}).get('status')}; polling stopped")
+                    return
+                POLL_INTERVAL.observe(delay)
+                idle = time.monotonic() - last_new
+                await polls.slot(gamePk, delay, leverage(feed.doc), idle)
+
+            except httpx.HTTPError as e:
+                logger.warning(f"[ERR] live feed {gamePk}: {e}; next poll in {poll_seconds * 2:.1f}s")
+                await polls.slot(gamePk, poll_seconds * 2)
+            except Exception as e:
+                logger.warning(f"[ERR] unexpected {e}; keeping stream alive")
+                await polls.slot(gamePk, poll_seconds)
+    finally:
+        pollers.dec()
+        if pollers.value <= 0:
+            ACTIVE_POLLERS.remove(str(gamePk))
@@ -0,0 +1,112 @@
+# poll_scheduler.py — one global StatsAPI request budget shared by every game poller
+# Pollers ask for a slot instead of sleeping: "poll me again in `delay` seconds". A
+# single dispatcher grants slots from a token bucket (POLL_BUDGET requests/s, bursts of
+# at most POLL_BURST), so polls are spread out over time and the total rate is capped
+# however many games are live. When more games are due than the budget allows, the
+# one with the highest priority goes first: more viewers, a late or close game, a feed
+# that changed recently; a poll's priority grows the longer it is held past its due
+# time, so nobody starves. Concurrent requests for the same key share one slot.
+# POLL_BUDGET=0 turns the budget off (plain sleeps).
+
+import asyncio, math, os, time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from metrics import POLL_HOLD_SECONDS
+
+POLL_BUDGET = float(os.getenv("POLL_BUDGET", "8"))   # upstream polls per second, all games together
+POLL_BURST = float(os.getenv("POLL_BURST", "2"))     # polls that may go back to back
+RECENT = 30.0                                        # seconds a feed change counts as recent
+BACKGROUND = 0.5                                     # leverage for background polls: below any live game
+
+class _Wait:
+    __slots__ = ("key", "due", "interval", "leverage", "idle", "future", "users")
+
+    def __init__(self, key: Hashable, due: float, interval: float, leverage: float, idle: float,
+                 future: asyncio.Future):
+        self.key = key
+        self.due = due
+        self.interval = interval
+        self.leverage = leverage
+        self.idle = idle
+        self.future = future
+        self.users = 1
+
+class PollScheduler:
+    """Token-bucket dispatcher for poll slots; audience(key) gives a key's viewer count."""
+
+    def __init__(self, rate: float = POLL_BUDGET, burst: float = POLL_BURST):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.audience: Callable[[Hashable], int] = lambda key: 0
+        self.waiting: Dict[Hashable, _Wait] = {}
+        self.granted = 0
+        self.held = 0.0            # total seconds slots were held past their due time
+        self._stamp = time.monotonic()
+        self._kick: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def slot(self, key: Hashable, delay: float, leverage: float = 1.0, idle: float = 0.0):
+        """Return once key may poll: no sooner than delay from now, and within the budget.
+        leverage scales priority (game situation); idle is seconds since the feed last changed."""
+        if self.rate <= 0:
+            await asyncio.sleep(delay)
+            return
+        w = self.waiting.get(key)
+        if w is not None and not w.future.done():
+            # already waiting for this key (e.g. two scoreboards, one game): share that slot
+            w.due = min(w.due, time.monotonic() + delay)
+            w.users += 1
+        else:
+            w = _Wait(key, time.monotonic() + delay, delay, leverage, idle, asyncio.get_running_loop().create_future())
+            self.waiting[key] = w
+        if self._task is None or self._task.done():
+            self._kick = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="poll-scheduler")
+        self._kick.set()
+        try:
+            await asyncio.shield(w.future)   # one caller giving up must not cancel the others
+        finally:
+            w.users -= 1
+            if w.users == 0 and self.waiting.get(key) is w:
+                del self.waiting[key]
+                w.future.cancel()
+
+    def priority(self, w: _Wait, now: float) -> float:
+        weight = (1.0 + math.log2(1 + self.audience(w.key))) * w.leverage * (1.5 if w.idle < RECENT else 1.0)
+        return weight * (1.0 + (now - w.due) / max(w.interval, 1.0))
+
+    async def _run(self):
+        while True:
+            self._kick.clear()
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            due = [w for w in self.waiting.values() if w.due <= now and not w.future.done()]
+            if due and self.tokens >= 1:
+                w = max(due, key=lambda w: self.priority(w, now))
+                self.tokens -= 1
+                self.granted += 1
+                self.held += now - w.due
+                POLL_HOLD_SECONDS.observe(now - w.due)
+                del self.waiting[w.key]
+                w.future.set_result(None)
+                continue
+            if due:
+                timeout: Optional[float] = (1 - self.tokens) / self.rate
+            elif self.waiting:
+                timeout = max(0.0, min(w.due for w in self.waiting.values()) - now)
+            else:
+                timeout = None
+            try:
+                await asyncio.wait_for(self._kick.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {"budget_per_s": self.rate, "burst": self.burst, "granted": self.granted,
+                "held_s": round(self.held, 1), "waiting": len(self.waiting),
+                "overdue": sum(1 for w in self.waiting.values() if w.due <= now)}
+
+polls = PollScheduler()
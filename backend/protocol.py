@@ -0,0 +1,141 @@
+# protocol.py — wire representations of reduced events
+# "full" (default): every pitch event carries the whole reducer state (teams/score/game),
+# as it always has. "delta": a client gets one snapshot, then pitch events carry only
+# the state fields that changed plus a per-stream sequence number; on a seq gap the
+# client asks for a fresh snapshot. A conflated event (see subscriber.py) stands in for
+# several: its delta is their union and "base" names the seq that delta applies on top of.
+# Each StreamEvent is encoded at most once per (protocol, transport) and the cached
+# bytes/text are written to every subscriber as-is.
+
+import json, time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:  # optional fast path
+    import orjson
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+except ImportError:
+    orjson = None
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+from metrics import SERIALIZE_SECONDS
+
+PROTOCOLS = ("full", "delta")
+STATE_KEYS = ("teams", "score", "game")  # per-event state blocks left out of delta payloads
+
+def state_of(ev: Dict[str, Any]) -> Dict[str, Any]:
+    """Flat reducer state (same keys as GameReducer.state) from a reduced event."""
+    game = ev.get("game") or {}
+    return {
+        "inning": game.get("inning"),
+        "half": game.get("half"),
+        "outs": game.get("outs"),
+        "count": game.get("count"),
+        "bases": game.get("bases"),
+        "score": ev.get("score"),
+        "teams": ev.get("teams"),
+    }
+
+def snapshot_message(seq: int, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"type": "snapshot", "seq": seq, "state": state}
+
+def sse_frame(body: bytes, event_id: Optional[str] = None) -> bytes:
+    return (b"id: " + event_id.encode("utf-8") + b"\n" if event_id else b"") + b"data: " + body + b"\n\n"
+
+class StreamEvent:
+    """A reduced event plus its sequence number and state delta, shared by all subscribers.
+
+    Treat as immutable once published: encodings are cached on first use.
+    """
+    __slots__ = ("seq", "key", "event", "delta", "state", "base", "published", "origin", "_enc")
+
+    def __init__(self, seq: int, event: Dict[str, Any], delta: Dict[str, Any], state: Dict[str, Any],
+                 base: Optional[int] = None):
+        self.seq = seq
+        self.key = event.get("idempotencyKey")
+        self.event = event
+        self.delta = delta
+        self.state = state
+        self.base = base
+        self.published: Optional[float] = None   # monotonic time a live hub published it
+        self.origin: Optional[float] = None      # upstream event time (epoch seconds), if known
+        self._enc: Dict[Tuple[str, str], Any] = {}
+
+    def json_bytes(self, protocol: str = "full") -> bytes:
+        k = (protocol, "json")
+        b = self._enc.get(k)
+        if b is None:
+            t0 = time.perf_counter()
+            b = self._enc[k] = dumps(self.payload(protocol))
+            SERIALIZE_SECONDS.labels(protocol).observe(time.perf_counter() - t0)
+        return b
+
+    def sse(self, protocol: str = "full") -> bytes:
+        """SSE-framed bytes (id + data lines)."""
+        k = (protocol, "sse")
+        b = self._enc.get(k)
+        if b is None:
+            b = self._enc[k] = sse_frame(self.json_bytes(protocol), self.key)
+        return b
+
+    def ws_text(self, protocol: str = "full") -> str:
+        """WebSocket text-frame payload."""
+        k = (protocol, "ws")
+        t = self._enc.get(k)
+        if t is None:
+            t = self._enc[k] = self.json_bytes(protocol).decode("utf-8")
+        return t
+
+    def cached(self, k: Tuple[str, str], encode: Callable[[], Any]) -> Any:
+        """Encoding for k from the cache, computing it once with encode() (other wire formats)."""
+        v = self._enc.get(k)
+        if v is None:
+            t0 = time.perf_counter()
+            v = self._enc[k] = encode()
+            SERIALIZE_SECONDS.labels(k[0]).observe(time.perf_counter() - t0)
+        return v
+
+    def payload(self, protocol: str = "full") -> Dict[str, Any]:
+        if protocol != "delta":
+            return self.event
+        out = {k: v for k, v in self.event.items() if k not in STATE_KEYS}
+        out["delta"] = self.delta
+        if self.base is not None:
+            out["base"] = self.base
+        return out
+
+def conflate(older: StreamEvent, newer: StreamEvent) -> StreamEvent:
+    """One event standing in for two consecutive ones: newer's payload, both deltas."""
+    base = older.base if older.base is not None else older.seq - 1
+    out = StreamEvent(newer.seq, newer.event, {**older.delta, **newer.delta}, newer.state, base)
+    out.published, out.origin = newer.published, newer.origin
+    return out
+
+class DeltaTracker:
+    """Numbers one stream's reduced events and diffs consecutive reducer states."""
+
+    def __init__(self):
+        self.seq = 0
+        self._last: Dict[str, Any] = {}
+
+    def reset(self):
+        """Forget the previous state so the next delta carries every field (e.g. after a seek)."""
+        self._last = {}
+
+    def wrap(self, ev: Dict[str, Any]) -> StreamEvent:
+        self.seq += 1
+        ev["seq"] = self.seq
+        state = state_of(ev)
+        delta = {k: v for k, v in state.items() if k not in self._last or self._last[k] != v}
+        self._last = state
+        return StreamEvent(self.seq, ev, delta, state)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return snapshot_message(self.seq, self._last or None)
@@ -0,0 +1,210 @@
+# recorder.py — persist live ingestion into the SQLite replay DB
+# The hub producer hands every reduced pitch to PitchRecorder.record(), which only
+# enqueues; a writer thread batches rows into WAL-mode transactions so recording
+# never adds latency to live fan-out. Recorded games replay via source=db.
+
+import logging, queue, sqlite3, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("gamecast")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+  gamePk INTEGER PRIMARY KEY,
+  gameDate TEXT NOT NULL,
+  away TEXT NOT NULL,
+  home TEXT NOT NULL,
+  status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pitches (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  gamePk INTEGER NOT NULL,
+  atBatIndex INTEGER NOT NULL,
+  pitchNumber INTEGER NOT NULL,
+  inning INTEGER NOT NULL,
+  half TEXT NOT NULL,
+  outs INTEGER NOT NULL,
+  balls INTEGER NOT NULL,
+  strikes INTEGER NOT NULL,
+  pitchType TEXT,
+  mph REAL,
+  locX REAL,
+  locZ REAL,
+  outcome TEXT,
+  ts TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pitches_game ON pitches(gamePk, atBatIndex, pitchNumber);
+CREATE INDEX IF NOT EXISTS idx_games_date ON games(gameDate, home, away);
+"""
+
+# Columns added on top of the original hand-loaded schema (name, SQL type).
+EXTRA_PITCH_COLUMNS: List[Tuple[str, str]] = [
+    ("batterId", "INTEGER"), ("batterName", "TEXT"),
+    ("pitcherId", "INTEGER"), ("pitcherName", "TEXT"),
+    ("onFirst", "INTEGER"), ("onSecond", "INTEGER"), ("onThird", "INTEGER"),
+    ("szTop", "REAL"), ("szBot", "REAL"),
+    ("awayScore", "INTEGER"), ("homeScore", "INTEGER"),
+    ("idempotencyKey", "TEXT"),
+    ("pitchCode", "TEXT"),
+    # pitchData fit (trajectory.PHYSICS_KEYS + extension)
+    ("x0", "REAL"), ("y0", "REAL"), ("z0", "REAL"), ("vX0", "REAL"), ("vY0", "REAL"), ("vZ0", "REAL"),
+    ("aX", "REAL"), ("aY", "REAL"), ("aZ", "REAL"), ("extension", "REAL"),
+]
+PHYSICS_COLUMNS = ("x0", "y0", "z0", "vX0", "vY0", "vZ0", "aX", "aY", "aZ", "extension")
+
+PITCH_COLUMNS = [
+    "gamePk", "atBatIndex", "pitchNumber", "inning", "half", "outs", "balls", "strikes",
+    "pitchType", "mph", "locX", "locZ", "outcome", "ts",
+] + [name for name, _ in EXTRA_PITCH_COLUMNS]
+
+INSERT_PITCH = (
+    f"INSERT OR IGNORE INTO pitches ({', '.join(PITCH_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in PITCH_COLUMNS)})"
+)
+UPSERT_GAME = (
+    "INSERT INTO games (gamePk, gameDate, away, home, status) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(gamePk) DO UPDATE SET gameDate=excluded.gameDate, away=excluded.away, "
+    "home=excluded.home, status=excluded.status"
+)
+
+def ensure_schema(conn: sqlite3.Connection):
+    """Create missing tables/indexes and add recorder columns to older DBs (idempotent)."""
+    conn.executescript(SCHEMA)
+    have = {r[1] for r in conn.execute("PRAGMA table_info(pitches)")}
+    for name, sqltype in EXTRA_PITCH_COLUMNS:
+        if name not in have:
+            try:
+                conn.execute(f"ALTER TABLE pitches ADD COLUMN {name} {sqltype}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e):   # another worker added it first
+                    raise
+    conn.commit()
+    # Re-recording the same pitch (stream restart, reconnect) must be a no-op: the keyset
+    # index doubles as the uniqueness constraint, so older DBs get theirs rebuilt UNIQUE.
+    conn.execute("BEGIN IMMEDIATE")   # one worker migrates; the others see the result
+    try:
+        unique = {r[1]: r[2] for r in conn.execute("PRAGMA index_list(pitches)")}
+        if not unique.get("idx_pitches_game"):
+            conn.execute("DELETE FROM pitches WHERE id NOT IN "
+                         "(SELECT MIN(id) FROM pitches GROUP BY gamePk, atBatIndex, pitchNumber)")
+            conn.execute("DROP INDEX IF EXISTS idx_pitches_game")
+            conn.execute("CREATE UNIQUE INDEX idx_pitches_game ON pitches(gamePk, atBatIndex, pitchNumber)")
+        conn.execute("DROP INDEX IF EXISTS idx_pitches_unique")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def prepare_db(path: str):
+    """Once per process, before any reader: WAL mode (persistent) and the current schema."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        ensure_schema(conn)
+    finally:
+        conn.close()
+
+def _flag(v: Any) -> Optional[int]:
+    return None if v is None else int(bool(v))
+
+def pitch_row(ev: Dict[str, Any]) -> Optional[tuple]:
+    """Flatten a reduced pitch event into a pitches row; None if it lacks the required keys."""
+    game = ev.get("game") or {}
+    count = ev.get("count") or {}
+    pitch = ev.get("pitch") or {}
+    # Reduced bases (as of the pitch) beat the raw onFirst/... copied from the linescore at poll time.
+    bases = game.get("bases") or ev.get("bases") or {}
+    score = ev.get("score") or {}
+    physics = ev.get("physics") or pitch.get("physics") or {}
+    inning = ev.get("inning") or game.get("inning")
+    half = ev.get("half") or game.get("half")
+    outs = ev.get("outs") if ev.get("outs") is not None else game.get("outs")
+    balls, strikes = count.get("balls"), count.get("strikes")
+    pnum = ev.get("pitchNumber") or pitch.get("number")
+    if None in (ev.get("gamePk"), ev.get("atBatIndex"), pnum, inning, half, outs, balls, strikes):
+        return None
+    return (
+        ev["gamePk"], ev["atBatIndex"], pnum, inning, half, outs, balls, strikes,
+        ev.get("pitchType") or pitch.get("type"),
+        ev.get("mph") or pitch.get("mph"),
+        ev.get("locX") if "locX" in ev else (pitch.get("loc") or {}).get("px"),
+        ev.get("locZ") if "locZ" in ev else (pitch.get("loc") or {}).get("pz"),
+        ev.get("outcome") or pitch.get("outcome"),
+        ev.get("ts"),
+        ev.get("batterId"), ev.get("batterName"),
+        ev.get("pitcherId"), ev.get("pitcherName"),
+        _flag(bases.get("onFirst", ev.get("onFirst"))),
+        _flag(bases.get("onSecond", ev.get("onSecond"))),
+        _flag(bases.get("onThird", ev.get("onThird"))),
+        ev.get("szTop"), ev.get("szBot"),
+        score.get("away"), score.get("home"),
+        ev.get("idempotencyKey"),
+        ev.get("pitchCode") or pitch.get("code"),
+    ) + tuple(physics.get(k) for k in PHYSICS_COLUMNS)
+
+class PitchRecorder:
+    """Background batch writer for games/pitches rows."""
+
+    def __init__(self, db_path: str, batch_size: int = 200, flush_seconds: float = 1.0, max_pending: int = 50000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.written = 0
+        self._q: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="pitch-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, ev: Dict[str, Any]):
+        row = pitch_row(ev)
+        if row is None:
+            return
+        self._put(("pitch", row))
+
+    def record_game(self, gamePk: int, gameDate: str, away: str, home: str, status: str):
+        self._put(("game", (gamePk, gameDate, away or "Away", home or "Home", status or "Unknown")))
+
+    def _put(self, item: Tuple[str, tuple]):
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        self._q.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")   # schema: prepare_db() at app startup
+        closing = False
+        while not closing:
+            batch: List[Tuple[str, tuple]] = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Tuple[str, tuple]]):
+        games = [row for kind, row in batch if kind == "game"]
+        pitches = [row for kind, row in batch if kind == "pitch"]
+        try:
+            with conn:
+                if games:
+                    conn.executemany(UPSERT_GAME, games)
+                if pitches:
+                    before = conn.total_changes
+                    conn.executemany(INSERT_PITCH, pitches)
+                    self.written += conn.total_changes - before
+        except sqlite3.Error as e:
+            logger.error(f"[REC] batch of {len(batch)} failed: {e}")
@@ -0,0 +1,248 @@
+# reducer.py — server-side game state reducer
+# Classifies events from StatsAPI's structured fields instead of outcome text:
+# pitch calls by details.code (PITCH_CLASS), plate-appearance results by
+# result.eventType (RESULTS). RESULTS is precomputed for every base-occupancy
+# bitmask, so applying a result is one tuple lookup. Play events from the live
+# feed carry the authoritative post-play outs/bases/score and override the table.
+# State lives in a few ints; the count/bases dicts attached to events are shared,
+# precomputed objects — treat reduced events as read-only.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# --- Pitch calls (details.code) ---
+BALL, STRIKE, FOUL, IN_PLAY, HBP = range(5)
+
+PITCH_CLASS: Dict[str, int] = {
+    "B": BALL, "*B": BALL, "V": BALL, "P": BALL, "I": BALL,
+    "C": STRIKE, "S": STRIKE, "W": STRIKE, "T": STRIKE, "M": STRIKE, "Q": STRIKE, "A": STRIKE,
+    "L": STRIKE, "O": STRIKE,   # foul bunts / bunt foul tips count as strikes with two strikes too
+    "F": FOUL, "R": FOUL,
+    "X": IN_PLAY, "D": IN_PLAY, "E": IN_PLAY,
+    "H": HBP,
+}
+
+# Call descriptions → code, for sources that only kept the text (older replay rows).
+DESC_CODES: Dict[str, str] = {
+    "ball": "B", "ball in dirt": "*B", "automatic ball": "V", "pitchout": "P", "intent ball": "I",
+    "called strike": "C", "swinging strike": "S", "swinging strike (blocked)": "W", "foul tip": "T",
+    "missed bunt": "M", "swinging pitchout": "Q", "automatic strike": "A", "foul bunt": "L",
+    "bunt foul tip": "O", "foul": "F", "foul pitchout": "R",
+    "in play, out(s)": "X", "in play, no out": "D", "in play, run(s)": "E", "hit by pitch": "H",
+}
+
+# Result inferred from an in-play call when no play event will follow (replays).
+IN_PLAY_RESULT = {"X": "field_out", "D": "single", "E": "in_play_run"}
+
+# --- Plate-appearance results (result.eventType) ---
+# (batter_to, runner_advance, runners_out): batter_to 0 = out, 1-3 = base, 4 = scores,
+# None = batter stays up (baserunning play); runner_advance FORCE = only forced runners move.
+FORCE = -1
+EVENT_SPEC: Dict[str, Tuple[Optional[int], int, int]] = {
+    "single": (1, 1, 0), "double": (2, 2, 0), "triple": (3, 3, 0), "home_run": (4, 4, 0),
+    "walk": (1, FORCE, 0), "intent_walk": (1, FORCE, 0), "hit_by_pitch": (1, FORCE, 0),
+    "catcher_interf": (1, FORCE, 0), "fielders_choice": (1, FORCE, 0), "field_error": (1, 1, 0),
+    "in_play_run": (1, 2, 0),
+    "strikeout": (0, 0, 0), "field_out": (0, 0, 0), "sac_fly": (0, 1, 0), "sac_bunt": (0, 1, 0),
+    "force_out": (1, FORCE, 1), "fielders_choice_out": (1, FORCE, 1),
+    "double_play": (0, 0, 1), "grounded_into_double_play": (0, 0, 1), "strikeout_double_play": (0, 0, 1),
+    "sac_fly_double_play": (0, 1, 1), "sac_bunt_double_play": (0, 1, 1), "triple_play": (0, 0, 2),
+    "caught_stealing_2b": (None, 0, 1), "caught_stealing_3b": (None, 0, 1), "caught_stealing_home": (None, 0, 1),
+    "pickoff_1b": (None, 0, 1), "pickoff_2b": (None, 0, 1), "pickoff_3b": (None, 0, 1),
+    "pickoff_caught_stealing_2b": (None, 0, 1), "pickoff_caught_stealing_3b": (None, 0, 1),
+    "pickoff_caught_stealing_home": (None, 0, 1), "other_out": (None, 0, 1),
+}
+
+def _resolve(spec: Tuple[Optional[int], int, int], bases: int, min_runs: int = 0) -> Tuple[int, int, int]:
+    """(bases after, runs, outs) for one result applied to a 3-bit occupancy mask (1st=1, 2nd=2, 3rd=4)."""
+    batter_to, advance, runners_out = spec
+    for _ in range(runners_out):          # unknown which runner: take the one forced first
+        if bases:
+            bases &= bases - 1
+    runs = 0
+    if advance == FORCE:
+        if bases & 1:
+            if bases & 2:
+                if bases & 4:
+                    runs += 1
+                bases |= 4
+            bases |= 2
+    elif advance:
+        moved = bases << advance
+        runs += bin(moved >> 3).count("1")
+        bases = moved & 7
+    if batter_to == 4:
+        runs += 1
+    elif batter_to:
+        bases |= 1 << (batter_to - 1)
+    outs = runners_out + (batter_to == 0)
+    return bases, max(runs, min_runs), outs
+
+RESULTS: Dict[str, Tuple[Tuple[int, int, int], ...]] = {
+    name: tuple(_resolve(spec, b, 1 if name == "in_play_run" else 0) for b in range(8))
+    for name, spec in EVENT_SPEC.items()
+}
+PA_CONTINUES = frozenset(name for name, spec in EVENT_SPEC.items() if spec[0] is None)
+
+# --- Shared output objects ---
+BASES: List[Dict[str, bool]] = [
+    {"onFirst": bool(b & 1), "onSecond": bool(b & 2), "onThird": bool(b & 4)} for b in range(8)
+]
+COUNTS: List[List[Dict[str, int]]] = [[{"balls": b, "strikes": s} for s in range(4)] for b in range(5)]
+
+def _count(balls: int, strikes: int) -> Dict[str, int]:
+    if 0 <= balls <= 4 and 0 <= strikes <= 3:
+        return COUNTS[balls][strikes]
+    return {"balls": balls, "strikes": strikes}
+
+_EMPTY: Dict[str, Any] = {}
+
+def _mask(bases: Dict[str, Any]) -> int:
+    b = 0
+    if bases.get("onFirst"): b = 1
+    if bases.get("onSecond"): b |= 2
+    if bases.get("onThird"): b |= 4
+    return b
+
+class GameReducer:
+    """Running game state for one stream; apply() attaches teams/score/game to each event.
+
+    infer_results: settle plate appearances from pitch calls (ball four, strike three,
+    in-play codes). Live streams turn it off — their 'play' events carry the result.
+    """
+    __slots__ = ("teams", "inning", "half", "outs", "balls", "strikes", "bases",
+                 "away", "home", "infer_results", "_score")
+
+    def __init__(self, teams: Optional[Dict[str, str]], score: Optional[Dict[str, int]] = None,
+                 infer_results: bool = True):
+        self.teams = teams or {"away": "Away", "home": "Home"}
+        self.inning = 1
+        self.half = "top"
+        self.outs = self.balls = self.strikes = self.bases = 0
+        self.away = int((score or {}).get("away") or 0)
+        self.home = int((score or {}).get("home") or 0)
+        self.infer_results = infer_results
+        self._score: Optional[Dict[str, int]] = None
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        return {"inning": self.inning, "half": self.half, "outs": self.outs,
+                "count": _count(self.balls, self.strikes), "bases": BASES[self.bases],
+                "score": {"away": self.away, "home": self.home}, "teams": self.teams}
+
+    def apply(self, ev: Dict[str, Any]) -> Dict[str, Any]:
+        if ev.get("event") == "play":
+            self._play(ev)
+        else:
+            self._pitch(ev)
+
+        # Attach state snapshot to outgoing event (shared by all subscribers)
+        if self._score is None:
+            self._score = {"away": self.away, "home": self.home}
+        ev["teams"] = self.teams
+        ev["score"] = self._score
+        balls, strikes = self.balls, self.strikes
+        ev["game"] = {
+            "inning": self.inning,
+            "half": self.half,
+            "outs": self.outs,
+            "count": COUNTS[balls][strikes] if 0 <= balls <= 4 and 0 <= strikes <= 3 else _count(balls, strikes),
+            "bases": BASES[self.bases],
+        }
+        return ev
+
+    # --- event kinds ---
+    def _pitch(self, ev: Dict[str, Any]):
+        self._context(ev)
+        if self.infer_results:
+            result = self._call(ev)
+            if result is not None:
+                self._result(result, ev.get("outs"))
+                return
+        # Mid-PA the feed's own count/outs are authoritative; outs never end the half here.
+        # Bases only move on results: a pitch's onFirst/... (linescore at poll time) may be newer than the pitch.
+        count = ev.get("count")
+        if count:
+            balls, strikes = count.get("balls"), count.get("strikes")
+            if balls is not None: self.balls = balls
+            if strikes is not None: self.strikes = strikes
+        outs = ev.get("outs")
+        if outs is not None and self.outs < outs < 3:
+            self.outs = outs
+
+    def _call(self, ev: Dict[str, Any]) -> Optional[str]:
+        """Advance the count for one pitch call; returns the PA result it settles, if any."""
+        pitch = ev.get("pitch") or _EMPTY
+        code = ev.get("pitchCode") or pitch.get("code")
+        if code is None:
+            desc = ev.get("outcome") or pitch.get("outcome")
+            code = DESC_CODES.get(desc.lower()) if isinstance(desc, str) else None
+        cls = PITCH_CLASS.get(code)
+        if cls == BALL:
+            if self.balls >= 3: return "walk"
+            self.balls += 1
+        elif cls == STRIKE:
+            if self.strikes >= 2: return "strikeout"
+            self.strikes += 1
+        elif cls == FOUL:
+            if self.strikes < 2: self.strikes += 1
+        elif cls == HBP:
+            return "hit_by_pitch"
+        elif cls == IN_PLAY:
+            return IN_PLAY_RESULT.get(code)
+        return None
+
+    def _play(self, ev: Dict[str, Any]):
+        self._context(ev)
+        outs = ev.get("outs")
+        bases = ev.get("bases")
+        if outs is None or not isinstance(bases, dict) or ev.get("awayScore") is None:
+            self._result(ev.get("eventType"), outs, end_half=False)
+        if outs is not None:
+            self.outs = outs
+        if isinstance(bases, dict):
+            self.bases = _mask(bases)
+        if ev.get("awayScore") is not None and ev.get("homeScore") is not None:
+            self._set_score(ev["awayScore"], ev["homeScore"])
+        if ev.get("eventType") not in PA_CONTINUES:
+            self.balls = self.strikes = 0
+        if self.outs >= 3:
+            self._next_half()
+
+    # --- helpers ---
+    def _context(self, ev: Dict[str, Any]):
+        """Follow the feed's inning/half; entering a new half clears outs, count and bases."""
+        inning, half = ev.get("inning"), ev.get("half")
+        if (inning is not None and inning != self.inning) or (half is not None and half != self.half):
+            if inning is not None: self.inning = inning
+            if half is not None: self.half = half
+            self.outs = self.balls = self.strikes = self.bases = 0
+
+    def _result(self, name: Optional[str], outs_after: Optional[int] = None, end_half: bool = True):
+        row = RESULTS.get(name)
+        if row is None:
+            return
+        bases, runs, outs = row[self.bases]
+        self.bases = bases
+        self.outs += outs
+        if outs_after is not None and outs_after > self.outs:
+            self.outs = min(outs_after, 3)
+        if runs:
+            if self.half == "top": self._set_score(self.away + runs, self.home)
+            else: self._set_score(self.away, self.home + runs)
+        if name not in PA_CONTINUES:
+            self.balls = self.strikes = 0
+        if end_half and self.outs >= 3:
+            self._next_half()
+
+    def _set_score(self, away: int, home: int):
+        if away != self.away or home != self.home:
+            self.away, self.home = away, home
+            self._score = None
+
+    def _next_half(self):
+        self.outs = self.balls = self.strikes = self.bases = 0
+        if self.half == "top":
+            self.half = "bottom"
+        else:
+            self.half = "top"
+            self.inning += 1
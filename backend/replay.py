@@ -0,0 +1,332 @@
+# replay.py — seekable, pausable replay of recorded games on a single timer loop
+# Every replay client gets a ReplaySession (its own cursor, speed and reducer), but
+# all sessions are driven by one ReplayScheduler task holding a heap of due times,
+# instead of one sleeping thread per client. Events are paced by their recorded
+# ts gaps on the monotonic clock; reads and seeks are single keyset queries on
+# idx_pitches_game(gamePk, atBatIndex, pitchNumber), each on a connection borrowed
+# from the replay_store pool only for that query. Due sessions step in their own
+# tasks, so the timer loop never waits on a session's SQLite reads.
+
+import asyncio, datetime, heapq, itertools, logging, sqlite3, time
+from collections import deque
+from typing import Any, Callable, ContextManager, Deque, Dict, List, Optional, Tuple
+
+from protocol import DeltaTracker
+from recorder import PHYSICS_COLUMNS
+
+logger = logging.getLogger("gamecast")
+
+DEFAULT_GAP = 0.6     # seconds between rows whose ts is missing or unusable
+FETCH_ROWS = 64       # rows read per keyset page
+
+PITCH_SELECT = (
+    "SELECT gamePk, atBatIndex, pitchNumber, inning, half, outs, balls, strikes, pitchType, mph, locX, locZ, outcome, ts, "
+    "batterId, batterName, pitcherId, pitcherName, onFirst, onSecond, onThird, szTop, szBot, awayScore, homeScore, pitchCode, "
+    "x0, y0, z0, vX0, vY0, vZ0, aX, aY, aZ, extension "
+    "FROM pitches "
+)
+PAGE_AFTER = PITCH_SELECT + (
+    "WHERE gamePk = ? AND (atBatIndex, pitchNumber) > (?, ?) "
+    "ORDER BY atBatIndex, pitchNumber LIMIT ?"
+)
+# first pitch at or after the start of (inning, half); half is 0 = top, 1 = bottom
+FIRST_IN_HALF = (
+    "SELECT atBatIndex FROM pitches WHERE gamePk = ? "
+    "AND (inning > ? OR (inning = ? AND (? = 0 OR lower(half) LIKE 'bot%'))) "
+    "ORDER BY atBatIndex, pitchNumber LIMIT 1"
+)
+
+def row_event(r: sqlite3.Row) -> Dict[str, Any]:
+    """Replay-DB row → the normalized pitch event shape the frontends consume."""
+    return {
+        "event": "pitch",
+        "gamePk": r["gamePk"],
+        "ts": r["ts"] or datetime.datetime.utcnow().isoformat() + "Z",
+        "inning": r["inning"],
+        "half": r["half"],
+        "outs": r["outs"],
+        "count": {"balls": r["balls"], "strikes": r["strikes"]},
+        "batter": {"id": r["batterId"], "name": r["batterName"]},
+        "pitcher": {"id": r["pitcherId"], "name": r["pitcherName"]},
+        "pitch": {
+            "number": r["pitchNumber"],
+            "type": r["pitchType"],
+            "mph": r["mph"],
+            "outcome": r["outcome"],
+            "code": r["pitchCode"],
+            "loc": {"px": r["locX"], "pz": r["locZ"]},
+            "zone": None,
+            "physics": {k: r[k] for k in PHYSICS_COLUMNS} if r["x0"] is not None else None,
+        },
+        "szTop": r["szTop"],
+        "szBot": r["szBot"],
+        "bases": {"onFirst": bool(r["onFirst"]), "onSecond": bool(r["onSecond"]), "onThird": bool(r["onThird"])},
+        "atBatIndex": r["atBatIndex"],
+        "idempotencyKey": f"db-{r['gamePk']}-{r['atBatIndex']}-{r['pitchNumber']}",
+    }
+
+def _parse_ts(ts: Optional[str]) -> Optional[float]:
+    if not ts:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def _half_rank(half: Optional[str]) -> int:
+    return 1 if str(half or "").lower().startswith("bot") else 0
+
+class ReplaySession:
+    """One client's cursor over a recorded game; driven by ReplayScheduler."""
+
+    def __init__(self, scheduler: "ReplayScheduler", gamePk: int, connection: Callable[[], ContextManager[sqlite3.Connection]],
+                 make_reducer: Callable[..., Any], speed: float = 1.0, gap_cap: Optional[float] = None,
+                 queue_size: int = 256):
+        self.scheduler = scheduler
+        self.gamePk = gamePk
+        self.speed = max(0.1, float(speed))
+        self.gap_cap = gap_cap
+        self.out: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.paused = False
+        self.closed = False
+        self.finished = False
+        self.position: Tuple[int, int] = (-1, -1)    # last emitted (atBatIndex, pitchNumber)
+        self.due = time.monotonic()
+        self.gen = 0                                 # bumps invalidate queued heap entries
+        self._connection = connection
+        self._make_reducer = make_reducer
+        self.reducer = make_reducer()
+        self.tracker = DeltaTracker()
+        self._buffer: Deque[sqlite3.Row] = deque()
+        self._exhausted = False
+        self._last_ts: Optional[float] = None
+        self._remaining = 0.0                        # time left to the next event while paused
+        self._lock = asyncio.Lock()
+
+    # --- DB access (runs in a worker thread) ---
+    def _read_page(self, after: Tuple[int, int]) -> List[sqlite3.Row]:
+        ab, pn = after
+        with self._connection() as c:
+            return c.execute(PAGE_AFTER, (self.gamePk, ab, pn, FETCH_ROWS)).fetchall()
+
+    def _first_at_bat(self, inning: int, half: Optional[str]) -> Optional[int]:
+        """First atBatIndex at or after (inning, half): one ordered probe of the game's index range."""
+        inning = int(inning)
+        with self._connection() as c:
+            r = c.execute(FIRST_IN_HALF, (self.gamePk, inning, inning, _half_rank(half))).fetchone()
+        return r["atBatIndex"] if r is not None else None
+
+    # --- scheduling ---
+    async def _fill(self):
+        if not self._buffer and not self._exhausted:
+            rows = await asyncio.to_thread(self._read_page, self._tail())
+            self._buffer.extend(rows)
+            self._exhausted = len(rows) < FETCH_ROWS
+
+    def _tail(self) -> Tuple[int, int]:
+        if self._buffer:
+            last = self._buffer[-1]
+            return (last["atBatIndex"], last["pitchNumber"])
+        return self.position
+
+    def _gap(self, next_row: sqlite3.Row) -> float:
+        nxt = _parse_ts(next_row["ts"])
+        gap = DEFAULT_GAP if self._last_ts is None or nxt is None or nxt < self._last_ts else nxt - self._last_ts
+        if self.gap_cap is not None:
+            gap = min(gap, self.gap_cap)
+        return gap / self.speed
+
+    async def step(self, gen: int):
+        """Emit the next row (run by the scheduler when due) and reschedule. gen is the heap
+        entry's generation: a seek/pause/speed change while this waited for the lock supersedes it."""
+        async with self._lock:
+            if self.closed or self.paused or gen != self.gen:
+                return
+            await self._fill()
+            if self.out.full():
+                # slow reader: hold position and retry shortly rather than dropping replay rows
+                self.due = time.monotonic() + 0.05
+                self.scheduler.push(self)
+                return
+            if not self._buffer:
+                # end marker goes out only once there is room for it, like any row
+                self.finished = True
+                self.out.put_nowait(None)
+                return
+            r = self._buffer.popleft()
+            self.out.put_nowait(self.tracker.wrap(self.reducer.apply(row_event(r))))
+            self.position = (r["atBatIndex"], r["pitchNumber"])
+            self._last_ts = _parse_ts(r["ts"])
+            await self._fill()
+            now = time.monotonic()
+            if self._buffer:
+                # pace from the previous due time, not from now, so steps don't drift
+                self.due = max(self.due, now - 1.0) + self._gap(self._buffer[0])
+            else:
+                self.due = now
+            self.scheduler.push(self)
+
+    # --- controls ---
+    async def seek(self, atBatIndex: Optional[int] = None, inning: Optional[int] = None, half: Optional[str] = None):
+        async with self._lock:
+            if atBatIndex is None:
+                if inning is None:
+                    raise ValueError("seek needs atBatIndex or inning")
+                atBatIndex = await asyncio.to_thread(self._first_at_bat, inning, half)
+                if atBatIndex is None:
+                    return
+            # position just before the first pitch of the target at-bat
+            await self._reposition((int(atBatIndex), -1))
+
+    async def resume_after(self, key: str) -> bool:
+        """Continue after a previously delivered event key (db-<gamePk>-<atBat>-<pitch>)."""
+        parts = str(key).split("-")
+        if len(parts) != 4 or parts[0] != "db" or parts[1] != str(self.gamePk):
+            return False
+        try:
+            after = (int(parts[2]), int(parts[3]))
+        except ValueError:
+            return False
+        async with self._lock:
+            await self._reposition(after)
+        return True
+
+    async def _reposition(self, after: Tuple[int, int]):
+        self.position = after
+        self._buffer.clear()
+        self._exhausted = False
+        self.finished = False
+        self._last_ts = None
+        await self._fill()
+        score = None
+        if self._buffer and self._buffer[0]["awayScore"] is not None:
+            score = {"away": self._buffer[0]["awayScore"], "home": self._buffer[0]["homeScore"]}
+        self.reducer = self._make_reducer(score)
+        self.tracker.reset()
+        while not self.out.empty():  # drop events queued from the old position
+            self.out.get_nowait()
+        self.due = time.monotonic()
+        self._remaining = 0.0
+        if not self.paused:
+            self.scheduler.push(self)
+
+    def pause(self):
+        if self.paused:
+            return
+        self.paused = True
+        self._remaining = max(0.0, self.due - time.monotonic())
+        self.gen += 1
+
+    def resume(self):
+        if not self.paused:
+            return
+        self.paused = False
+        self.due = time.monotonic() + self._remaining
+        self.scheduler.push(self)
+
+    def set_speed(self, speed: float):
+        speed = max(0.1, float(speed))
+        factor = self.speed / speed
+        if self.paused:
+            self._remaining *= factor
+        else:
+            self.due = time.monotonic() + max(0.0, self.due - time.monotonic()) * factor
+            self.scheduler.push(self)
+        self.speed = speed
+
+    async def control(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a client control message ({type: seek|pause|resume|speed}) and report status."""
+        kind = msg.get("type")
+        if kind == "seek":
+            await self.seek(msg.get("atBatIndex"), msg.get("inning"), msg.get("half"))
+        elif kind == "pause":
+            self.pause()
+        elif kind == "resume":
+            self.resume()
+        elif kind == "speed":
+            self.set_speed(msg.get("value", msg.get("speed", 1.0)))
+        elif kind == "snapshot":
+            return self.tracker.snapshot()
+        elif kind != "status":
+            raise ValueError(f"unknown control {kind!r}")
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "type": "replay",
+            "gamePk": self.gamePk,
+            "paused": self.paused,
+            "speed": self.speed,
+            "finished": self.finished,
+            "atBatIndex": self.position[0],
+            "pitchNumber": self.position[1],
+        }
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.gen += 1
+        if self.out.full():
+            self.out.get_nowait()   # the reader is told to stop even if it is behind
+        self.out.put_nowait(None)
+        self.scheduler.discard(self)
+
+class ReplayScheduler:
+    """Single asyncio task that fires every replay session's next event at its due time."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int, ReplaySession]] = []
+        self._seq = itertools.count()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._steps: set = set()                     # in-flight step tasks (strong refs)
+        self.sessions: set = set()
+
+    def open(self, gamePk: int, connection: Callable[[], ContextManager[sqlite3.Connection]], make_reducer: Callable[..., Any],
+             speed: float = 1.0, gap_cap: Optional[float] = None) -> ReplaySession:
+        s = ReplaySession(self, gamePk, connection, make_reducer, speed=speed, gap_cap=gap_cap)
+        self.sessions.add(s)
+        self.push(s)
+        logger.info(f"[REPLAY] open game {gamePk} speed={s.speed} sessions={len(self.sessions)}")
+        return s
+
+    def discard(self, s: ReplaySession):
+        self.sessions.discard(s)
+
+    def push(self, s: ReplaySession):
+        s.gen += 1
+        heapq.heappush(self._heap, (s.due, next(self._seq), s.gen, s))
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="replay-scheduler")
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            while self._heap and self._heap[0][2] != self._heap[0][3].gen:
+                heapq.heappop(self._heap)  # stale entry (rescheduled, paused or closed)
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, gen, s = heapq.heappop(self._heap)
+            if gen != s.gen:
+                continue
+            task = asyncio.get_running_loop().create_task(self._step(s, gen))
+            self._steps.add(task)
+            task.add_done_callback(self._steps.discard)
+
+    async def _step(self, s: ReplaySession, gen: int):
+        try:
+            await s.step(gen)
+        except Exception as e:
+            logger.error(f"[REPLAY] game {s.gamePk} step failed: {e}")
+            s.close()
@@ -0,0 +1,125 @@
+# replay_store.py — pooled read access to the SQLite replay DB
+# Readers borrow from a small pool of long-lived connections instead of opening one
+# per call: each keeps its statement cache warm (every query here is a fixed SQL
+# string, so it is prepared once per connection), and is tuned for reads (mmap,
+# page cache, query_only). The DB runs in WAL mode, so the recorder's and backfill's
+# batched writes never block replay reads and vice versa. Listing by date goes
+# through idx_games_date; pitch reads are keyset pages on idx_pitches_game, so
+# their cost stays flat as the DB grows.
+
+import logging, os, queue, sqlite3, threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from recorder import PHYSICS_COLUMNS
+from replay import PAGE_AFTER, row_event
+
+logger = logging.getLogger("gamecast")
+
+READ_POOL = int(os.getenv("READ_POOL", "4"))                      # pooled read connections
+DB_MMAP = int(os.getenv("DB_MMAP_MB", "256")) * 1024 * 1024       # memory-mapped I/O per connection
+DB_CACHE_KB = int(os.getenv("DB_CACHE_KB", "16384"))              # page cache per connection
+FETCH_BATCH = 500                                                 # rows per fetchmany
+
+LIST_GAMES = "SELECT gamePk, away, home, status FROM games WHERE gameDate = ? ORDER BY home, away"
+GAME_TEAMS = "SELECT away, home FROM games WHERE gamePk = ?"
+PHYSICS_SELECT = ("SELECT atBatIndex, pitchNumber, " + ", ".join(PHYSICS_COLUMNS) +
+                  " FROM pitches WHERE gamePk = ? AND x0 IS NOT NULL")
+
+def parse_cursor(after: Optional[str]) -> Tuple[int, int]:
+    """'atBatIndex-pitchNumber' page cursor → key tuple; None/'' is the start of the game."""
+    if not after:
+        return (-1, -1)
+    ab, _, pn = after.partition("-")
+    return (int(ab), int(pn))
+
+def _dicts(cur: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    cols = [d[0] for d in cur.description]
+    out: List[Dict[str, Any]] = []
+    while True:
+        rows = cur.fetchmany(FETCH_BATCH)
+        if not rows:
+            return out
+        out.extend(dict(zip(cols, r)) for r in rows)
+
+class ReplayStore:
+    """Bounded pool of read connections to one replay DB (opened lazily). The DB must already
+    be set up (recorder.prepare_db at startup): these connections never write."""
+
+    def __init__(self, path: str, size: int = READ_POOL):
+        self.path = path
+        self.size = max(1, size)
+        self.opened = 0
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read connection (blocks while all `size` are in use)."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self.opened < self.size
+                if grow:
+                    self.opened += 1
+            conn = self._open() if grow else self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- queries ---
+    def list_games(self, date: str) -> List[Dict[str, Any]]:
+        with self.connection() as c:
+            return _dicts(c.execute(LIST_GAMES, (date,)))
+
+    def teams(self, gamePk: int) -> Optional[Dict[str, str]]:
+        with self.connection() as c:
+            r = c.execute(GAME_TEAMS, (gamePk,)).fetchone()
+        return {"away": r["away"], "home": r["home"]} if r else None
+
+    def pitches(self, gamePk: int, after: Tuple[int, int] = (-1, -1), limit: int = 200) -> Dict[str, Any]:
+        """One keyset page of recorded pitches (event shape) after the given (atBatIndex, pitchNumber)."""
+        ab, pn = after
+        with self.connection() as c:
+            rows = c.execute(PAGE_AFTER, (gamePk, ab, pn, limit)).fetchall()
+        last = rows[-1] if len(rows) == limit else None
+        return {"gamePk": gamePk, "pitches": [row_event(r) for r in rows],
+                "next": f"{last['atBatIndex']}-{last['pitchNumber']}" if last is not None else None}
+
+    def physics(self, gamePk: int, atBatIndex: Optional[int] = None,
+                pitchNumber: Optional[int] = None) -> List[Tuple[int, int, Dict[str, Any]]]:
+        sql, args = PHYSICS_SELECT, [gamePk]
+        if atBatIndex is not None:
+            sql += " AND atBatIndex = ? AND pitchNumber = ?"
+            args += [atBatIndex, pitchNumber]
+        out = []
+        with self.connection() as c:
+            cur = c.execute(sql + " ORDER BY atBatIndex, pitchNumber", args)
+            while True:
+                rows = cur.fetchmany(FETCH_BATCH)
+                if not rows:
+                    return out
+                out.extend((r["atBatIndex"], r["pitchNumber"], {k: r[k] for k in PHYSICS_COLUMNS}) for r in rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "pool": self.size, "open": self.opened, "idle": self._idle.qsize()}
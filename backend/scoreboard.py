@@ -0,0 +1,246 @@
+# scoreboard.py — one multiplexed stream of every game on a date
+# A Scoreboard per date is shared by all its viewers. Games someone is watching in
+# detail (a running GameHub) are read from that hub's reducer state at no upstream
+# cost; the rest poll only the small /linescore document, and only while in progress.
+# Changes from all games are merged and sent as one batched frame at most
+# SCOREBOARD_RATE times a second. A new viewer gets a full "board" frame first,
+# then "scoreboard" frames carrying only the fields that changed per game. A failing
+# poll or flush is logged and retried with backoff; if the board still dies, every
+# viewer's stream is ended (None) so clients reconnect to a fresh board.
+
+import asyncio, logging, os, time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from protocol import StreamEvent
+
+logger = logging.getLogger("gamecast")
+
+SCOREBOARD_RATE = float(os.getenv("SCOREBOARD_RATE", "2"))    # max frames/s per board
+SCOREBOARD_POLL = float(os.getenv("SCOREBOARD_POLL", "10"))   # linescore interval per unwatched live game
+SCOREBOARD_LINGER = float(os.getenv("SCOREBOARD_LINGER", "30"))
+TICK = 1.0
+BACKOFF_MAX = 30.0    # seconds between retries of a repeatedly failing collect/flush step
+
+FINAL_STATES = {"Final", "Game Over", "Completed Early", "Cancelled", "Postponed"}
+PENDING_STATES = {"Scheduled", "Pre-Game", "Warmup"}
+
+def _mask(first: Any, second: Any, third: Any) -> int:
+    return (1 if first else 0) | (2 if second else 0) | (4 if third else 0)
+
+def linescore_state(ls: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact per-game state from a StatsAPI linescore document."""
+    offense = ls.get("offense") or {}
+    teams = ls.get("teams") or {}
+    return {
+        "inning": ls.get("currentInning"),
+        "half": (ls.get("inningHalf") or "").lower() or None,
+        "outs": ls.get("outs"),
+        "count": [ls.get("balls"), ls.get("strikes")],
+        "bases": _mask(offense.get("first"), offense.get("second"), offense.get("third")),
+        "score": [(teams.get("away") or {}).get("runs"), (teams.get("home") or {}).get("runs")],
+    }
+
+def reducer_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Same compact shape from a GameHub's reducer state (protocol.state_of)."""
+    count = state.get("count") or {}
+    bases = state.get("bases") or {}
+    score = state.get("score") or {}
+    return {
+        "inning": state.get("inning"),
+        "half": state.get("half"),
+        "outs": state.get("outs"),
+        "count": [count.get("balls"), count.get("strikes")],
+        "bases": _mask(bases.get("onFirst"), bases.get("onSecond"), bases.get("onThird")),
+        "score": [score.get("away"), score.get("home")],
+    }
+
+class Scoreboard:
+    """Polls/collects every game on one date and fans batched frames out to viewers."""
+
+    def __init__(self, date: str,
+                 schedule: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+                 linescore: Callable[[int], Awaitable[Dict[str, Any]]],
+                 detail: Callable[[int], Optional[Dict[str, Any]]],
+                 rate: float = SCOREBOARD_RATE, poll: float = SCOREBOARD_POLL,
+                 linger: float = SCOREBOARD_LINGER, queue_size: int = 64,
+                 on_stop: Optional[Callable[["Scoreboard"], None]] = None):
+        self.date = date
+        self.rate = rate
+        self.poll = poll
+        self.linger = linger
+        self.queue_size = queue_size
+        self.games: Dict[int, Dict[str, Any]] = {}     # gamePk -> compact state (incl. teams/status)
+        self.pending: Dict[int, Dict[str, Any]] = {}   # gamePk -> fields changed since the last frame
+        self.subscribers: List[asyncio.Queue] = []
+        self.seq = 0
+        self.polls = 0                                  # linescore requests made
+        self._schedule = schedule
+        self._linescore = linescore
+        self._detail = detail
+        self._next_poll: Dict[int, float] = {}
+        self._dirty = asyncio.Event()
+        self._on_stop = on_stop
+        self._task: Optional[asyncio.Task] = None
+        self._linger_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def key(self) -> Hashable:
+        return self.date
+
+    # --- viewers ---
+    def board(self) -> StreamEvent:
+        frame = {"type": "board", "date": self.date, "seq": self.seq,
+                 "games": [{"gamePk": pk, **st} for pk, st in self.games.items()]}
+        return StreamEvent(self.seq, frame, {}, {})
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.games:
+            q.put_nowait(self.board())
+        self.subscribers.append(q)
+        if self._linger_handle is not None:
+            self._linger_handle.cancel()
+            self._linger_handle = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"scoreboard-{self.date}")
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> int:
+        if q in self.subscribers:
+            self.subscribers.remove(q)
+        if not self.subscribers and self._linger_handle is None:
+            self._linger_handle = asyncio.get_running_loop().call_later(self.linger, self._stop_if_idle)
+        return len(self.subscribers)
+
+    def _stop_if_idle(self):
+        self._linger_handle = None
+        if self.subscribers:
+            return
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self._on_stop:
+            self._on_stop(self)
+
+    def _send(self, item: StreamEvent):
+        for q in self.subscribers:
+            try:
+                q.put_nowait(item)
+            except asyncio.QueueFull:
+                # A viewer this far behind only needs the current board, not the backlog.
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(self.board())
+
+    # --- state ---
+    def update(self, gamePk: int, fields: Dict[str, Any]):
+        cur = self.games.setdefault(gamePk, {})
+        changed = {k: v for k, v in fields.items() if cur.get(k) != v}
+        if changed:
+            cur.update(changed)
+            self.pending.setdefault(gamePk, {}).update(changed)
+            self._dirty.set()
+
+    async def _run(self):
+        logger.info(f"[BOARD] {self.date} started")
+        try:
+            await asyncio.gather(self._retrying(self._collect_once, "collect"),
+                                 self._retrying(self._flush_once, "flush"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[BOARD] {self.date} error: {e}")
+            self._close()
+        finally:
+            logger.info(f"[BOARD] {self.date} stopped after {self.polls} linescore polls")
+
+    def _close(self):
+        """End every viewer's stream and retire this board so reconnects start a new one."""
+        for q in self.subscribers:
+            while q.full():
+                q.get_nowait()
+            q.put_nowait(None)
+        if self._on_stop:
+            self._on_stop(self)
+
+    async def _retrying(self, step: Callable[[], Awaitable[float]], what: str):
+        """Run step() forever, sleeping the delay it returns; errors are logged and backed off."""
+        failures = 0
+        while True:
+            try:
+                delay = await step()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(BACKOFF_MAX, TICK * 2 ** failures)
+                logger.warning(f"[BOARD] {self.date} {what} failed ({failures}x): {e}; retry in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    async def _collect_once(self) -> float:
+        try:
+            games = await self._schedule(self.date)   # cached + single-flight upstream
+        except Exception as e:
+            logger.warning(f"[BOARD] {self.date} schedule failed: {e}")
+            games = []
+        for g in games:
+            self.update(g["gamePk"], {"teams": [g.get("away"), g.get("home")], "status": g.get("status")})
+
+        now = time.monotonic()
+        due = []
+        for pk, st in self.games.items():
+            state = self._detail(pk)
+            if state is not None:
+                self.update(pk, reducer_state(state))
+                continue
+            status = st.get("status")
+            if status in PENDING_STATES or (status in FINAL_STATES and "score" in st):
+                continue
+            if now >= self._next_poll.get(pk, 0.0):
+                self._next_poll[pk] = now + self.poll
+                due.append(pk)
+        if due:
+            self.polls += len(due)
+            results = await asyncio.gather(*(self._linescore(pk) for pk in due), return_exceptions=True)
+            for pk, ls in zip(due, results):
+                if isinstance(ls, Exception):
+                    logger.warning(f"[BOARD] linescore {pk} failed: {ls}")
+                else:
+                    self.update(pk, linescore_state(ls))
+        return TICK
+
+    async def _flush_once(self) -> float:
+        await self._dirty.wait()
+        self._dirty.clear()
+        self.seq += 1
+        frame = {"type": "scoreboard", "date": self.date, "seq": self.seq,
+                 "games": [{"gamePk": pk, **changed} for pk, changed in self.pending.items()]}
+        self.pending = {}
+        self._send(StreamEvent(self.seq, frame, {}, {}))
+        return 1.0 / self.rate if self.rate > 0 else 0.0
+
+class ScoreboardRegistry:
+    """At most one running Scoreboard per date."""
+
+    def __init__(self, **kwargs: Any):
+        self._kwargs = kwargs
+        self._boards: Dict[str, Scoreboard] = {}
+
+    def subscribe(self, date: str) -> Tuple[Scoreboard, asyncio.Queue]:
+        board = self._boards.get(date)
+        if board is None:
+            board = self._boards[date] = Scoreboard(date, on_stop=self._drop, **self._kwargs)
+        q = board.subscribe()
+        logger.info(f"[BOARD] {date} viewers={len(board.subscribers)}")
+        return board, q
+
+    def unsubscribe(self, board: Scoreboard, q: asyncio.Queue):
+        remaining = board.unsubscribe(q)
+        logger.info(f"[BOARD] {board.date} viewers={remaining}")
+
+    def _drop(self, board: Scoreboard):
+        if self._boards.get(board.date) is board:
+            del self._boards[board.date]
+
+    def stats(self) -> Dict[str, int]:
+        return {d: len(b.subscribers) for d, b in self._boards.items()}
@@ -0,0 +1,136 @@
+# subscriber.py — bounded per-connection buffer between a shared producer and one client
+# The hub never waits on a client: every put is O(1) and non-blocking. A subscriber
+# buffers at most SUB_BUFFER pitch events; for delta clients, state updates (play
+# results) that pile up back to back are conflated so only the latest is pending
+# (full-protocol events each carry their own payload and are never merged). A delta
+# client that still overflows is resynced — its backlog is discarded for a snapshot
+# plus the newest event — and one that needs more than SUB_MAX_RESYNCS resyncs inside
+# SUB_RESYNC_WINDOW seconds is dropped (its stream ends; the hub counts it). A full-protocol client has
+# nothing to resync from, so it is dropped on its first overflow (after its buffered
+# events) and resumes from the hub's ring on reconnect. Resyncs count at most once a
+# second, and not at all for a client that emptied its buffer within the last second:
+# bursts (a mid-game join's first poll) drop no one that keeps up otherwise.
+
+import asyncio, itertools, os, time
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+from metrics import SUB_CONFLATED, SUB_RESYNCS
+from protocol import StreamEvent, conflate
+
+SUB_BUFFER = int(os.getenv("SUB_BUFFER", "256"))                   # pitch events buffered per client
+SUB_MAX_RESYNCS = int(os.getenv("SUB_MAX_RESYNCS", "3"))          # resyncs tolerated per window ...
+SUB_RESYNC_WINDOW = float(os.getenv("SUB_RESYNC_WINDOW", "60"))   # ... before the client is dropped
+
+_ids = itertools.count(1)
+
+def _is_pitch(item: Any) -> bool:
+    return isinstance(item, StreamEvent) and item.event.get("event") == "pitch"
+
+class Subscriber:
+    """Queue-like (get / put_nowait / qsize / empty) buffer for one client; None ends the stream.
+
+    resync returns the message that replaces a discarded backlog (a delta snapshot); without
+    one (full protocol) an overflowing client is dropped instead, keeping what it has buffered.
+    """
+
+    def __init__(self, limit: int = SUB_BUFFER, resync: Optional[Callable[[], Any]] = None,
+                 max_resyncs: int = SUB_MAX_RESYNCS, window: float = SUB_RESYNC_WINDOW):
+        self.id = next(_ids)
+        self.joined = time.monotonic()
+        self.limit = max(1, limit)
+        self.resync = resync
+        self.max_resyncs = max_resyncs
+        self.window = window
+        self.closed = False
+        self.dropped = False
+        self.conflated = 0
+        self.resyncs = 0
+        self._items: Deque[Any] = deque()
+        self._pitches = 0
+        self._backlog = 0          # preloaded pitches still queued (not counted against limit)
+        self._resync_times: Deque[float] = deque()
+        self._caught_up_at = time.monotonic()   # last time the buffer was drained
+        self._waiter: Optional[asyncio.Future] = None
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def preload(self, items: Any):
+        """Queue a joining client's backlog (already bounded by the hub's ring) outside the limit."""
+        for item in items:
+            self._items.append(item)
+            if _is_pitch(item):
+                self._pitches += 1
+                self._backlog += 1
+        self._wake()
+
+    def put_nowait(self, item: Any):
+        if self.closed:
+            return
+        if item is None:
+            self.closed = True
+            self._items.append(None)
+        elif _is_pitch(item):
+            if self._pitches - self._backlog >= self.limit:
+                self._overflow(item)
+            else:
+                self._items.append(item)
+                self._pitches += 1
+        elif self.resync is not None and self._items and isinstance(item, StreamEvent) \
+                and isinstance(self._items[-1], StreamEvent) and not _is_pitch(self._items[-1]):
+            # delta frames carry both deltas; a full client would lose the older payload
+            self._items[-1] = conflate(self._items[-1], item)
+            self.conflated += 1
+            SUB_CONFLATED.inc()
+        else:
+            self._items.append(item)
+        self._wake()
+
+    def _overflow(self, item: Any):
+        if self.resync is None:
+            # full protocol has no resync frame: end the stream after what is buffered and
+            # let the client reconnect from its last event id (the hub's ring covers the gap)
+            self.dropped = True
+            self.put_nowait(None)
+            return
+        self.resyncs += 1
+        SUB_RESYNCS.inc()
+        self._items.clear()
+        self._pitches = self._backlog = 0
+        now = time.monotonic()
+        if now - self._caught_up_at >= 1.0 and (not self._resync_times or now - self._resync_times[-1] >= 1.0):
+            while self._resync_times and now - self._resync_times[0] > self.window:
+                self._resync_times.popleft()
+            self._resync_times.append(now)
+            if len(self._resync_times) > self.max_resyncs:
+                self.dropped = True
+                self.put_nowait(None)
+                return
+        self._items.append(self.resync())
+        self._items.append(item)
+        self._pitches = 1
+
+    def _wake(self):
+        w = self._waiter
+        if w is not None and not w.done():
+            w.set_result(None)
+
+    async def get(self) -> Any:
+        while not self._items:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        item = self._items.popleft()
+        if not self._items:
+            self._caught_up_at = time.monotonic()
+        if _is_pitch(item):
+            self._pitches -= 1
+            if self._backlog:
+                self._backlog -= 1
+        return item
@@ -0,0 +1,122 @@
+# trajectory.py — pitch flight paths sampled server-side from StatsAPI pitchData
+# StatsAPI fits each pitch with constant acceleration (the 9-parameter model):
+# position(t) = (x0, y0, z0) + v0·t + ½·a·t², in feet and seconds, y measured from
+# the back of home plate toward the mound, with y0 = 50 ft at t = 0. Paths are
+# sampled from the release point (60.5 ft − extension) to the front of the plate
+# at a fixed frame rate, for a whole batch of pitches in one set of array ops, and
+# cached per (idempotencyKey, fps). Clients interpolate between samples. The cache is
+# shared by the event loop (live precompute) and worker threads (REST lookups), so
+# every access takes the store's lock; sampling itself runs outside it.
+
+import os, re, threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import TTLCache
+
+TRAJ_FPS = int(os.getenv("TRAJ_FPS", "60"))
+TRAJ_CACHE = int(os.getenv("TRAJ_CACHE", "20000"))
+TRAJ_INLINE = os.getenv("TRAJ_INLINE", "0").lower() in ("1", "true", "yes")   # also attach samples to live events
+MAX_FPS = 240
+
+PHYSICS_KEYS = ("x0", "y0", "z0", "vX0", "vY0", "vZ0", "aX", "aY", "aZ")
+PLATE_Y = 17.0 / 12.0          # front edge of home plate
+RUBBER_Y = 60.5
+DEFAULT_EXTENSION = 6.0
+
+def physics_of(pitch_data: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """The model parameters (+ extension) from a playEvents[].pitchData block, if complete."""
+    coords = pitch_data.get("coordinates") or {}
+    out = {}
+    for k in PHYSICS_KEYS:
+        v = coords.get(k)
+        if v is None:
+            return None
+        out[k] = v
+    if pitch_data.get("extension") is not None:
+        out["extension"] = pitch_data["extension"]
+    return out
+
+def _crossing(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Time at which ½a·t² + b·t + c = 0 on the way in (b < 0); stable when a ≈ 0."""
+    disc = np.sqrt(np.maximum(b * b - 2.0 * a * c, 0.0))
+    return -2.0 * c / (b - disc)
+
+def sample(physics: Sequence[Dict[str, float]], fps: int = TRAJ_FPS) -> List[np.ndarray]:
+    """(n_i, 3) float32 positions in feet, one array per pitch: release, every 1/fps s, plate."""
+    if not physics:
+        return []
+    p = np.array([[ph[k] for k in PHYSICS_KEYS] for ph in physics], np.float64)
+    ext = np.array([ph.get("extension") or DEFAULT_EXTENSION for ph in physics], np.float64)
+    r0, v0, acc = p[:, 0:3], p[:, 3:6], p[:, 6:9]
+    ay, vy, y0 = acc[:, 1], v0[:, 1], r0[:, 1]
+    t_rel = _crossing(ay, vy, y0 - (RUBBER_Y - ext))   # before t = 0: release is behind y0
+    t_end = _crossing(ay, vy, y0 - PLATE_Y)
+    n = np.ceil((t_end - t_rel) * fps).astype(np.int64) + 1
+    k = np.arange(int(n.max()))
+    t = np.minimum(t_rel[:, None] + k[None, :] / fps, t_end[:, None])        # (N, K), last sample at the plate
+    pos = r0[:, None, :] + v0[:, None, :] * t[..., None] + 0.5 * acc[:, None, :] * (t * t)[..., None]
+    pos = pos.astype(np.float32)
+    return [pos[i, :n[i]] for i in range(len(physics))]
+
+def encode(samples: np.ndarray, fps: int) -> Dict[str, Any]:
+    """Compact JSON form: flat [x, y, z, x, y, z, ...] rounded to 0.01 ft."""
+    return {"fps": fps, "n": len(samples), "duration": round((len(samples) - 1) / fps, 4),
+            "xyz": np.round(samples.reshape(-1).astype(np.float64), 2).tolist()}
+
+_KEY = re.compile(r"(?:db-)?(\d+)-(\d+)-(\d+)$")
+
+def parse_key(key: str) -> Optional[Tuple[int, int, int]]:
+    """(gamePk, atBatIndex, pitchNumber) from a live or replay idempotencyKey."""
+    m = _KEY.fullmatch(key)
+    return (int(m.group(1)), int(m.group(2)), int(m.group(3))) if m else None
+
+class TrajectoryStore:
+    """LRU of sampled paths keyed by (idempotencyKey, fps); safe to use from any thread."""
+
+    def __init__(self, maxsize: int = TRAJ_CACHE, ttl: float = 12 * 3600):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.computed = 0
+        self._lock = threading.Lock()
+
+    def precompute(self, events: Sequence[Dict[str, Any]], fps: int = TRAJ_FPS, inline: bool = TRAJ_INLINE):
+        """Sample every event that carries physics, in one batch; optionally attach the compact form."""
+        todo = [ev for ev in events if ev.get("physics") and ev.get("idempotencyKey")]
+        samples = sample([ev["physics"] for ev in todo], fps)
+        with self._lock:
+            for ev, s in zip(todo, samples):
+                self.cache.put((ev["idempotencyKey"], fps), s)
+            self.computed += len(todo)
+        if inline:
+            for ev, s in zip(todo, samples):
+                ev["trajectory"] = encode(s, fps)
+
+    def get(self, key: str, fps: int = TRAJ_FPS) -> Optional[np.ndarray]:
+        with self._lock:
+            return self.cache.get((key, fps))
+
+    def put_many(self, keyed: Sequence[Tuple[str, Dict[str, float]]], fps: int = TRAJ_FPS) -> Dict[str, np.ndarray]:
+        """Sample and cache (key, physics) pairs not already cached; returns key → samples for all of them."""
+        out: Dict[str, np.ndarray] = {}
+        missing = []
+        with self._lock:
+            for key, ph in keyed:
+                s = self.cache.get((key, fps))
+                if s is None:
+                    missing.append((key, ph))
+                else:
+                    out[key] = s
+        samples = sample([ph for _, ph in missing], fps)
+        with self._lock:
+            for (key, _), s in zip(missing, samples):
+                self.cache.put((key, fps), s)
+                out[key] = s
+            self.computed += len(missing)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"computed": self.computed, **self.cache.stats()}
+
+trajectories = TrajectoryStore()
@@ -0,0 +1,126 @@
+# upstream.py — one shared, pooled HTTP client for all StatsAPI traffic
+# Keep-alive connection pool, gzip negotiation, a per-host concurrency cap, and
+# retry with exponential backoff (+ jitter, honouring Retry-After) on transport
+# errors, 429 and 5xx. Every request is timed; stats() summarises per host and the
+# same timings feed the /metrics histograms.
+
+import asyncio, logging, os, random, time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from metrics import UPSTREAM_BYTES, UPSTREAM_SECONDS
+
+logger = logging.getLogger("gamecast")
+
+MAX_CONNECTIONS = int(os.getenv("STATSAPI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("STATSAPI_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("STATSAPI_KEEPALIVE_EXPIRY", "30"))
+HOST_CONCURRENCY = int(os.getenv("STATSAPI_HOST_CONCURRENCY", "8"))
+TIMEOUT = float(os.getenv("STATSAPI_TIMEOUT", "20"))
+RETRIES = int(os.getenv("STATSAPI_RETRIES", "3"))
+BACKOFF = float(os.getenv("STATSAPI_BACKOFF", "0.5"))      # first retry delay, doubles each attempt
+BACKOFF_MAX = float(os.getenv("STATSAPI_BACKOFF_MAX", "15"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class HostStats:
+    __slots__ = ("requests", "errors", "retries", "total_ms", "max_ms", "bytes", "last_status")
+
+    def __init__(self):
+        self.requests = self.errors = self.retries = self.bytes = 0
+        self.total_ms = self.max_ms = 0.0
+        self.last_status: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "errors": self.errors, "retries": self.retries,
+                "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+                "max_ms": round(self.max_ms, 1), "bytes": self.bytes, "last_status": self.last_status}
+
+class Upstream:
+    """Shared AsyncClient, created lazily on first use inside the running loop."""
+
+    def __init__(self, retries: int = RETRIES, host_concurrency: int = HOST_CONCURRENCY):
+        self.retries = retries
+        self.host_concurrency = host_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self.hosts: Dict[str, HostStats] = {}
+        self.recent: Deque[Tuple[str, Optional[int], float, int]] = deque(maxlen=200)  # (path, status, ms, bytes)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=TIMEOUT,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                                    keepalive_expiry=KEEPALIVE_EXPIRY),
+                headers={"Accept-Encoding": "gzip, deflate", "User-Agent": "gamecast-3d"},
+            )
+        return self._client
+
+    def _sem(self, host: str) -> asyncio.Semaphore:
+        sem = self._sems.get(host)
+        if sem is None:
+            sem = self._sems[host] = asyncio.Semaphore(self.host_concurrency)
+        return sem
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None, retries: Optional[int] = None) -> httpx.Response:
+        """GET with pooling and retries. Returns the last response (caller decides on raise_for_status)."""
+        host = httpx.URL(url).host
+        stats = self.hosts.setdefault(host, HostStats())
+        attempts = (self.retries if retries is None else retries) + 1
+        for attempt in range(attempts):
+            try:
+                async with self._sem(host):
+                    t0 = time.perf_counter()  # time on the wire, not queued behind the host cap
+                    r = await self.client.get(url, params=params, headers=headers)
+            except httpx.TransportError as e:
+                self._record(stats, url, None, t0, 0, error=True)
+                if attempt + 1 >= attempts:
+                    raise
+                delay = self._delay(attempt, None)
+                logger.warning(f"[UPSTREAM] {host} {type(e).__name__}; retry {attempt + 1}/{attempts - 1} in {delay:.1f}s")
+            else:
+                self._record(stats, url, r.status_code, t0, r.num_bytes_downloaded, error=r.status_code >= 400)
+                if r.status_code not in RETRY_STATUS or attempt + 1 >= attempts:
+                    return r
+                delay = self._delay(attempt, r.headers.get("retry-after"))
+                logger.warning(f"[UPSTREAM] {host} HTTP {r.status_code}; retry {attempt + 1}/{attempts - 1} in {delay:.1f}s")
+            stats.retries += 1
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX, float(retry_after))
+            except ValueError:
+                pass
+        return min(BACKOFF_MAX, BACKOFF * 2 ** attempt) * random.uniform(0.8, 1.2)
+
+    def _record(self, stats: HostStats, url: str, status: Optional[int], t0: float, nbytes: int, error: bool):
+        ms = (time.perf_counter() - t0) * 1000
+        stats.requests += 1
+        stats.errors += error
+        stats.total_ms += ms
+        stats.max_ms = max(stats.max_ms, ms)
+        stats.bytes += nbytes
+        stats.last_status = status
+        self.recent.append((httpx.URL(url).path, status, ms, nbytes))
+        host = httpx.URL(url).host
+        UPSTREAM_SECONDS.labels(host, str(status) if status else "error").observe(ms / 1000)
+        if status is not None:
+            UPSTREAM_BYTES.labels(host).observe(nbytes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {host: s.as_dict() for host, s in self.hosts.items()}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+upstream = Upstream()
@@ -2,6 +2,7 @@
 // Layers on top of existing system without breaking anything
 
 import * as THREE from 'three';
+import { sampleAt, duration } from './trajectory.client.js';
 
 export class EnhancedBallPhysics {
   constructor(scene, gameState) {
@@ -143,7 +144,9 @@ export class EnhancedBallPhysics {
       velocity: trajectory.velocity.clone(),
       position: releasePoint.clone(),
       startTime: performance.now(),
-      pitch: pitchData
+      pitch: pitchData,
+      // Server-sampled flight (pitchData.trajectory, see trajectory.client.js): follow it to the plate
+      path: pitchData.trajectory ? this.createPath(pitchData.trajectory, releasePoint, targetPoint) : null
     };
     
     // Position ball at release point
@@ -214,8 +217,44 @@ export class EnhancedBallPhysics {
     };
   }
   
+  createPath(traj, release, target) {
+    const first = sampleAt(traj, 0), last = sampleAt(traj, duration(traj));
+    return { traj, release: release.clone(), target: target.clone(), first, last, p: { x: 0, y: 0, z: 0 } };
+  }
+
+  // Samples are StatsAPI feet; the path runs release → target in world space and the
+  // sampled movement off the straight line (break) is added on top, so the ball still
+  // leaves the pitcher's hand and arrives at the plotted location.
+  followPath(ball, deltaTime) {
+    const path = this.ballState.path;
+    const t = (performance.now() - this.ballState.startTime) / 1000;
+    const { first, last, p } = path;
+    sampleAt(path.traj, t, p);
+    const s = (first.y - p.y) / ((first.y - last.y) || 1);
+    const prev = this.ballState.position.clone();
+    this.ballState.position.lerpVectors(path.release, path.target, s);
+    this.ballState.position.x += p.x - (first.x + (last.x - first.x) * s);
+    this.ballState.position.y += p.z - (first.z + (last.z - first.z) * s);
+    ball.position.copy(this.ballState.position);
+
+    if (t >= duration(path.traj)) {
+      // Past the plate: hand over to free flight with the path's final velocity
+      const dt = Math.max(deltaTime || 1 / path.traj.fps, 1e-3);
+      this.ballState.velocity.copy(this.ballState.position).sub(prev).divideScalar(dt);
+      this.ballState.path = null;
+    }
+    return t;
+  }
+
   updatePhysics(deltaTime, ball) {
     if (!this.ballState.active || !ball.userData.enhancedPhysics) return;
+
+    if (this.ballState.path) {
+      this.followPath(ball, deltaTime);
+      this.addTrailPoint(ball.position, this.ballState.pitch?.velocity || 0);
+      this.checkCollisions(ball);
+      return;
+    }
     
     const velocity = this.ballState.velocity;
     
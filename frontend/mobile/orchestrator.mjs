@@ -1,9 +1,13 @@
 // orchestrator.mjs
 import { schedule } from './timeline.mjs';
+import { SUBPROTOCOL, createDecoder } from '../stream.binary.js';
 export class Orchestrator {
-  constructor({ server, gamePk }){ this.server=server.replace(/\/$/, ''); this.gamePk=gamePk; this.ws=null; this.lastSeq=0; console.debug('[Orch] new', this.server, this.gamePk); }
-  async connectLive(){ const url=`${this.server}/ws/game/${this.gamePk}`.replace('http','ws'); console.debug('[Orch] connectLive', url);
-    const ws=new WebSocket(url); this.ws=ws; ws.onopen=()=>console.debug('[Orch] WS open'); ws.onclose=()=>console.debug('[Orch] WS close'); ws.onerror=(e)=>console.warn('[Orch] WS error', e); ws.onmessage=(ev)=>this._route(ev.data); }
+  constructor({ server, gamePk }){ this.server=server.replace(/\/$/, ''); this.gamePk=gamePk; this.ws=null; this.lastSeq=0; this.state={}; console.debug('[Orch] new', this.server, this.gamePk); }
+  // Live uses the delta protocol: one snapshot, then only changed reducer fields per pitch (seq-numbered).
+  // Pitches arrive as binary frames (gamecast.bin.v1) when the server agrees; otherwise JSON as before.
+  async connectLive(){ const url=`${this.server}/ws/game/${this.gamePk}?protocol=delta`.replace('http','ws'); console.debug('[Orch] connectLive', url);
+    const ws=new WebSocket(url, [SUBPROTOCOL]); ws.binaryType='arraybuffer'; const decode=createDecoder(); this.ws=ws; ws.onopen=()=>console.debug('[Orch] WS open', ws.protocol||'json'); ws.onclose=()=>console.debug('[Orch] WS close'); ws.onerror=(e)=>console.warn('[Orch] WS error', e);
+    ws.onmessage=(ev)=>{ if(typeof ev.data==='string') return this._route(ev.data); const msg=decode(ev.data); if(msg) this._route(msg); }; }
   async playReplay(startMarker){ const params=new URLSearchParams({ gamePk:String(this.gamePk), mode:'rewind' }); if(startMarker) params.set('from', startMarker);
     const url=`${this.server}/sse/stream?${params.toString()}`; console.debug('[Orch] playReplay SSE', url);
     const res=await fetch(url); const reader=res.body.getReader(); const decoder=new TextDecoder(); let buffer='';
@@ -11,9 +15,17 @@ export class Orchestrator {
       while((idx = buffer.indexOf('\n\n')) >= 0){ const chunk = buffer.slice(0, idx).trim(); buffer = buffer.slice(idx+2); if (!chunk) continue;
         for (const line of chunk.split('\n')){ const m=line.match(/^data:\s*(.*)$/); if(m) this._route(m[1]); } } } console.debug('[Orch] Replay finished'); }
   _route(raw){ try{ const msg=(typeof raw==='string')?JSON.parse(raw):raw; const now=performance.now(); const t0=now;
+      if (msg.type==='snapshot'){ this._snapshot(msg); return; } if (typeof msg.seq==='number') this._delta(msg);
       switch (msg.event){ case 'pitch': schedule([{ at:t0, do:()=>emit('pitch-released', msg)}]); break;
         case 'swing': schedule([{ at:t0, do:()=>emit('swing-start', msg)}]); break;
         case 'contact': schedule([{ at:t0, do:()=>emit('contact', msg)}]); break;
         case 'outcome': case 'count': schedule([{ at:t0, do:()=>emit(msg.event, msg)}]); break; default: break; } }
-    catch(e){ console.warn('[Orch] route error', e); } } }
-function emit(type, data){ document.dispatchEvent(new CustomEvent('gc:play', { detail:{ type, data } })); }
\ No newline at end of file
+    catch(e){ console.warn('[Orch] route error', e); } }
+  _snapshot(m){ if(m.seq < this.lastSeq) return; this.state={ ...(m.state||{}) }; this.lastSeq=m.seq; this._emitState(); }
+  _delta(m){ if(m.seq <= this.lastSeq) return; // already covered by a snapshot
+    const base = typeof m.base==='number' ? m.base : m.seq-1; // conflated events cover several seqs
+    if(this.lastSeq && base !== this.lastSeq){ console.warn('[Orch] seq gap', this.lastSeq, '→', m.seq); this._requestSnapshot(); }
+    const d = m.delta || (m.game ? { ...m.game, score:m.score, teams:m.teams } : {}); Object.assign(this.state, d); this.lastSeq=m.seq; if(Object.keys(d).length) this._emitState(); }
+  _requestSnapshot(){ if(this.ws && this.ws.readyState===WebSocket.OPEN) this.ws.send(JSON.stringify({ type:'snapshot' })); }
+  _emitState(){ const s=this.state, c=s.count||{}; emit('count', { balls:c.balls, strikes:c.strikes, outs:s.outs, inning:s.inning, half:s.half, score:s.score, teams:s.teams }); } }
+function emit(type, data){ document.dispatchEvent(new CustomEvent('gc:play', { detail:{ type, data } })); }
@@ -0,0 +1,47 @@
+// stream.binary.js - decoder for the gamecast.bin.v1 WebSocket subprotocol
+// Layout lives in backend/binwire.py. Pitch frames (0x01) are 39 bytes little-endian;
+// dictionary frames (0x02) name a pitchType/outcome code the first time it is used.
+
+export const SUBPROTOCOL = 'gamecast.bin.v1';
+const T_PITCH = 0x01, T_DICT = 0x02, NO_MPH = 0xFFFF, NO_LOC = -32768;
+
+export function createDecoder(){
+  const tables = [new Map(), new Map()]; // 0 pitchType, 1 outcome
+  const text = new TextDecoder();
+
+  // Returns a pitch event shaped like the JSON one (nested pitch{}, plus a delta-protocol `delta`),
+  // or null for dictionary frames.
+  return function decode(buf){
+    const v = new DataView(buf);
+    const type = v.getUint8(0);
+    if (type === T_DICT){
+      tables[v.getUint8(1)].set(v.getUint8(2), text.decode(new Uint8Array(buf, 3)));
+      return null;
+    }
+    if (type !== T_PITCH) return null;
+    const gamePk = v.getUint32(5, true), atBatIndex = v.getUint16(9, true), pitchNumber = v.getUint8(11);
+    const flags = v.getUint8(13), count = v.getUint8(14);
+    const mph = v.getUint16(17, true), px = v.getInt16(19, true), pz = v.getInt16(21, true);
+    const secs = v.getUint32(33, true), ms = v.getUint16(37, true);
+    const bases = { onFirst: !!(flags & 8), onSecond: !!(flags & 16), onThird: !!(flags & 32) };
+    const half = (flags & 1) ? 'bottom' : 'top', inning = v.getUint8(12), outs = (flags >> 1) & 3;
+    const pitch = {
+      number: pitchNumber,
+      type: tables[0].get(v.getUint8(15)) || null,
+      outcome: tables[1].get(v.getUint8(16)) || null,
+      mph: mph === NO_MPH ? null : mph / 10,
+      loc: { px: px === NO_LOC ? null : px / 1000, pz: pz === NO_LOC ? null : pz / 1000 },
+    };
+    const game = { inning, half, outs, count: { balls: count >> 4, strikes: count & 15 }, bases };
+    const score = { away: v.getUint8(23), home: v.getUint8(24) };
+    return {
+      event: 'pitch', seq: v.getUint32(1, true), gamePk, atBatIndex, pitchNumber,
+      ts: secs ? new Date(secs * 1000 + ms).toISOString() : null,
+      inning, half, outs, count: game.count, bases, score,
+      batter: { id: v.getUint32(25, true) || null }, pitcher: { id: v.getUint32(29, true) || null },
+      pitch,
+      game, delta: { ...game, score }, // every frame carries the full state except teams (sent in the snapshot)
+      idempotencyKey: `${(flags & 64) ? 'db-' : ''}${gamePk}-${atBatIndex}-${pitchNumber}`,
+    };
+  };
+}
@@ -1,5 +1,7 @@
 // stream.client.js - FIXED VERSION
 
+import { SUBPROTOCOL as BINARY_SUBPROTOCOL, createDecoder } from './stream.binary.js';
+
 // --- Mode control: 'live' (StatsAPI) or 'db' (local replay) ---
 let STREAM_MODE = 'live';
 export function setStreamMode(mode){
@@ -71,6 +73,7 @@ function reduce(ev){
     return;
   }
   lastKey = ev.idempotencyKey;
+  if (ev.event && ev.event !== 'pitch') return; // 'play' results only move game state
   dispatchPlay(ev);
   
   // Update HUD
@@ -246,17 +249,22 @@ function connectToGame() {
   connectWS(backend, gamePk);
 }
 
-function connectWS(base, gamePk){
+// opts.binary: ask for compact binary pitch frames (gamecast.bin.v1); the server falls back to JSON.
+function connectWS(base, gamePk, resumeFrom = null, opts = {}){
   cleanup();
+  lastKey = resumeFrom;
   
   const status = document.getElementById('gc_status');
   status.textContent = 'Connecting...';
   status.style.background = '#4a4a1a';
   
-  const wsUrl = `${base.replace(/^http/, 'ws')}/ws/game/${gamePk}`;
+  const resume = resumeFrom ? `?resumeFrom=${encodeURIComponent(resumeFrom)}` : '';
+  const wsUrl = `${base.replace(/^http/, 'ws')}/ws/game/${gamePk}${resume}`;
   log('WS connecting to:', wsUrl);
   
-  ws = new WebSocket(wsUrl);
+  ws = opts.binary ? new WebSocket(wsUrl, [BINARY_SUBPROTOCOL]) : new WebSocket(wsUrl);
+  ws.binaryType = 'arraybuffer';
+  const decode = createDecoder();
   let fellBack = false;
   
   ws.onopen = () => { 
@@ -268,9 +276,10 @@ function connectWS(base, gamePk){
   
   ws.onmessage = (m) => { 
     try{ 
+      if (typeof m.data !== 'string') { const ev = decode(m.data); if (ev) reduce(ev); return; }
       reduce(JSON.parse(m.data)); 
     } catch(e) { 
-      log('❌ Bad JSON:', e); 
+      log('❌ Bad message:', e); 
     } 
   };
   
@@ -294,13 +303,18 @@ function connectWS(base, gamePk){
 }
 
 function fallbackSSE(base, gamePk){
+  // Resume from the last event we saw instead of replaying the whole game;
+  // EventSource also sends Last-Event-ID by itself when it reconnects.
+  const resume = lastKey;
   cleanup();
+  lastKey = resume;
   
   const status = document.getElementById('gc_status');
   status.textContent = 'SSE Fallback...';
   status.style.background = '#4a4a1a';
   
-  const url = `${base}/sse/stream?gamePk=${gamePk}&source=${STREAM_MODE}`;
+  const url = `${base}/sse/stream?gamePk=${gamePk}&source=${STREAM_MODE}` +
+              (resume ? `&lastEventId=${encodeURIComponent(resume)}` : '');
   log('SSE fallback to:', url);
   
   es = new EventSource(url);
@@ -332,6 +346,15 @@ function fallbackSSE(base, gamePk){
   };
 }
 
+// Replay controls (source=db over WS): {type:'seek', inning, half} | {type:'seek', atBatIndex}
+// | {type:'pause'} | {type:'resume'} | {type:'speed', value}
+function control(msg){
+  if (!ws || ws.readyState !== WebSocket.OPEN) return false;
+  if (msg?.type === 'seek') lastKey = null; // seeking back re-sends earlier keys
+  ws.send(JSON.stringify(msg));
+  return true;
+}
+
 function disconnect() {
   cleanup();
   const status = document.getElementById('gc_status');
@@ -363,6 +386,7 @@ window.addEventListener('beforeunload', cleanup);
 window.streamClient = {
   connect: connectWS,
   disconnect,
+  control,
   cleanup,
   isConnected: () => connected
 };
\ No newline at end of file
@@ -0,0 +1,37 @@
+// trajectory.client.js - server-sampled pitch flight paths (backend/trajectory.py)
+// Samples are StatsAPI feet (x: catcher's view, y: from the plate toward the mound, z: height),
+// release → front of the plate every 1/fps s. Clients only interpolate.
+
+const cache = new Map(); // `${key}@${fps}` -> Promise<trajectory|null>
+
+export async function fetchTrajectory(base, key, fps = 60){
+  const k = `${key}@${fps}`;
+  if (!cache.has(k)){
+    const url = `${base}/api/trajectory/${encodeURIComponent(key)}?fps=${fps}&format=bin`;
+    cache.set(k, fetch(url).then(async r => {
+      if (!r.ok) return null;
+      const xyz = new Float32Array(await r.arrayBuffer());
+      return { fps: Number(r.headers.get('X-Trajectory-Fps')) || fps, n: xyz.length / 3, xyz };
+    }).catch(() => null));
+    if (cache.size > 500) cache.delete(cache.keys().next().value);
+  }
+  return cache.get(k);
+}
+
+// Inline/JSON form ({fps, n, xyz: [...]}) → the same shape fetchTrajectory returns.
+export function fromJSON(t){
+  return t && t.xyz ? { fps: t.fps, n: t.n, xyz: Float32Array.from(t.xyz) } : null;
+}
+
+export function duration(t){ return (t.n - 1) / t.fps; }
+
+// Position at `seconds` after release (clamped), linear between samples; writes into out {x,y,z}.
+export function sampleAt(t, seconds, out = { x: 0, y: 0, z: 0 }){
+  const f = Math.min(Math.max(seconds * t.fps, 0), t.n - 1);
+  const i = Math.min(Math.floor(f), t.n - 2), a = f - i, j = i * 3, xyz = t.xyz;
+  if (t.n < 2){ out.x = xyz[0]; out.y = xyz[1]; out.z = xyz[2]; return out; }
+  out.x = xyz[j] + (xyz[j + 3] - xyz[j]) * a;
+  out.y = xyz[j + 1] + (xyz[j + 4] - xyz[j + 1]) * a;
+  out.z = xyz[j + 2] + (xyz[j + 5] - xyz[j + 2]) * a;
+  return out;
+}